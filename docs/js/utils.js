@@ -29,14 +29,50 @@ function formatNumber(num) {
     return num.toString().replace(/\B(?=(\d{3})+(?!\d))/g, ',');
 }
 
-// 加载JSON数据
+// 还原打包的股票数组（字段名只在文件头出现一次）
+const PACKED_STOCK_KEYS = ['stocks', 'added', 'removed'];
+
+function unpackData(value, fields) {
+    if (Array.isArray(value)) {
+        return value.map(item => unpackData(item, fields));
+    }
+    if (value && typeof value === 'object') {
+        const result = {};
+        for (const [key, item] of Object.entries(value)) {
+            if (PACKED_STOCK_KEYS.includes(key) && Array.isArray(item)) {
+                result[key] = item.map(row => Object.fromEntries(fields.map((field, i) => [field, row[i]])));
+            } else {
+                result[key] = unpackData(item, fields);
+            }
+        }
+        return result;
+    }
+    return value;
+}
+
+function unpackJSON(data) {
+    if (data && data.format === 'packed') {
+        return unpackData(data.data, data.fields);
+    }
+    return data;
+}
+
+// 加载JSON数据（优先加载精简的 .min.json，不存在时回退到原文件）
 async function loadJSON(url) {
     try {
+        const minUrl = url.replace(/\.json$/, '.min.json');
+        if (minUrl !== url) {
+            const minResponse = await fetch(minUrl);
+            if (minResponse.ok) {
+                return unpackJSON(await minResponse.json());
+            }
+        }
+
         const response = await fetch(url);
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        return await response.json();
+        return unpackJSON(await response.json());
     } catch (error) {
         console.error('加载数据失败:', error);
         throw error;
@@ -0,0 +1,272 @@
+"""
+名单分析模块
+把变化记录还原为 股票 × 日期 的成员矩阵，用 NumPy 的整行、整列归约计算长期指标：
+每只股票在名单上的天数、每月新增和移除数量、重新纳入次数，以及名单规模、交易货币和证券种类构成的月度变化
+
+矩阵每行对应一个股票代号（映射为连续的整数编号），每列对应从第一条变化记录到当前名单日期之间的一天，
+名单在两次变化之间保持不变。结果写入 stats.json 的 membership 字段，
+并按变化记录数和名单日期缓存在 .cache 中
+
+NumPy 为可选依赖，未安装时跳过这部分统计
+
+用法:
+    python analytics.py [--top 10]
+"""
+
+import argparse
+import sys
+
+import serializer
+from storage import cache_dir, code_sort_key, count_changes, load_current_list, load_history
+
+
+CACHE_FILE = 'membership_stats.json'
+CACHE_VERSION = 1
+
+# 在名单上天数的分组边界（天）
+TENURE_BUCKETS = [30, 90, 180, 365, 730, 1825]
+
+# 重新纳入次数最多的股票列出的数量
+TOP_COUNT = 10
+
+
+def _numpy():
+    """NumPy 为可选依赖，未安装时返回None"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _latest_attributes(records, current_data):
+    """
+    每个代号最后已知的股票属性
+    
+    按变化记录从旧到新依次覆盖，当前名单中的股票以当前名单为准
+    """
+    attributes = {}
+    for record in records:
+        for key in ('removed', 'added'):
+            for stock in record[key]:
+                attributes[stock['code']] = stock
+        for stock in record.get('modified', []):
+            latest = dict(attributes.get(stock['code'], {'code': stock['code'], 'name': stock.get('name')}))
+            latest.update((field, change['new']) for field, change in stock['changes'].items())
+            attributes[stock['code']] = latest
+    for stock in current_data['stocks']:
+        attributes[stock['code']] = stock
+    return attributes
+
+
+def build_membership_matrix(current_data, history):
+    """
+    由当前名单和变化历史构建成员矩阵
+    
+    每条变化记录在其日期所在的列上记 +1（新增）或 -1（移除），沿日期累加后得到每个代号相对第一天的变化，
+    再由最后一列等于当前名单反推第一天的名单
+    
+    Args:
+        current_data: 当前名单数据
+        history: 变化记录列表（最新的在前面）
+    
+    Returns:
+        dict: {'codes': 代号列表（行）, 'dates': datetime64[D] 数组（列）,
+               'matrix': bool 矩阵, 'attributes': {代号: 股票字典}}
+    """
+    np = _numpy()
+    records = history[::-1]
+    
+    index = {}
+    rows = []
+    owners = []
+    signs = []
+    for position, record in enumerate(records):
+        for key, sign in (('added', 1), ('removed', -1)):
+            stocks = record[key]
+            rows.extend(index.setdefault(stock['code'], len(index)) for stock in stocks)
+            owners.extend([position] * len(stocks))
+            signs.extend([sign] * len(stocks))
+    current_rows = [index.setdefault(stock['code'], len(index)) for stock in current_data['stocks']]
+    
+    record_dates = np.array([record['date'] for record in records], dtype='datetime64[D]')
+    end = np.datetime64(current_data['date'], 'D')
+    if len(records):
+        end = max(end, record_dates.max())
+    start = record_dates.min() if len(records) else end
+    dates = np.arange(start, end + 1, dtype='datetime64[D]')
+    
+    events = np.zeros((len(index), len(dates)), dtype=np.int8)
+    if rows:
+        columns = (record_dates - start).astype(np.int64)[np.array(owners)]
+        np.add.at(events, (np.array(rows), columns), np.array(signs, dtype=np.int8))
+    np.cumsum(events, axis=1, dtype=np.int8, out=events)
+    
+    final = np.zeros(len(index), dtype=np.int8)
+    final[current_rows] = 1
+    events += (final - events[:, -1])[:, None]
+    
+    return {
+        'codes': list(index),
+        'dates': dates,
+        'matrix': events > 0,
+        'attributes': _latest_attributes(records, current_data)
+    }
+
+
+def _monthly_mix(np, values, sampled):
+    """按类别统计每个采样日期在名单上的股票数，返回 {类别: 数组}"""
+    labels, inverse = np.unique(np.array(values, dtype=object).astype(str), return_inverse=True)
+    onehot = (inverse[None, :] == np.arange(len(labels))[:, None]).astype(np.int32)
+    counts = onehot @ sampled.astype(np.int32)
+    return {str(label): counts[i] for i, label in enumerate(labels)}
+
+
+def compute_membership_stats(membership, top=TOP_COUNT):
+    """
+    由成员矩阵计算长期统计
+    
+    在名单上的天数从矩阵第一天算起，第一条变化记录之前已在名单上的股票按第一天计；
+    货币和种类构成按每个代号最后已知的属性归类
+    
+    Args:
+        membership: build_membership_matrix() 的结果
+        top: 重新纳入次数最多的股票列出的数量
+    
+    Returns:
+        dict: 统计数据
+    """
+    np = _numpy()
+    matrix = membership['matrix']
+    dates = membership['dates']
+    codes = membership['codes']
+    attributes = membership['attributes']
+    
+    tenure = matrix.sum(axis=1)
+    entered = matrix[:, 1:] & ~matrix[:, :-1]
+    left = matrix[:, :-1] & ~matrix[:, 1:]
+    entries = entered.sum(axis=1) + matrix[:, 0]
+    listed = tenure > 0
+    current = matrix[:, -1]
+    
+    # 每月第一天和最后一天所在的列
+    months, month_starts = np.unique(dates.astype('datetime64[M]'), return_index=True)
+    month_ends = np.append(month_starts[1:] - 1, len(dates) - 1)
+    added = np.add.reduceat(np.concatenate(([0], entered.sum(axis=0))), month_starts)
+    removed = np.add.reduceat(np.concatenate(([0], left.sum(axis=0))), month_starts)
+    sampled = matrix[:, month_ends]
+    sizes = sampled.sum(axis=0)
+    currency = _monthly_mix(np, [attributes[code].get('currency', 'Unknown') for code in codes], sampled)
+    types = _monthly_mix(np, [attributes[code].get('type', 'Unknown') for code in codes], sampled)
+    
+    bounds = [0] + TENURE_BUCKETS
+    labels = [f"{low}-{high - 1}" for low, high in zip(bounds, TENURE_BUCKETS)] + [f"{TENURE_BUCKETS[-1]}+"]
+    buckets = np.bincount(np.digitize(tenure[listed], TENURE_BUCKETS), minlength=len(labels))
+    
+    re_entered = np.flatnonzero(entries > 1)
+    ranked = sorted(re_entered, key=lambda row: (-entries[row], code_sort_key(codes[row])))[:top]
+    
+    return {
+        'start': str(dates[0]),
+        'end': str(dates[-1]),
+        'days': len(dates),
+        'codes': int(listed.sum()),
+        'tenure': {  # 在名单上的天数
+            'mean_days': round(float(tenure[listed].mean()), 1) if listed.any() else 0,
+            'median_days': float(np.median(tenure[listed])) if listed.any() else 0,
+            'current_mean_days': round(float(tenure[current].mean()), 1) if current.any() else 0,
+            'buckets': {label: int(count) for label, count in zip(labels, buckets)}
+        },
+        're_entries': {  # 移出后再次纳入
+            'codes': len(re_entered),
+            'total': int((entries[re_entered] - 1).sum()),
+            'top': [
+                {'code': codes[row], 'name': attributes[codes[row]].get('name'), 'entries': int(entries[row])}
+                for row in ranked
+            ]
+        },
+        'monthly': {  # 每月新增、移除数量和月末的名单构成
+            str(month): {
+                'added': int(added[i]),
+                'removed': int(removed[i]),
+                'size': int(sizes[i]),
+                'currency': {label: int(counts[i]) for label, counts in currency.items() if counts[i]},
+                'type': {label: int(counts[i]) for label, counts in types.items() if counts[i]}
+            }
+            for i, month in enumerate(months)
+        }
+    }
+
+
+def membership_stats(current_data, top=TOP_COUNT):
+    """
+    计算长期名单统计
+    
+    结果按变化记录数和名单日期缓存，两者都未变化时直接读取缓存
+    
+    Args:
+        current_data: 当前名单数据
+        top: 重新纳入次数最多的股票列出的数量
+    
+    Returns:
+        dict or None: 统计数据，未安装 NumPy 时返回None
+    """
+    if _numpy() is None:
+        print("⚠ 未安装 numpy，跳过长期名单统计")
+        return None
+    
+    key = {'version': CACHE_VERSION, 'built_from': count_changes(), 'date': current_data['date'], 'top': top}
+    cache_file = cache_dir() / CACHE_FILE
+    if cache_file.exists():
+        try:
+            cached = serializer.load(cache_file)
+            if cached.get('key') == key:
+                return cached['stats']
+        except Exception as e:
+            print(f"⚠ 读取{CACHE_FILE}失败: {str(e)}")
+    
+    stats = compute_membership_stats(build_membership_matrix(current_data, load_history()), top)
+    
+    try:
+        cache_dir().mkdir(parents=True, exist_ok=True)
+        serializer.dump({'key': key, 'stats': stats}, cache_file)
+    except Exception as e:
+        print(f"⚠ 保存{CACHE_FILE}失败: {str(e)}")
+    
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='长期名单统计')
+    parser.add_argument('--top', type=int, default=TOP_COUNT, help='列出重新纳入次数最多的股票数')
+    args = parser.parse_args()
+    
+    current = load_current_list()
+    if current is None:
+        print("✗ 没有当前名单")
+        return 1
+    
+    stats = membership_stats(current, args.top)
+    if stats is None:
+        return 1
+    
+    tenure = stats['tenure']
+    print(f"{stats['start']} 至 {stats['end']}（{stats['days']} 天），共 {stats['codes']} 只股票曾在名单上")
+    print(f"在名单上的天数: 平均 {tenure['mean_days']}，中位数 {tenure['median_days']:.0f}，"
+          f"当前名单平均 {tenure['current_mean_days']}")
+    for label, count in tenure['buckets'].items():
+        print(f"  {label:>10} 天: {count}")
+    
+    re_entries = stats['re_entries']
+    print(f"重新纳入: {re_entries['codes']} 只股票，共 {re_entries['total']} 次")
+    for entry in re_entries['top']:
+        print(f"  {entry['code']:>6} {entry['name']}: 纳入 {entry['entries']} 次")
+    
+    print("最近的月份:")
+    for month, summary in list(stats['monthly'].items())[-6:]:
+        print(f"  {month}: 新增 {summary['added']}，移除 {summary['removed']}，月末 {summary['size']} 只")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
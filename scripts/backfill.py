@@ -0,0 +1,244 @@
+"""
+历史回填模块
+并发下载港交所页面上所有带日期的CSV文件，按日期重放对比，重建变化历史
+
+用法:
+    python backfill.py [--workers 8] [--restart] [--list ds_c]
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+
+from fetcher import (
+    BASE_URL, CSV_LINK_PATTERN, CSV_HEADER_MARKER, create_session_with_retry, fetch_all_csv_urls, parse_csv_data
+)
+from comparator import compare_lists
+from exporter import export_site_data
+from interval_index import rebuild_interval_index
+from storage import (
+    CACHE_DIR, cache_dir, load_history, load_current_list, save_history, update_stats, rebuild_snapshots, use_namespace
+)
+from registry import LISTS
+
+
+# 已下载快照的保存目录（中断后重新运行时跳过已下载的日期）
+BACKFILL_DIR = CACHE_DIR / 'backfill'
+
+# 默认并发下载数
+DEFAULT_WORKERS = 8
+
+
+def _snapshot_file(work_dir, date):
+    return work_dir / f"{date}.json"
+
+
+def download_snapshot(csv_url, date, session, work_dir=BACKFILL_DIR, header_marker=CSV_HEADER_MARKER):
+    """
+    下载并解析一个日期的CSV，保存为快照文件
+    
+    Args:
+        csv_url: CSV文件的URL
+        date: 生效日期
+        session: requests session
+        work_dir: 快照保存目录
+        header_marker: CSV表头行中必定出现的文字
+    
+    Returns:
+        str: 生效日期
+    """
+    stocks = parse_csv_data(csv_url, session, header_marker=header_marker)
+    
+    snapshot = {
+        'date': date,
+        'total': len(stocks),
+        'stocks': stocks,
+        'source': csv_url
+    }
+    
+    # 先写临时文件再替换，避免中断时留下不完整的快照
+    target = _snapshot_file(work_dir, date)
+    tmp_file = target.with_name(f"{target.name}.tmp")
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(tmp_file, target)
+    
+    return date
+
+
+def load_snapshot(date, work_dir=BACKFILL_DIR):
+    """读取已下载的快照"""
+    with open(_snapshot_file(work_dir, date), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def download_all(links, max_workers=DEFAULT_WORKERS, work_dir=BACKFILL_DIR, session=None,
+                 header_marker=CSV_HEADER_MARKER):
+    """
+    并发下载所有尚未下载的快照
+    
+    Args:
+        links: [(CSV URL, 生效日期), ...]
+        max_workers: 最大并发下载数
+        work_dir: 快照保存目录
+        session: requests session（可选）
+        header_marker: CSV表头行中必定出现的文字
+    
+    Returns:
+        tuple: (成功下载的日期列表, 失败的 {日期: 错误信息})
+    """
+    work_dir.mkdir(parents=True, exist_ok=True)
+    
+    pending = [(url, date) for url, date in links if not _snapshot_file(work_dir, date).exists()]
+    skipped = len(links) - len(pending)
+    if skipped:
+        print(f"✓ 跳过已下载的 {skipped} 个快照")
+    
+    if session is None:
+        session = create_session_with_retry(pool_size=max_workers)
+    
+    downloaded = []
+    failed = {}
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(download_snapshot, url, date, session, work_dir, header_marker): date
+            for url, date in pending
+        }
+        for future in as_completed(futures):
+            date = futures[future]
+            try:
+                downloaded.append(future.result())
+            except Exception as e:
+                failed[date] = str(e)
+    
+    print(f"✓ 新下载 {len(downloaded)} 个快照，失败 {len(failed)} 个")
+    return sorted(downloaded), failed
+
+
+def replay_history(dates, work_dir=BACKFILL_DIR):
+    """
+    按日期顺序重放 compare_lists()，生成变化记录
+    
+    Args:
+        dates: 按从旧到新排序的生效日期列表
+        work_dir: 快照保存目录
+    
+    Returns:
+        list: 变化记录列表（最新的在前面）
+    """
+    records = []
+    previous = None
+    
+    # 一次只保留相邻两个快照在内存中
+    for date in dates:
+        snapshot = load_snapshot(date, work_dir)
+        change_record = compare_lists(previous, snapshot)
+        if change_record:
+            # 回填记录的时间戳使用生效日期
+            change_record['timestamp'] = f"{date}T00:00:00"
+            records.append(change_record)
+        previous = snapshot
+    
+    records.reverse()
+    return records
+
+
+def save_backfill(history, snapshots, last_date, current):
+    """
+    保存回填得到的变化历史，并重建统计数据、快照存储、区间索引和网站数据
+    
+    Args:
+        history: 完整的变化历史（最新的在前面）
+        snapshots: [(日期, 股票列表), ...] 的可迭代对象，从旧到新
+        last_date: snapshots 中最后一个日期
+        current: 当前名单
+    """
+    save_history(history)
+    update_stats(current)
+    
+    # 用回填的完整名单重建快照存储，监控已保存更新的名单时接在最后
+    if current['date'] > last_date:
+        snapshots = chain(snapshots, [(current['date'], current['stocks'])])
+    rebuild_snapshots(snapshots)
+    print("✓ 已重建快照存储")
+    rebuild_interval_index()
+    export_site_data(current, rebuild_history=True)
+
+
+def backfill(max_workers=DEFAULT_WORKERS, base_url=BASE_URL, work_dir=BACKFILL_DIR,
+             pattern=CSV_LINK_PATTERN, header_marker=CSV_HEADER_MARKER):
+    """
+    回填历史变化记录（写入当前的存储命名空间）
+    
+    已有的变化记录全部保留（包括港交所页面已不再提供的更早日期），
+    重放得到的记录只补充已有历史中没有记录的日期（与 history_import.merge_history 相同）
+    
+    Args:
+        max_workers: 最大并发下载数
+        base_url: 名单页面URL
+        work_dir: 快照保存目录
+        pattern: CSV链接匹配的正则表达式
+        header_marker: CSV表头行中必定出现的文字
+    
+    Returns:
+        int: 0表示成功，1表示有下载失败（已下载的快照会保留，可重新运行继续）
+    """
+    session = create_session_with_retry(pool_size=max_workers)
+    
+    links = fetch_all_csv_urls(session, base_url, pattern)
+    if not links:
+        print("✗ 未找到可回填的CSV文件")
+        return 1
+    
+    _, failed = download_all(links, max_workers, work_dir, session, header_marker)
+    if failed:
+        for date, error in sorted(failed.items()):
+            print(f"  ✗ {date}: {error}")
+        print("⚠ 部分快照下载失败，请重新运行以继续回填")
+        return 1
+    
+    dates = [date for _, date in links]
+    records = replay_history(dates, work_dir)
+    
+    # history_import 导入了本模块的 save_backfill，在这里才导入以避免循环导入
+    from history_import import merge_history
+    
+    history, added = merge_history(load_history(), [], records)
+    snapshots = ((date, load_snapshot(date, work_dir)['stocks']) for date in dates)
+    save_backfill(history, snapshots, dates[-1],
+                  load_current_list() or load_snapshot(dates[-1], work_dir))
+    
+    print(f"✓ 回填完成: {len(dates)} 个快照，重放得到 {len(records)} 条变化记录，"
+          f"补充 {added} 条，变化历史共 {len(history)} 条")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回填港股卖空名单历史')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='最大并发下载数')
+    parser.add_argument('--restart', action='store_true', help='忽略已下载的快照，重新下载全部文件')
+    parser.add_argument('--list', default='ds_c', choices=sorted(LISTS), help='要回填的名单（见 registry.py）')
+    args = parser.parse_args()
+    
+    monitored = LISTS[args.list]
+    with use_namespace(monitored['namespace']):
+        work_dir = cache_dir() / 'backfill'
+        if args.restart and work_dir.exists():
+            for snapshot_file in work_dir.glob('*.json'):
+                snapshot_file.unlink()
+        
+        return backfill(
+            max_workers=max(1, args.workers),
+            base_url=monitored['base_url'],
+            work_dir=work_dir,
+            pattern=monitored['link_pattern'],
+            header_marker=monitored['header_marker']
+        )
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+长期名单统计基准测试
+用多年的合成每日名单生成变化历史，比较逐日遍历股票字典列表的纯 Python 实现与
+analytics 的 NumPy 成员矩阵实现的耗时，并检查两者的统计结果相同
+
+用法:
+    python bench_analytics.py [--years 10] [--size 1200] [--churn 3] [--budget 1.0]
+"""
+
+import argparse
+import contextlib
+import io
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import analytics
+from storage import code_sort_key
+from comparator import compare_lists
+from mock_hkex import generate_snapshots
+
+
+def build_history(snapshots):
+    """逐日对比名单，返回 (最后一天的名单, 变化记录列表（最新的在前面）)"""
+    history = []
+    previous = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for day, stocks in snapshots.items():
+            current = {
+                'date': day,
+                'total': len(stocks),
+                'stocks': [dict(stock, number=str(number)) for number, stock in enumerate(stocks, start=1)]
+            }
+            change_record = compare_lists(previous, current)
+            if change_record:
+                history.insert(0, change_record)
+            previous = current
+    return previous, history
+
+
+def python_membership_stats(current_data, history, top):
+    """原来的做法：逐日还原名单，对每只股票逐个累加"""
+    records = history[::-1]
+    attributes = analytics._latest_attributes(records, current_data)
+    
+    # 从当前名单倒推第一天的名单
+    members = {stock['code'] for stock in current_data['stocks']}
+    for record in history:
+        members -= {stock['code'] for stock in record['added']}
+        members |= {stock['code'] for stock in record['removed']}
+    
+    start = date.fromisoformat(records[0]['date'])
+    end = max(date.fromisoformat(current_data['date']), date.fromisoformat(history[0]['date']))
+    by_date = {}
+    for record in records:
+        by_date.setdefault(record['date'], []).append(record)
+    
+    tenure = {}
+    entries = {}
+    monthly = {}
+    previous = None
+    day = start
+    while day <= end:
+        for record in by_date.get(day.isoformat(), []):
+            members = (members - {stock['code'] for stock in record['removed']}) | {stock['code'] for stock in record['added']}
+        month = monthly.setdefault(day.isoformat()[:7], {'added': 0, 'removed': 0})
+        for code in members:
+            tenure[code] = tenure.get(code, 0) + 1
+            if previous is None or code not in previous:
+                entries[code] = entries.get(code, 0) + 1
+                if previous is not None:
+                    month['added'] += 1
+        if previous is not None:
+            month['removed'] += sum(1 for code in previous if code not in members)
+        # 月末的名单构成
+        month['size'] = len(members)
+        for field in ('currency', 'type'):
+            counts = {}
+            for code in members:
+                value = str(attributes[code].get(field, 'Unknown'))
+                counts[value] = counts.get(value, 0) + 1
+            month[field] = dict(sorted(counts.items()))
+        previous = members
+        day += timedelta(days=1)
+    
+    days = list(tenure.values())
+    current = [tenure[stock['code']] for stock in current_data['stocks']]
+    bounds = [0] + analytics.TENURE_BUCKETS + [float('inf')]
+    labels = [f"{low}-{high - 1}" for low, high in zip(bounds, analytics.TENURE_BUCKETS)] + [f"{analytics.TENURE_BUCKETS[-1]}+"]
+    re_entered = sorted((code for code, count in entries.items() if count > 1),
+                        key=lambda code: (-entries[code], code_sort_key(code)))
+    
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': (end - start).days + 1,
+        'codes': len(tenure),
+        'tenure': {
+            'mean_days': round(statistics.mean(days), 1),
+            'median_days': float(statistics.median(days)),
+            'current_mean_days': round(statistics.mean(current), 1),
+            'buckets': {label: sum(1 for value in days if low <= value < high)
+                        for label, low, high in zip(labels, bounds, bounds[1:])}
+        },
+        're_entries': {
+            'codes': len(re_entered),
+            'total': sum(entries[code] - 1 for code in re_entered),
+            'top': [{'code': code, 'name': attributes[code].get('name'), 'entries': entries[code]}
+                    for code in re_entered[:top]]
+        },
+        'monthly': monthly
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='长期名单统计基准测试')
+    parser.add_argument('--years', type=int, default=10, help='历史年数（每个工作日一个名单）')
+    parser.add_argument('--size', type=int, default=1200, help='名单股票数')
+    parser.add_argument('--churn', type=int, default=3, help='每天最多新增/移除的股票数')
+    parser.add_argument('--budget', type=float, default=1.0, help='NumPy 实现的耗时预算（秒）')
+    args = parser.parse_args()
+    
+    if analytics._numpy() is None:
+        print("✗ 未安装 numpy")
+        return 1
+    
+    snapshots = generate_snapshots(args.years * 261, base_size=args.size, churn=args.churn)
+    current, history = build_history(snapshots)
+    print(f"{len(snapshots)} 个名单，{len(history)} 条变化记录\n")
+    
+    start = time.perf_counter()
+    expected = python_membership_stats(current, history, analytics.TOP_COUNT)
+    python_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    membership = analytics.build_membership_matrix(current, history)
+    build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    stats = analytics.compute_membership_stats(membership)
+    compute_seconds = time.perf_counter() - start
+    numpy_seconds = build_seconds + compute_seconds
+    
+    matrix = membership['matrix']
+    print(f"{'逐日遍历（纯 Python）':<26}{python_seconds:>8.3f} 秒")
+    print(f"{'NumPy 成员矩阵':<28}{numpy_seconds:>8.3f} 秒（构建 {build_seconds:.3f}，"
+          f"统计 {compute_seconds:.3f}；{matrix.shape[0]} × {matrix.shape[1]}）")
+    print(f"{'倍数':<30}{python_seconds / numpy_seconds:>8.1f}x\n")
+    
+    failures = 0
+    if stats != expected:
+        mismatched = [key for key in expected if stats.get(key) != expected[key]]
+        print(f"✗ 两种实现的统计结果不同: {', '.join(mismatched)}")
+        failures += 1
+    else:
+        print(f"✓ 两种实现的统计结果相同（{stats['codes']} 只股票，{len(stats['monthly'])} 个月，"
+              f"{stats['re_entries']['codes']} 只重新纳入）")
+    
+    if numpy_seconds > args.budget:
+        print(f"✗ 耗时 {numpy_seconds:.3f} 秒超过预算 {args.budget:.1f} 秒")
+        failures += 1
+    else:
+        print(f"✓ 耗时在预算 {args.budget:.1f} 秒以内")
+    
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+历史回填基准测试
+在本地模拟港交所网站上放置数百个带日期的CSV文件，验证并发回填、断点续传和历史重建
+
+用法:
+    python bench_backfill.py [--files 300] [--workers 16] [--latency 0.05]
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import storage
+import backfill
+from mock_hkex import MockHKEXSite, generate_snapshots
+
+
+def expected_change_count(snapshots):
+    """直接按代码集合计算应产生的变化记录数"""
+    count = 0
+    previous = None
+    for stocks in snapshots.values():
+        codes = {stock['code'] for stock in stocks}
+        if previous is not None and codes != previous:
+            count += 1
+        previous = codes
+    return count
+
+
+def run_backfill(site, workers, work_dir):
+    """静默运行一次回填，返回 (返回码, 耗时秒数)"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        code = backfill.backfill(max_workers=workers, base_url=site.page_url, work_dir=work_dir)
+    return code, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='历史回填基准测试')
+    parser.add_argument('--files', type=int, default=300, help='模拟CSV文件数量')
+    parser.add_argument('--workers', type=int, default=16, help='并发下载数')
+    parser.add_argument('--latency', type=float, default=0.05, help='模拟的每次请求网络延迟（秒）')
+    args = parser.parse_args()
+    
+    snapshots = generate_snapshots(args.files)
+    expected = expected_change_count(snapshots)
+    site = MockHKEXSite(snapshots, latency=args.latency).start()
+    
+    failures = 0
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            storage.DATA_DIR = tmp / 'docs'
+            storage.STORE_DIR = tmp / 'data'
+            
+            for workers in (1, args.workers):
+                work_dir = tmp / f"backfill-{workers}"
+                code, seconds = run_backfill(site, workers, work_dir)
+                print(f"并发数 {workers:>3}: {args.files} 个文件，耗时 {seconds:.2f} 秒 (返回码 {code})")
+            
+            history = storage.load_history()
+            if len(history) != expected:
+                print(f"✗ 变化记录数不一致: {len(history)} != {expected}")
+                failures += 1
+            else:
+                print(f"✓ 重建 {len(history)} 条变化记录")
+            
+            # 已有历史中页面已不再提供的更早日期的记录、回填范围内重放没有产生的记录，再次回填后都保留
+            first_date = min(snapshots)
+            kept = [dict(history[-1], date='2019-12-31', timestamp='2019-12-31T17:00:00'),
+                    dict(history[-1], date=first_date, timestamp=f"{first_date}T17:00:00")]
+            with contextlib.redirect_stdout(io.StringIO()):
+                storage.save_history(history + kept)
+            code, _ = run_backfill(site, args.workers, work_dir)
+            history = storage.load_history()
+            if code or len(history) != expected + len(kept) or any(record not in history for record in kept):
+                print("✗ 再次回填丢失了已有的变化记录")
+                failures += 1
+            else:
+                print(f"✓ 再次回填保留已有的 {len(kept)} 条范围外和重放未产生的变化记录")
+            
+            # 模拟中断：删除部分快照后重新运行，只应重新下载缺失的文件
+            removed = sorted(work_dir.glob('*.json'))[::10]
+            for snapshot_file in removed:
+                snapshot_file.unlink()
+            before = sum(site.requests.values())
+            code, seconds = run_backfill(site, args.workers, work_dir)
+            downloads = sum(site.requests.values()) - before - 1  # 减去页面请求
+            if downloads != len(removed):
+                print(f"✗ 断点续传重新下载了 {downloads} 个文件，应为 {len(removed)} 个")
+                failures += 1
+            else:
+                print(f"✓ 断点续传只下载缺失的 {downloads} 个文件，耗时 {seconds:.2f} 秒")
+    finally:
+        site.stop()
+    
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
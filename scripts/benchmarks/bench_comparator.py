@@ -0,0 +1,113 @@
+"""
+名单对比基准测试
+在 1万 到 100万 行的合成名单上比较按代码索引的单遍对比与原来只检测进出的集合对比
+
+用法:
+    python bench_comparator.py [--sizes 10000 100000 1000000] [--churn 0.001]
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from comparator import compare_lists
+from mock_hkex import make_stocks, make_stock
+
+
+def membership_diff(old_data, new_data):
+    """原来的实现：两个代码集合求差，再各扫描一遍完整列表"""
+    old_codes = {stock['code'] for stock in old_data['stocks']}
+    new_codes = {stock['code'] for stock in new_data['stocks']}
+    
+    added_codes = new_codes - old_codes
+    removed_codes = old_codes - new_codes
+    
+    added = [stock for stock in new_data['stocks'] if stock['code'] in added_codes]
+    removed = [stock for stock in old_data['stocks'] if stock['code'] in removed_codes]
+    added.sort(key=lambda x: x['code'])
+    removed.sort(key=lambda x: x['code'])
+    return added, removed
+
+
+def make_pair(size, churn, seed=0):
+    """
+    生成一对新旧名单：按比例移除、新增和修改属性
+    
+    Returns:
+        tuple: (旧名单, 新名单, 修改数)
+    """
+    rng = random.Random(seed)
+    old_stocks = make_stocks(size, seed)
+    count = max(1, int(size * churn))
+    
+    new_stocks = [dict(stock) for stock in old_stocks]
+    for i in sorted(rng.sample(range(len(new_stocks)), count), reverse=True):
+        del new_stocks[i]
+    
+    used = {stock['code'] for stock in old_stocks}
+    while len(new_stocks) < size:
+        code = rng.randint(1, size * 20)
+        if str(code) not in used:
+            used.add(str(code))
+            new_stocks.append(make_stock(code, rng))
+    
+    modified = rng.sample(range(len(new_stocks) - count), count)
+    for i in modified:
+        new_stocks[i]['remarks'] = '修改'
+    
+    # 重新编号，模拟名单增减后序号整体变化
+    new_stocks.sort(key=lambda stock: int(stock['code']))
+    for number, stock in enumerate(new_stocks, start=1):
+        stock['number'] = str(number)
+    
+    old = {'date': '2026-01-01', 'total': len(old_stocks), 'stocks': old_stocks}
+    new = {'date': '2026-01-02', 'total': len(new_stocks), 'stocks': new_stocks}
+    return old, new, len(modified)
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='名单对比基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='名单行数')
+    parser.add_argument('--churn', type=float, default=0.001, help='新增、移除和修改各占的比例')
+    args = parser.parse_args()
+    
+    print(f"{'行数':>10}{'集合对比(ms)':>16}{'键控对比(ms)':>16}{'比值':>8}  变化")
+    failures = 0
+    for size in args.sizes:
+        old, new, modified_count = make_pair(size, args.churn)
+        repeat = 5 if size <= 100000 else 2
+        
+        (added, removed), legacy_seconds = best_time(lambda: membership_diff(old, new), repeat)
+        with contextlib.redirect_stdout(io.StringIO()):
+            record, keyed_seconds = best_time(lambda: compare_lists(old, new), repeat)
+        
+        if record['added'] != added or record['removed'] != removed or len(record['modified']) != modified_count:
+            print(f"✗ {size} 行的对比结果不一致")
+            failures += 1
+            continue
+        
+        print(f"{size:>10}{legacy_seconds * 1000:>16.1f}{keyed_seconds * 1000:>16.1f}"
+              f"{keyed_seconds / legacy_seconds:>8.2f}  "
+              f"+{len(added)} -{len(removed)} ~{len(record['modified'])}")
+    
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+常驻运行基准测试
+比较每次启动新进程的开销与常驻进程中一次无变化检查的开销，并验证健康检查接口和 SIGTERM 退出
+
+用法:
+    python bench_daemon.py [--cycles 20] [--interval 0.05] [--latency 0.0]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import storage
+import main as monitor
+from daemon import MonitorDaemon
+from fetcher import HTTPCache, CSV_LINK_PATTERN, CSV_HEADER_MARKER
+from mock_hkex import MockHKEXSite, generate_snapshots
+
+
+def cold_start_seconds(repeat=3):
+    """启动新的解释器并导入全部监控模块的耗时（取最小值）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import main'], cwd=SCRIPTS_DIR, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, response.read().decode('utf-8')
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='常驻运行基准测试')
+    parser.add_argument('--cycles', type=int, default=20, help='常驻运行的检查次数')
+    parser.add_argument('--interval', type=float, default=0.05, help='检查间隔（秒）')
+    parser.add_argument('--files', type=int, default=5, help='模拟CSV文件数量')
+    parser.add_argument('--latency', type=float, default=0.0, help='模拟的每次请求网络延迟（秒）')
+    args = parser.parse_args()
+    
+    cold = cold_start_seconds()
+    print(f"新进程启动并导入模块: {cold * 1000:.0f} ms（不含 pip install 和环境准备）")
+    
+    site = MockHKEXSite(generate_snapshots(args.files), latency=args.latency).start()
+    lists = [{
+        'name': 'mock',
+        'title': '模拟名单',
+        'base_url': site.page_url,
+        'link_pattern': CSV_LINK_PATTERN,
+        'header_marker': CSV_HEADER_MARKER,
+        'namespace': ''
+    }]
+    
+    timings = []
+    
+    def timed_cycle(*cycle_args, **kwargs):
+        wall, cpu = time.perf_counter(), time.process_time()
+        results = monitor.run_all(*cycle_args, **kwargs)
+        timings.append((time.perf_counter() - wall, time.process_time() - cpu))
+        return results
+    
+    failures = 0
+    responses = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            storage.DATA_DIR = tmp / 'docs'
+            storage.STORE_DIR = tmp / 'data'
+            storage.CACHE_DIR = tmp / 'cache'
+            
+            port = free_port()
+            daemon = MonitorDaemon(lists, timed_cycle, interval=args.interval, port=port,
+                                   cache=HTTPCache(tmp / 'http'))
+            
+            def stop_when_done():
+                while len(timings) < args.cycles:
+                    time.sleep(0.01)
+                base = f"http://127.0.0.1:{port}"
+                responses['health'] = get(f"{base}/health")
+                responses['metrics'] = get(f"{base}/metrics")
+                os.kill(os.getpid(), signal.SIGTERM)
+            
+            threading.Thread(target=stop_when_done, daemon=True).start()
+            with contextlib.redirect_stdout(io.StringIO()):
+                code = daemon.run()
+    finally:
+        site.stop()
+    
+    first_wall, first_cpu = timings[0]
+    warm = timings[1:]
+    warm_wall = sorted(wall for wall, _ in warm)[len(warm) // 2]
+    warm_cpu = sorted(cpu for _, cpu in warm)[len(warm) // 2]
+    print(f"常驻进程首次检查（完整路径）: 耗时 {first_wall * 1000:.1f} ms，CPU {first_cpu * 1000:.1f} ms")
+    print(f"常驻进程无变化检查（中位数，{len(warm)} 次）: 耗时 {warm_wall * 1000:.1f} ms，CPU {warm_cpu * 1000:.1f} ms")
+    print(f"与新进程相比: 每次检查节省约 {(cold - warm_wall) * 1000:.0f} ms")
+    
+    status, body = responses.get('health', (None, '{}'))
+    health = json.loads(body)
+    if status != 200 or health.get('status') != 'ok' or health['lists']['mock']['path'] != 'fast':
+        print(f"✗ 健康检查结果不正确: {status} {body}")
+        failures += 1
+    else:
+        print(f"✓ /health 返回 200，已检查 {health['cycles']} 次")
+    
+    status, body = responses.get('metrics', (None, ''))
+    if status != 200 or 'monitor_list_fast_path_total{list="mock"}' not in body:
+        print(f"✗ 指标接口结果不正确: {status}")
+        failures += 1
+    else:
+        print("✓ /metrics 返回 Prometheus 文本格式指标")
+    
+    if code != 0:
+        print(f"✗ 收到 SIGTERM 后返回码为 {code}")
+        failures += 1
+    else:
+        print("✓ 收到 SIGTERM 后完成当前检查并正常退出")
+    
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
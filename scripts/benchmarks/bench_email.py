@@ -0,0 +1,217 @@
+"""
+邮件群发基准测试
+在本地 SMTP 替身（aiosmtpd）上比较每封邮件新建连接、单连接复用和多连接并发的吞吐量，
+并验证被拒收件人的结果报告和断线重连
+
+需要安装 aiosmtpd（仅基准测试使用）: pip install aiosmtpd
+
+用法:
+    python bench_email.py [--recipients 500] [--connections 4] [--latency 0.005]
+"""
+
+import argparse
+import asyncio
+import smtplib
+import socket
+import sys
+import threading
+import logging
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from emailer import generate_html_email, deliver_messages
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+try:
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+except ImportError:
+    Controller = None
+
+# aiosmtpd 内部设置了已弃用的 Session.login_data，每次登录都会输出警告日志
+logging.getLogger('mail.log').setLevel(logging.ERROR)
+
+SENDER = 'monitor@example.com'
+PASSWORD = 'app-password'
+
+
+class StandInHandler:
+    """
+    SMTP 替身：每条命令模拟一次网络往返延迟，拒收 bounce 开头的地址，
+    每 flaky_every 封邮件返回一次 421 临时失败（同一收件人最多一次）
+    """
+    
+    def __init__(self, latency, flaky_every=0):
+        self.latency = latency
+        self.flaky_every = flaky_every
+        self.delivered = []
+        self.data_commands = 0
+        self.connections = 0
+        self.failed_once = set()
+        self._lock = threading.Lock()
+    
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        with self._lock:
+            self.connections += 1
+        session.host_name = hostname
+        await asyncio.sleep(self.latency)
+        return responses
+    
+    async def handle_MAIL(self, server, session, envelope, address, mail_options):
+        await asyncio.sleep(self.latency)
+        envelope.mail_from = address
+        return '250 OK'
+    
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        await asyncio.sleep(self.latency)
+        if address.startswith('bounce'):
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+    
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.latency)
+        with self._lock:
+            self.data_commands += 1
+            if (self.flaky_every and self.data_commands % self.flaky_every == 0
+                    and not self.failed_once.intersection(envelope.rcpt_tos)):
+                self.failed_once.update(envelope.rcpt_tos)
+                return '421 Service not available, try again later'
+            self.delivered.extend(envelope.rcpt_tos)
+        return '250 Message accepted'
+
+
+def authenticate(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=auth_data.password.decode() == PASSWORD, handled=False)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(handler):
+    controller = Controller(handler, hostname='127.0.0.1', port=free_port(),
+                            authenticator=authenticate, auth_require_tls=False)
+    controller.start()
+    return controller
+
+
+def build_message():
+    """用示例变化记录生成一封真实大小的通知邮件"""
+    record = {
+        'date': '2026-01-07',
+        'old_total': 1234,
+        'new_total': 1240,
+        'net_change': 6,
+        'added': [{'code': f"{i:05d}", 'name': f"测试股份{i}", 'currency': 'HKD'} for i in range(1, 9)],
+        'removed': [{'code': f"{i:05d}", 'name': f"测试股份{i}", 'currency': 'HKD'} for i in range(9, 11)]
+    }
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = '🚨 港股卖空名单更新 - 2026-01-07'
+    msg['From'] = SENDER
+    msg.attach(MIMEText(generate_html_email(record, 'https://example.github.io/monitor'), 'html', 'utf-8'))
+    return msg.as_string()
+
+
+def send_one_connection_each(port, recipients, message):
+    """原来的方式：每封邮件新建连接并登录"""
+    for recipient in recipients:
+        server = smtplib.SMTP('127.0.0.1', port)
+        server.login(SENDER, PASSWORD)
+        server.sendmail(SENDER, [recipient], f"To: {recipient}\n{message}")
+        server.quit()
+
+
+def run_case(name, latency, send, expected):
+    handler = StandInHandler(latency)
+    controller = start_server(handler)
+    try:
+        start = time.perf_counter()
+        send(controller.port)
+        seconds = time.perf_counter() - start
+    finally:
+        controller.stop()
+    
+    ok = len(handler.delivered) == expected
+    print(f"{name:<20}{seconds:>10.2f}{expected / seconds:>12.0f}{handler.connections:>10}  {'✓' if ok else '✗'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='邮件群发基准测试')
+    parser.add_argument('--recipients', type=int, default=500, help='收件人数量')
+    parser.add_argument('--connections', type=int, default=4, help='最大并发连接数')
+    parser.add_argument('--latency', type=float, default=0.005, help='模拟的每条SMTP命令往返延迟（秒）')
+    args = parser.parse_args()
+    
+    if Controller is None:
+        print("⚠ 未安装 aiosmtpd，无法运行基准测试: pip install aiosmtpd")
+        return 1
+    
+    recipients = [f"user{i}@example.com" for i in range(args.recipients)]
+    message = build_message()
+    print(f"邮件大小 {len(message) / 1024:.1f} KB，{args.recipients} 位收件人，每条命令延迟 {args.latency * 1000:.0f} ms\n")
+    print(f"{'方式':<18}{'耗时(s)':>10}{'封/秒':>10}{'连接数':>8}")
+    
+    def pooled(connections):
+        def send(port):
+            results = deliver_messages(SENDER, recipients, message, SENDER, PASSWORD, '127.0.0.1', port,
+                                       starttls=False, max_connections=connections)
+            assert all(result['ok'] for result in results)
+        return send
+    
+    failures = 0
+    cases = [
+        ('每封新建连接', lambda port: send_one_connection_each(port, recipients, message)),
+        ('单连接复用', pooled(1)),
+        (f"{args.connections} 个连接并发", pooled(args.connections))
+    ]
+    for name, send in cases:
+        if not run_case(name, args.latency, send, len(recipients)):
+            failures += 1
+    
+    # 被拒收件人和临时失败：被拒的不重试，421 后重新连接重试
+    handler = StandInHandler(0, flaky_every=7)
+    controller = start_server(handler)
+    sample = recipients[:50]
+    mixed = sample + ['bounce1@example.com', 'bounce2@example.com']
+    try:
+        results = deliver_messages(SENDER, mixed, message, SENDER, PASSWORD, '127.0.0.1', controller.port,
+                                   starttls=False, max_connections=args.connections)
+    finally:
+        controller.stop()
+    
+    bounced = [result for result in results if not result['ok']]
+    retried = [result for result in results if result['ok'] and result['attempts'] > 1]
+    if ([result['recipient'] for result in bounced] != ['bounce1@example.com', 'bounce2@example.com']
+            or any(result['attempts'] != 1 for result in bounced)
+            or sorted(handler.delivered) != sorted(sample)):
+        print("✗ 被拒收件人或重试结果不正确")
+        failures += 1
+    else:
+        print(f"\n✓ 2 位被拒收件人报告失败且未重试，{len(retried)} 封临时失败的邮件重连后送达")
+    
+    # 登录失败时立即停止，不逐个收件人重试
+    handler = StandInHandler(0)
+    controller = start_server(handler)
+    try:
+        results = deliver_messages(SENDER, recipients[:20], message, SENDER, 'wrong', '127.0.0.1',
+                                   controller.port, starttls=False, max_connections=args.connections)
+    finally:
+        controller.stop()
+    if any(result['ok'] for result in results) or handler.connections > args.connections:
+        print("✗ 登录失败时没有停止发送")
+        failures += 1
+    else:
+        print(f"✓ 登录失败后停止发送（共尝试 {handler.connections} 个连接）")
+    
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""
+邮件渲染基准测试
+在 5000 行的变化记录上比较原来逐行 html += 拼接的渲染方式与预编译模板的渲染方式，并检查HTML转义
+
+用法:
+    python bench_email_render.py [--rows 5000] [--repeat 5]
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from comparator import FIELD_LABELS
+from emailer import _EMAIL_STYLE, generate_html_email, generate_text_email
+
+
+def legacy_render(change_record, website_url=None):
+    """原来的实现：每次重新嵌入整段CSS，逐行用 += 拼接，不转义"""
+    html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="utf-8">
+        <style>{_EMAIL_STYLE}</style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>🚨 港股卖空名单更新</h1>
+                <div class="date">{change_record['date']}</div>
+            </div>
+    """
+    if change_record['added']:
+        html += f"""
+            <div class="section">
+                <div class="section-title">📈 新增股票 ({len(change_record['added'])})</div>
+                <div class="stock-list">
+        """
+        for stock in change_record['added']:
+            html += f"""
+                    <div class="stock-item">
+                        <span class="stock-code">{stock['code']}</span>
+                        <span class="stock-name">{stock['name']}</span>
+                        <span class="stock-currency">{stock['currency']}</span>
+                        <span class="added-badge">NEW</span>
+                    </div>
+            """
+        html += """
+                </div>
+            </div>
+        """
+    if change_record['removed']:
+        html += f"""
+            <div class="section">
+                <div class="section-title">📉 移除股票 ({len(change_record['removed'])})</div>
+                <div class="stock-list">
+        """
+        for stock in change_record['removed']:
+            html += f"""
+                    <div class="stock-item">
+                        <span class="stock-code">{stock['code']}</span>
+                        <span class="stock-name">{stock['name']}</span>
+                        <span class="removed-badge">REMOVED</span>
+                    </div>
+            """
+        html += """
+                </div>
+            </div>
+        """
+    modified = change_record.get('modified', [])
+    if modified:
+        html += f"""
+            <div class="section">
+                <div class="section-title">✏️ 属性变化 ({len(modified)})</div>
+                <div class="stock-list">
+        """
+        for stock in modified:
+            details = '<br>'.join(f"{FIELD_LABELS.get(field, field)}: {change['old']} → {change['new']}"
+                                  for field, change in stock['changes'].items())
+            html += f"""
+                    <div class="stock-item">
+                        <span class="stock-code">{stock['code']}</span>
+                        <span class="stock-name">{stock['name']}<br><span class="stock-currency">{details}</span></span>
+                        <span class="modified-badge">CHANGED</span>
+                    </div>
+            """
+        html += """
+                </div>
+            </div>
+        """
+    html += """
+        </div>
+    </body>
+    </html>
+    """
+    return html
+
+
+def make_record(rows, seed=0):
+    """生成新增、移除、属性变化共 rows 行的变化记录（按 6:3:1 分配）"""
+    rng = random.Random(seed)
+    codes = rng.sample(range(1, 100000), rows)
+    added_count = rows * 6 // 10
+    removed_count = rows * 3 // 10
+    
+    def stock(code):
+        return {'code': f"{code:05d}", 'name': f"測試股份{code}-W", 'currency': rng.choice(['HKD', 'RMB', 'USD'])}
+    
+    added = [stock(code) for code in codes[:added_count]]
+    removed = [stock(code) for code in codes[added_count:added_count + removed_count]]
+    modified = [
+        {'code': f"{code:05d}", 'name': f"測試股份{code}", 'changes': {'remarks': {'old': '', 'new': '暫停'}}}
+        for code in codes[added_count + removed_count:]
+    ]
+    # 股票名称中的特殊字符必须转义
+    added[0]['name'] = '<script>alert(1)</script> & Co'
+    return {
+        'date': '2026-01-07',
+        'old_total': 2000,
+        'new_total': 2000 + len(added) - len(removed),
+        'net_change': len(added) - len(removed),
+        'added': added,
+        'removed': removed,
+        'modified': modified
+    }
+
+
+def serialize(*parts):
+    """组装并序列化邮件（base64 编码占主要耗时），返回邮件文本"""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = 'bench'
+    for content, subtype in parts:
+        msg.attach(MIMEText(content, subtype, 'utf-8'))
+    return msg.as_string()
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='邮件渲染基准测试')
+    parser.add_argument('--rows', type=int, default=5000, help='变化记录的行数')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数（取最小值）')
+    args = parser.parse_args()
+    
+    record = make_record(args.rows)
+    url = 'https://example.github.io/monitor/?from=mail&list=ds'
+    
+    legacy, legacy_seconds = best_time(lambda: legacy_render(record, url), args.repeat)
+    html, html_seconds = best_time(lambda: generate_html_email(record, url), args.repeat)
+    text, text_seconds = best_time(lambda: generate_text_email(record, url), args.repeat)
+    
+    print(f"{'方式':<22}{'耗时(ms)':>10}{'大小(KB)':>10}")
+    print(f"{'逐行 += 拼接（原实现）':<18}{legacy_seconds * 1000:>10.1f}{len(legacy.encode()) / 1024:>10.0f}")
+    print(f"{'预编译模板 HTML':<20}{html_seconds * 1000:>10.1f}{len(html.encode()) / 1024:>10.0f}")
+    print(f"{'纯文本部分':<20}{text_seconds * 1000:>10.1f}{len(text.encode()) / 1024:>10.0f}")
+    print(f"\nHTML 渲染耗时比 {html_seconds / legacy_seconds:.2f}（新实现包含HTML转义）")
+    
+    legacy_mime, legacy_mime_seconds = best_time(lambda: serialize((legacy, 'html')), args.repeat)
+    mime, mime_seconds = best_time(lambda: serialize((text, 'plain'), (html, 'html')), args.repeat)
+    print(f"序列化整封邮件: 原实现 {legacy_mime_seconds * 1000:.1f} ms / {len(legacy_mime) / 1024:.0f} KB，"
+          f"新实现（纯文本+HTML） {mime_seconds * 1000:.1f} ms / {len(mime) / 1024:.0f} KB")
+    
+    failures = 0
+    html_codes = set(re.findall(r'class="stock-code">([^<]*)<', html))
+    text_codes = set(re.findall(r'^  \[([^\]]*)\]', text, re.M))
+    missing = [stock['code'] for stock in record['added'] + record['removed'] + record['modified']
+               if stock['code'] not in html_codes or stock['code'] not in text_codes]
+    if missing:
+        print(f"✗ 有 {len(missing)} 只股票没有出现在邮件中")
+        failures += 1
+    if '<script>' in html or '&lt;script&gt;alert(1)&lt;/script&gt; &amp; Co' not in html:
+        print("✗ 股票名称没有正确转义")
+        failures += 1
+    if not failures:
+        print(f"✓ {args.rows} 行全部出现在HTML和纯文本部分，股票名称已转义")
+    
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
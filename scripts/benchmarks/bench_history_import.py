@@ -0,0 +1,166 @@
+"""
+Git 历史导入基准测试
+用 git fast-import 生成一个包含数千个数据提交的临时仓库（模拟工作流提交的 docs/data/current.json
+和只保留最近 100 条的 docs/data/history.json），比较每个提交调用一次 git show 与
+history_import 的单个 git cat-file --batch 进程 + 进程池的读取耗时，
+并检查导入后的变化历史和按日期重建的名单与生成的数据一致
+
+用法:
+    python bench_history_import.py [--days 1500] [--runs-per-day 2] [--size 1200] [--workers 4]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import history_import
+import storage
+from comparator import compare_lists
+from mock_hkex import generate_snapshots
+
+BRANCH = 'bench'
+
+# 生成的仓库中，history.json 从第几个日期开始出现（之前的变化只能由名单重放得到）
+HISTORY_STARTS_AT = 0.3
+
+
+def numbered(stocks):
+    return [dict(stock, number=str(number)) for number, stock in enumerate(stocks, start=1)]
+
+
+def build_repo(repo, snapshots, runs_per_day):
+    """
+    用 git fast-import 生成数据提交
+    
+    每个日期提交 runs_per_day 次 current.json（名单相同、抓取时间不同），
+    名单有变化时同时提交只保留最近 100 条的 history.json
+    
+    Returns:
+        tuple: (完整变化历史（最新的在前面）, 提交数)
+    """
+    subprocess.run(['git', 'init', '-q', str(repo)], check=True)
+    process = subprocess.Popen(['git', '-C', str(repo), 'fast-import', '--quiet'], stdin=subprocess.PIPE)
+    
+    def write_file(path, data):
+        encoded = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+        process.stdin.write(f"M 100644 inline {path}\ndata {len(encoded)}\n".encode('ascii') + encoded + b'\n')
+    
+    history = []
+    previous = None
+    commits = 0
+    history_start = int(len(snapshots) * HISTORY_STARTS_AT)
+    timestamp = 1577836800
+    for index, (day, stocks) in enumerate(snapshots.items()):
+        current = {'date': day, 'total': len(stocks), 'stocks': numbered(stocks)}
+        with contextlib.redirect_stdout(io.StringIO()):
+            change_record = compare_lists(previous, current)
+        if change_record:
+            change_record['timestamp'] = f"{day}T17:00:00"
+            history.insert(0, change_record)
+        previous = current
+        
+        for run in range(runs_per_day):
+            timestamp += 3600
+            message = f"更新卖空名单数据 {day} #{run}".encode('utf-8')
+            process.stdin.write(f"commit refs/heads/{BRANCH}\n"
+                                f"committer bot <bot@example.com> {timestamp} +0000\n"
+                                f"data {len(message)}\n".encode('ascii') + message + b'\n')
+            write_file('docs/data/current.json', dict(current, fetched_at=f"{day}T{9 + run:02d}:00:00"))
+            if change_record and run == 0 and index >= history_start:
+                write_file('docs/data/history.json', history[:storage.HISTORY_EXPORT_LIMIT])
+            process.stdin.write(b'\n')
+            commits += 1
+    
+    process.stdin.close()
+    if process.wait() != 0:
+        raise RuntimeError("git fast-import 失败")
+    return history, commits
+
+
+def read_per_commit(repo, paths):
+    """原来的做法：每个提交、每个文件调用一次 git show"""
+    versions = history_import.list_file_versions(repo, BRANCH, paths)
+    for sha, _, path, _ in versions:
+        subprocess.run(['git', '-C', str(repo), 'show', f"{sha}:{path}"], capture_output=True, check=True)
+    return len(versions)
+
+
+def strip_timestamp(records):
+    return [{key: value for key, value in record.items() if key != 'timestamp'} for record in records]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Git 历史导入基准测试')
+    parser.add_argument('--days', type=int, default=1500, help='名单日期数')
+    parser.add_argument('--runs-per-day', type=int, default=2, help='每个日期的提交次数')
+    parser.add_argument('--size', type=int, default=1200, help='名单股票数')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='解析进程数')
+    parser.add_argument('--skip-baseline', action='store_true', help='不测量每个提交调用一次 git show 的耗时')
+    args = parser.parse_args()
+    
+    snapshots = generate_snapshots(args.days, base_size=args.size)
+    failures = 0
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = Path(tmp) / 'repo'
+        start = time.perf_counter()
+        expected_history, commits = build_repo(repo, snapshots, args.runs_per_day)
+        print(f"已生成 {commits} 个提交（{args.days} 个日期，{len(expected_history)} 次变化），"
+              f"耗时 {time.perf_counter() - start:.1f} 秒\n")
+        
+        paths = history_import.tracked_paths()
+        if not args.skip_baseline:
+            start = time.perf_counter()
+            versions = read_per_commit(repo, paths)
+            print(f"{'每个提交一次 git show':<30}{time.perf_counter() - start:>8.2f} 秒（{versions} 次调用）")
+        
+        for workers in sorted({1, max(1, args.workers)}):
+            result = history_import.read_git_history(repo, BRANCH, workers=workers)
+            label = f"cat-file --batch，{workers} 个解析进程"
+            print(f"{label:<30}{result['seconds']:>8.2f} 秒（{result['versions']} 个文件版本，去重后 {result['blobs']} 个，"
+                  f"解析 {result['blobs'] - result['skipped']} 个）")
+        
+        storage.DATA_DIR = Path(tmp) / 'docs'
+        storage.STORE_DIR = Path(tmp) / 'data'
+        storage.CACHE_DIR = Path(tmp) / 'cache'
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = history_import.import_git_history(repo, BRANCH, workers=args.workers)
+        print(f"\n完整导入（读取、重放、合并并重建数据存储）: {time.perf_counter() - start:.2f} 秒，"
+              f"{summary['history']} 条变化记录，其中 {summary['replayed']} 条由重放得到")
+        
+        history = storage.load_history()
+        if strip_timestamp(history) != strip_timestamp(expected_history):
+            print(f"✗ 导入的变化历史与生成的不一致（{len(history)} != {len(expected_history)}）")
+            failures += 1
+        elif summary['history'] - summary['replayed'] <= storage.HISTORY_EXPORT_LIMIT:
+            print("✗ 没有恢复 history.json 导出时截断的记录")
+            failures += 1
+        else:
+            print(f"✓ 变化历史完整（{len(history)} 条，history.json 每个版本只有最近 "
+                  f"{storage.HISTORY_EXPORT_LIMIT} 条）")
+        
+        days = list(snapshots)
+        for day in days[::max(1, len(days) // 20)] + days[-1:]:
+            rebuilt = storage.load_list_as_of(day)
+            if rebuilt is None or rebuilt['stocks'] != numbered(snapshots[day]):
+                print(f"✗ {day} 的名单与生成的不一致")
+                failures += 1
+                break
+        else:
+            print("✓ 按日期重建的名单与生成的一致")
+    
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
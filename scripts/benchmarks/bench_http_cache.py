@@ -0,0 +1,97 @@
+"""
+HTTP条件请求缓存检查
+在本地模拟港交所网站上检查 HTTPCache/CachingHTTPAdapter：首次下载保存 ETag 和响应体，
+再次请求时发送 If-None-Match，服务器返回304后由缓存的响应体构造200响应，内容与首次下载相同；
+文件内容变化后重新下载并更新缓存。同时比较完整下载与304复用缓存的耗时
+
+用法:
+    python bench_http_cache.py [--rows 100000] [--latency 0.05]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fetcher import HTTPCache, create_session_with_retry
+from mock_hkex import CSV_DIR, MockHKEXSite, make_stocks, render_csv
+
+
+def fetch(session, url, stream):
+    """请求一次，返回 (响应, 响应体, 耗时秒数)"""
+    start = time.perf_counter()
+    response = session.get(url, stream=stream, timeout=30)
+    response.raise_for_status()
+    body = b''.join(response.iter_content(2 ** 16)) if stream else response.content
+    response.close()
+    return response, body, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP条件请求缓存检查')
+    parser.add_argument('--rows', type=int, default=100000, help='CSV文件的行数')
+    parser.add_argument('--latency', type=float, default=0.05, help='模拟的每次请求网络延迟（秒）')
+    args = parser.parse_args()
+    
+    day = '2026-01-07'
+    site = MockHKEXSite({day: make_stocks(args.rows)}, latency=args.latency).start()
+    url = site.csv_url(day)
+    path = f"{CSV_DIR}/ds_list{day.replace('-', '')}_c.csv"
+    expected = site.files[path][0]
+    print(f"CSV文件: {args.rows} 行，{len(expected) / 1024:.0f} KB，模拟延迟 {args.latency * 1000:.0f} ms\n")
+    
+    failures = 0
+    
+    def check(ok, message):
+        nonlocal failures
+        print(f"{'✓' if ok else '✗'} {message}")
+        if not ok:
+            failures += 1
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for stream in (False, True):
+                mode = '流式读取' if stream else '一次读取'
+                cache = HTTPCache(Path(tmp) / mode)
+                session = create_session_with_retry(cache=cache)
+                site.files[path] = (expected, 'text/csv')
+                not_modified = site.not_modified
+                
+                first, first_body, full_seconds = fetch(session, url, stream)
+                check(first.status_code == 200 and not first.from_cache and first_body == expected,
+                      f"{mode}: 首次请求完整下载（{full_seconds * 1000:.1f} ms）")
+                check(cache.lookup(url) is not None and cache.lookup(url)['etag'] == first.headers.get('ETag'),
+                      f"{mode}: 已缓存 ETag 和响应体")
+                
+                second, second_body, cached_seconds = fetch(session, url, stream)
+                check(site.not_modified == not_modified + 1, f"{mode}: 再次请求时服务器返回304")
+                check(second.status_code == 200 and second.from_cache and second_body == expected,
+                      f"{mode}: 304 后复用缓存的响应体，内容相同（{cached_seconds * 1000:.1f} ms，"
+                      f"{full_seconds / cached_seconds:.1f}x）")
+                
+                # 文件内容变化后 ETag 不同，服务器返回新内容并更新缓存
+                updated = render_csv(make_stocks(args.rows, seed=1), day)
+                site.files[path] = (updated, 'text/csv')
+                third, third_body, _ = fetch(session, url, stream)
+                fourth, fourth_body, _ = fetch(session, url, stream)
+                check(not third.from_cache and third_body == updated and fourth.from_cache and fourth_body == updated,
+                      f"{mode}: 内容变化后重新下载并更新缓存")
+                check(cache.stats() == {'hits': 2, 'misses': 2},
+                      f"{mode}: 命中 {cache.hits} 次，未命中 {cache.misses} 次")
+                session.close()
+                print()
+    finally:
+        site.stop()
+    
+    if failures:
+        print(f"✗ {failures} 项检查失败")
+        return 1
+    print("✓ 304 响应复用缓存的响应体")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+区间索引基准测试
+用合成的多年变化历史比较逐条扫描历史、单次查询和批量查询的开销
+
+用法:
+    python bench_interval_index.py [--lookups 1000000] [--codes 3000] [--years 10]
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from interval_index import IntervalIndex
+
+
+def generate_history(codes, years, seed=0):
+    """
+    生成合成变化历史（最新的在前面）和当前名单代号
+    
+    每只股票随机多次进出名单
+    """
+    rng = random.Random(seed)
+    start = date(2026 - years, 1, 2)
+    days = years * 365
+    
+    events = {}
+    current = []
+    for code in range(1, codes + 1):
+        day = rng.randint(0, days // 2)
+        member = False
+        while day < days:
+            events.setdefault(day, ([], []))[1 if member else 0].append({'code': str(code)})
+            member = not member
+            day += rng.randint(30, days // 2)
+        if member:
+            current.append(str(code))
+    
+    history = []
+    for day in sorted(events):
+        added, removed = events[day]
+        history.append({'date': (start + timedelta(days=day)).isoformat(), 'added': added, 'removed': removed})
+    history.reverse()
+    
+    return history, current, start, days
+
+
+def scan_history(history, code, day):
+    """不使用索引：从旧到新扫描变化记录"""
+    member = False
+    for record in reversed(history):
+        if record['date'] > day:
+            break
+        if any(stock['code'] == code for stock in record['added']):
+            member = True
+        elif any(stock['code'] == code for stock in record['removed']):
+            member = False
+    return member
+
+
+def main():
+    parser = argparse.ArgumentParser(description='区间索引基准测试')
+    parser.add_argument('--lookups', type=int, default=1000000, help='随机查询次数')
+    parser.add_argument('--codes', type=int, default=3000, help='股票数量')
+    parser.add_argument('--years', type=int, default=10, help='历史年数')
+    args = parser.parse_args()
+    
+    history, current, start, days = generate_history(args.codes, args.years)
+    
+    t0 = time.perf_counter()
+    index = IntervalIndex.build(history, current)
+    build_seconds = time.perf_counter() - t0
+    spans = sum(len(s) for s in index.intervals.values())
+    print(f"变化记录: {len(history)} 条，区间: {spans} 个，构建耗时 {build_seconds * 1000:.1f} ms")
+    
+    rng = random.Random(1)
+    codes = [str(rng.randint(1, args.codes)) for _ in range(args.lookups)]
+    dates = [(start + timedelta(days=rng.randint(0, days))).isoformat() for _ in range(args.lookups)]
+    
+    sample = min(200, args.lookups)
+    t0 = time.perf_counter()
+    expected = [scan_history(history, codes[i], dates[i]) for i in range(sample)]
+    scan_per_query = (time.perf_counter() - t0) / sample
+    
+    t0 = time.perf_counter()
+    single = [index.contains(code, day) for code, day in zip(codes, dates)]
+    single_seconds = time.perf_counter() - t0
+    
+    t0 = time.perf_counter()
+    batch = index.contains_many(codes, dates)
+    batch_seconds = time.perf_counter() - t0
+    
+    if single[:sample] != expected or list(batch) != single:
+        print("✗ 查询结果不一致")
+        return 1
+    
+    try:
+        import numpy  # noqa: F401
+        batch_mode = 'NumPy searchsorted'
+    except ImportError:
+        batch_mode = '分组归并扫描'
+    
+    print(f"\n{'方法':<24}{'总耗时(s)':>12}{'每次查询(µs)':>16}")
+    print(f"{'逐条扫描历史(估算)':<24}{scan_per_query * args.lookups:>12.2f}{scan_per_query * 1e6:>16.2f}")
+    print(f"{'单次查询 contains':<24}{single_seconds:>12.2f}{single_seconds / args.lookups * 1e6:>16.2f}")
+    print(f"{'批量查询 (' + batch_mode + ')':<24}{batch_seconds:>12.2f}{batch_seconds / args.lookups * 1e6:>16.2f}")
+    print(f"\n✓ {args.lookups} 次查询结果一致，其中 {sum(single)} 次在名单上")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
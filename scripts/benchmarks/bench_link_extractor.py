@@ -0,0 +1,100 @@
+"""
+CSV链接提取基准测试
+比较流式提前退出的链接提取与 BeautifulSoup 完整解析的耗时和内存峰值
+
+用法:
+    python bench_link_extractor.py [--page 已保存的港交所页面.html]
+
+未提供页面文件时使用生成的模拟页面
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fetcher import STREAM_CHUNK_SIZE, extract_first_csv_link, _find_csv_link_with_bs4
+
+
+def build_sample_page(nav_items=3000, csv_links=60, footer_items=3000):
+    """
+    生成与港交所页面结构相近的模拟HTML
+    
+    CSV链接位于大段导航菜单之后、页脚之前
+    """
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>賣空名單</title></head><body><nav><ul>']
+    for i in range(nav_items):
+        parts.append(f'<li class="menu-item"><a href="/Services/Menu/Item-{i}?sc_lang=zh-HK">選單項目 {i}</a></li>')
+    parts.append('</ul></nav><main><table>')
+    for i in range(csv_links):
+        day = f"2026{(i % 12) + 1:02d}{(i % 28) + 1:02d}"
+        parts.append(f'<tr><td>{day}</td><td><a href="/-/media/HKEX-Market/Services/Trading/Securities/Securities-Lists/'
+                     f'Designated-Securities-Eligible-for-Short-Selling/ds_list{day}_c.csv">下載</a></td></tr>')
+    parts.append('</table></main><footer><ul>')
+    for i in range(footer_items):
+        parts.append(f'<li><a href="/Footer/Link-{i}">頁腳連結 {i}</a><span>說明文字 {i}</span></li>')
+    parts.append('</ul></footer></body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def iter_chunks(data, size=STREAM_CHUNK_SIZE):
+    """模拟流式响应，按块产出字节"""
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def measure(func, repeat=5):
+    """
+    测量函数的最短耗时和内存峰值
+    
+    Returns:
+        tuple: (结果, 最短耗时秒数, 内存峰值字节数)
+    """
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return result, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CSV链接提取基准测试')
+    parser.add_argument('--page', help='已保存的港交所页面文件，默认使用生成的模拟页面')
+    args = parser.parse_args()
+    
+    if args.page:
+        page = Path(args.page).read_bytes()
+        print(f"页面文件: {args.page}")
+    else:
+        page = build_sample_page()
+        print("页面文件: 生成的模拟页面")
+    print(f"页面大小: {len(page) / 1024:.1f} KB\n")
+    
+    streaming = measure(lambda: extract_first_csv_link(iter_chunks(page)))
+    full_parse = measure(lambda: _find_csv_link_with_bs4(page.decode('utf-8', errors='replace')))
+    
+    if streaming[0] != full_parse[0]:
+        print(f"✗ 结果不一致: {streaming[0]} != {full_parse[0]}")
+        return 1
+    
+    print(f"找到链接: {streaming[0]}\n")
+    print(f"{'方法':<20}{'耗时(ms)':>12}{'内存峰值(KB)':>16}")
+    for name, (_, seconds, peak) in (('流式提前退出', streaming), ('BeautifulSoup', full_parse)):
+        print(f"{name:<20}{seconds * 1000:>12.2f}{peak / 1024:>16.1f}")
+    print(f"\n加速比: {full_parse[1] / streaming[1]:.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
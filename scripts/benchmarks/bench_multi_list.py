@@ -0,0 +1,113 @@
+"""
+多名单监控基准测试
+在多个本地模拟港交所网站上比较逐个监控与并发监控的总耗时，并检查各名单的数据互不干扰
+
+并发只能重叠网络等待：解析、对比和导出在线程中受GIL限制，只有导出阶段的 brotli 压缩交给进程池，
+在多个CPU上并行执行，因此加速倍数小于名单数，只有 1 个CPU时压缩也只能轮流执行
+
+用法:
+    python bench_multi_list.py [--lists 4] [--files 5] [--latency 0.2]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import storage
+import main as monitor
+from fetcher import HTTPCache, CSV_LINK_PATTERN, CSV_HEADER_MARKER, create_session_with_retry
+from mock_hkex import MockHKEXSite, generate_snapshots
+
+
+def make_lists(sites):
+    """为每个模拟网站生成一个名单配置，各用一个命名空间"""
+    return [
+        {
+            'name': f"mock{i}",
+            'title': f"模拟名单{i}",
+            'base_url': site.page_url,
+            'link_pattern': CSV_LINK_PATTERN,
+            'header_marker': CSV_HEADER_MARKER,
+            'namespace': f"mock{i}"
+        }
+        for i, site in enumerate(sites)
+    ]
+
+
+def run_sequential(lists, cache_dir):
+    """共用一个 session 逐个监控，返回 (各返回码, 耗时秒数)"""
+    cache = HTTPCache(cache_dir)
+    session = create_session_with_retry(cache=cache)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        codes = [monitor.run_monitor(monitored, session, cache) for monitored in lists]
+    return codes, time.perf_counter() - start
+
+
+def run_concurrent(lists, cache_dir):
+    """并发监控，返回 (各返回码, 耗时秒数)"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = monitor.run_all(lists, cache=HTTPCache(cache_dir))
+    return [code for code, _ in results.values()], time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多名单监控基准测试')
+    parser.add_argument('--lists', type=int, default=4, help='模拟名单数量')
+    parser.add_argument('--files', type=int, default=5, help='每个网站上的CSV文件数量')
+    parser.add_argument('--latency', type=float, default=0.2, help='模拟的每次请求网络延迟（秒）')
+    args = parser.parse_args()
+    
+    snapshots = [generate_snapshots(args.files, seed=i) for i in range(args.lists)]
+    sites = [MockHKEXSite(snapshot, latency=args.latency).start() for snapshot in snapshots]
+    lists = make_lists(sites)
+    
+    failures = 0
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            timings = {}
+            for mode, runner in (('逐个', run_sequential), ('并发', run_concurrent)):
+                # 每种方式使用全新的存储目录，都走完整路径
+                storage.DATA_DIR = tmp / mode / 'docs'
+                storage.STORE_DIR = tmp / mode / 'data'
+                storage.CACHE_DIR = tmp / mode / 'cache'
+                codes, seconds = runner(lists, tmp / mode / 'http')
+                timings[mode] = seconds
+                print(f"{mode}监控 {args.lists} 个名单: {seconds:.2f} 秒 (返回码 {codes})")
+                if any(codes):
+                    failures += 1
+                
+                for monitored, snapshot in zip(lists, snapshots):
+                    with storage.use_namespace(monitored['namespace']):
+                        current = storage.load_current_list()
+                    expected = len(snapshot[max(snapshot)])
+                    if current is None or current['total'] != expected:
+                        print(f"✗ {monitored['name']} 的当前名单不正确")
+                        failures += 1
+            
+            if not failures:
+                print(f"✓ 各名单数据分别保存，并发加速 {timings['逐个'] / timings['并发']:.2f}x")
+                cpus = os.cpu_count() or 1
+                if cpus < 2:
+                    print("⚠ 只有 1 个CPU：并发只重叠网络等待，解析、对比和压缩仍轮流执行")
+                else:
+                    print(f"  并发只重叠网络等待和 brotli 压缩（{min(args.lists, cpus)} 个进程），"
+                          f"解析、对比等其余CPU密集阶段受GIL限制仍轮流执行")
+    finally:
+        for site in sites:
+            site.stop()
+    
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+通知发件箱基准测试
+比较检查流程中直接发送邮件与加入发件箱的耗时，并在本地 SMTP 替身上验证
+服务不可用时的退避重试、恢复后补发、同一条变化记录不重复发送（同一日期的其他变化记录仍发送）
+和不重复发送给已送达的收件人
+
+需要安装 aiosmtpd（仅基准测试使用）: pip install aiosmtpd
+
+用法:
+    python bench_outbox.py [--recipients 50] [--latency 0.005]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import storage
+import outbox
+from emailer import send_notification
+from bench_email import Controller, PASSWORD, SENDER, StandInHandler, free_port, start_server
+
+
+class RecoveringHandler(StandInHandler):
+    """拒收 rejected 中的地址（550，发送程序不会在本次发送中重试），清空后恢复正常"""
+    
+    def __init__(self, rejected):
+        super().__init__(0)
+        self.rejected = set(rejected)
+    
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.rejected:
+            return '550 Mailbox temporarily unavailable'
+        return await super().handle_RCPT(server, session, envelope, address, rcpt_options)
+
+
+def make_record(date, timestamp=None):
+    return {
+        'date': date,
+        'timestamp': timestamp or f"{date}T17:00:00.000000",
+        'old_total': 1234,
+        'new_total': 1236,
+        'net_change': 2,
+        'added': [{'code': '00700', 'name': '騰訊控股', 'currency': 'HKD'},
+                  {'code': '09988', 'name': '阿里巴巴－Ｗ', 'currency': 'HKD'}],
+        'removed': []
+    }
+
+
+def make_sender(port):
+    def send(change_record, website_url, list_title, recipients):
+        return send_notification(change_record, SENDER, PASSWORD, website_url, list_title, recipients=recipients,
+                                 host='127.0.0.1', port=port, starttls=False)
+    return send
+
+
+def main():
+    parser = argparse.ArgumentParser(description='通知发件箱基准测试')
+    parser.add_argument('--recipients', type=int, default=50, help='收件人数量')
+    parser.add_argument('--latency', type=float, default=0.005, help='模拟的每条SMTP命令往返延迟（秒）')
+    args = parser.parse_args()
+    
+    if Controller is None:
+        print("⚠ 未安装 aiosmtpd，无法运行基准测试: pip install aiosmtpd")
+        return 1
+    
+    recipients = [f"user{i}@example.com" for i in range(args.recipients)]
+    failures = 0
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.STORE_DIR = Path(tmp) / 'data'
+        storage.CACHE_DIR = Path(tmp) / 'cache'
+        
+        # 1. 检查流程的第 5 步：直接发送与加入发件箱
+        handler = StandInHandler(args.latency)
+        controller = start_server(handler)
+        try:
+            start = time.perf_counter()
+            send_notification(make_record('2026-01-06'), SENDER, PASSWORD, recipients=recipients,
+                              host='127.0.0.1', port=controller.port, starttls=False)
+            inline_seconds = time.perf_counter() - start
+        finally:
+            controller.stop()
+        
+        start = time.perf_counter()
+        outbox.enqueue(make_record('2026-01-07'))
+        enqueue_seconds = time.perf_counter() - start
+        print(f"\n第 5 步耗时: 直接发送 {inline_seconds * 1000:.0f} ms，加入发件箱 {enqueue_seconds * 1000:.1f} ms"
+              f"（{args.recipients} 位收件人，每条命令延迟 {args.latency * 1000:.0f} ms）\n")
+        
+        # 2. SMTP 服务不可用：保留通知并按指数退避安排重试
+        now = datetime.now()
+        summary = outbox.drain(make_sender(free_port()), recipients, now=now)
+        entry = outbox.load_entries()[0]
+        expected_retry = now + timedelta(seconds=outbox.BACKOFF_BASE_SECONDS)
+        if (summary['retrying'] != 1 or entry['status'] != outbox.STATUS_PENDING or entry['delivered_to']
+                or datetime.fromisoformat(entry['next_attempt_at']) != expected_retry):
+            print("✗ 服务不可用时没有按退避时间保留通知")
+            failures += 1
+        
+        # 未到重试时间时不发送
+        summary = outbox.drain(make_sender(free_port()), recipients, now=now + timedelta(seconds=1))
+        if summary['waiting'] != 1:
+            print("✗ 未到重试时间就重新发送")
+            failures += 1
+        
+        # 3. 服务恢复但部分收件人失败：送达的收件人记录下来，下次只补发其余收件人
+        handler = RecoveringHandler(recipients[::5])
+        controller = start_server(handler)
+        try:
+            outbox.drain(make_sender(controller.port), recipients, now=expected_retry)
+            first_round = list(handler.delivered)
+            entry = outbox.load_entries()[0]
+            handler.rejected.clear()
+            outbox.drain(make_sender(controller.port), recipients,
+                         now=datetime.fromisoformat(entry['next_attempt_at']))
+        finally:
+            controller.stop()
+        
+        entry = outbox.load_entries()[0]
+        if (entry['status'] != outbox.STATUS_DELIVERED or sorted(handler.delivered) != sorted(recipients)
+                or len(entry['delivered_to']) != len(recipients)):
+            print("✗ 恢复后没有补发给全部收件人，或有收件人收到重复邮件")
+            failures += 1
+        else:
+            print(f"✓ 服务不可用时保留通知，恢复后送达 {len(recipients)} 位收件人"
+                  f"（首次 {len(first_round)} 位，补发 {len(recipients) - len(first_round)} 位，无重复）")
+        
+        # 4. 同一条变化记录的通知不会再次发送
+        outbox.enqueue(make_record('2026-01-07'))
+        handler = StandInHandler(0)
+        controller = start_server(handler)
+        try:
+            outbox.drain(make_sender(controller.port), recipients)
+        finally:
+            controller.stop()
+        if handler.delivered:
+            print("✗ 已送达的通知被重复发送")
+            failures += 1
+        else:
+            print("✓ 已送达的变化记录不会重复发送")
+        
+        # 5. 同一日期的其他变化记录（名单当天再次更新）各自发送，不被已送达或尚未发送的通知替换
+        outbox.enqueue(make_record('2026-01-07', '2026-01-07T19:00:00.000000'))
+        outbox.enqueue(make_record('2026-01-08', '2026-01-08T09:00:00.000000'))
+        outbox.enqueue(make_record('2026-01-08', '2026-01-08T17:00:00.000000'))
+        handler = StandInHandler(0)
+        controller = start_server(handler)
+        try:
+            summary = outbox.drain(make_sender(controller.port), recipients)
+        finally:
+            controller.stop()
+        entries = outbox.load_entries()
+        if (summary['delivered'] != 3 or len(handler.delivered) != 3 * len(recipients) or len(entries) != 4
+                or any(entry['status'] != outbox.STATUS_DELIVERED for entry in entries)):
+            print("✗ 同一日期的多条变化记录没有各自发送")
+            failures += 1
+        else:
+            print("✓ 同一日期的多条变化记录各自发送（已送达和尚未发送的同日通知都不会被替换）")
+        
+        stored = ''.join(path.read_text(encoding='utf-8')
+                         for path in (storage.CACHE_DIR / outbox.OUTBOX_DIR).glob('*.json'))
+        if any(recipient in stored for recipient in recipients):
+            print("✗ 发件箱文件中保存了收件人地址")
+            failures += 1
+        if storage.STORE_DIR.exists() and any(storage.STORE_DIR.rglob(f"{outbox.OUTBOX_DIR}/*")):
+            print("✗ 发件箱写入了提交到仓库的数据存储目录")
+            failures += 1
+    
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+JSON序列化基准测试
+在仓库中的真实数据文件（data/ 和 docs/data/）上比较标准库 json 与 orjson 的编码、解码耗时，
+并检查两种后端写出的字节与现有文件逐字节相同
+
+用法:
+    python bench_serializer.py [--repeat 20] [--rows 100000]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import serializer
+import storage
+from mock_hkex import make_stocks
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def real_files():
+    """
+    仓库中的数据文件及其格式
+    
+    Returns:
+        list: (显示名, 文件, 格式)，格式为 'pretty'（缩进）、'compact'（紧凑）或 'lines'（每行一条）
+    """
+    files = [
+        ('current.json', storage.STORE_DIR / 'current.json', 'pretty'),
+        ('stats_state.json', storage.STORE_DIR / 'stats_state.json', 'pretty'),
+        ('changes.jsonl', storage.STORE_DIR / storage.CHANGELOG_FILE, 'lines'),
+        ('snapshots/entries.jsonl', storage.STORE_DIR / storage.SNAPSHOT_DIR / storage.SNAPSHOT_ENTRIES_FILE, 'lines'),
+    ]
+    keyframes = sorted((storage.STORE_DIR / storage.SNAPSHOT_DIR / 'keyframes').glob('*.json'))
+    if keyframes:
+        files.append(('snapshots/keyframes/*.json', keyframes[-1], 'compact'))
+    for name in ('current', 'history', 'stats'):
+        files.append((f"{name}.min.json", storage.DATA_DIR / f"{name}.min.json", 'compact'))
+    return [(name, path, kind) for name, path, kind in files if path.exists()]
+
+
+def make_codec(kind):
+    """返回 (解码, 编码) 函数，分别作用于整个文件的字节和解码结果"""
+    if kind == 'lines':
+        def decode(data):
+            return [serializer.loads(line) for line in data.splitlines()]
+        
+        def encode(records):
+            return b''.join(serializer.dumps(record) + b'\n' for record in records)
+    else:
+        def decode(data):
+            return serializer.loads(data)
+        
+        def encode(obj):
+            return serializer.dumps(obj, pretty=kind == 'pretty')
+    return decode, encode
+
+
+def run_case(name, data, kind, repeat):
+    """两种后端分别解码、编码，返回是否逐字节一致"""
+    decode, encode = make_codec(kind)
+    timings = {}
+    outputs = {}
+    for backend in ('json', 'orjson'):
+        serializer.set_backend(backend)
+        obj, timings[f"{backend}_decode"] = best_time(lambda: decode(data), repeat)
+        outputs[backend], timings[f"{backend}_encode"] = best_time(lambda: encode(obj), repeat)
+    
+    same = outputs['json'] == outputs['orjson'] == data
+    print(f"{name:<28}{len(data) / 1024:>9.0f}"
+          f"{timings['json_decode'] * 1000:>10.2f}{timings['orjson_decode'] * 1000:>10.2f}"
+          f"{timings['json_encode'] * 1000:>10.2f}{timings['orjson_encode'] * 1000:>10.2f}"
+          f"  {'✓' if same else '✗'}")
+    return same, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON序列化基准测试')
+    parser.add_argument('--repeat', type=int, default=20, help='重复次数（取最小值）')
+    parser.add_argument('--rows', type=int, default=100000, help='合成名单的行数（模拟更大的名单），0 表示不测')
+    args = parser.parse_args()
+    
+    if serializer.orjson is None:
+        print("⚠ 未安装 orjson，无法比较: pip install orjson")
+        return 1
+    original = serializer.BACKEND
+    
+    print(f"{'文件':<26}{'大小(KB)':>9}{'json解码':>8}{'orjson解码':>10}{'json编码':>8}{'orjson编码':>10}  字节一致")
+    print(f"{'':<28}{'':>9}{'(ms)':>10}{'(ms)':>10}{'(ms)':>10}{'(ms)':>10}")
+    
+    failures = 0
+    totals = {}
+    cases = [(name, path.read_bytes(), kind) for name, path, kind in real_files()]
+    if args.rows:
+        stocks = make_stocks(args.rows)
+        for number, stock in enumerate(stocks, start=1):
+            stock['number'] = str(number)
+        synthetic = {'date': '2026-01-07', 'total': len(stocks), 'stocks': stocks}
+        cases.append((f"合成名单 {args.rows} 行 (pretty)",
+                      json.dumps(synthetic, ensure_ascii=False, indent=2).encode('utf-8'), 'pretty'))
+    
+    try:
+        for name, data, kind in cases:
+            same, timings = run_case(name, data, kind, args.repeat)
+            if not same:
+                failures += 1
+            if not name.startswith('合成'):
+                for key, seconds in timings.items():
+                    totals[key] = totals.get(key, 0) + seconds
+    finally:
+        serializer.set_backend(original)
+    
+    if totals:
+        print(f"\n真实数据文件合计: 解码 {totals['json_decode'] * 1000:.1f} → {totals['orjson_decode'] * 1000:.1f} ms"
+              f"（{totals['json_decode'] / totals['orjson_decode']:.1f}x），"
+              f"编码 {totals['json_encode'] * 1000:.1f} → {totals['orjson_encode'] * 1000:.1f} ms"
+              f"（{totals['json_encode'] / totals['orjson_encode']:.1f}x）")
+    
+    # 浮点数写法不同时回退到标准库（NaN、Infinity 与 None 同时出现时也要与标准库相同）
+    samples = [{'ratio': 1e-05}, {'big': 1.5e16}, {'n': 2 ** 70}, {'ok': 0.25},
+               {'nan': float('nan'), 'none': None}, [float('inf'), [-float('inf')]], {'none': None}]
+    serializer.set_backend('orjson')
+    try:
+        mismatched = [sample for sample in samples if serializer.dumps(sample) != serializer._stdlib_dumps(sample, False)]
+    finally:
+        serializer.set_backend(original)
+    if mismatched:
+        print(f"✗ 与标准库输出不同: {mismatched}")
+        failures += 1
+    
+    if failures:
+        print(f"✗ {failures} 项输出与标准库不一致")
+        return 1
+    print("✓ 两种后端的输出与现有文件逐字节相同")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+启动耗时基准测试
+用 python -X importtime 测量导入 main 的耗时，超过预算时返回非零退出码；
+同时检查只在邮件、导出等分支中用到的模块没有在启动时被导入
+
+用法:
+    python bench_startup.py [--runs 5] [--budget-ms 250] [--top 10]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+
+# 默认的启动耗时预算（毫秒），可用环境变量 STARTUP_BUDGET_MS 覆盖
+DEFAULT_BUDGET_MS = float(os.getenv('STARTUP_BUDGET_MS', '250'))
+
+# 名单无变化时不应加载的模块
+DEFERRED_MODULES = [
+    'emailer', 'smtplib', 'email.mime.multipart', 'email.mime.text',
+    'exporter', 'gzip', 'interval_index', 'outbox', 'daemon', 'http.server', 'bs4', 'concurrent.futures', 'cProfile', 'pstats',
+    'sqlstore', 'sqlite3', 'analytics', 'numpy', 'subscriptions'
+]
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 的输出
+    
+    Returns:
+        dict: {模块名: (自身耗时µs, 累计耗时µs)}
+    """
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure(runs):
+    """多次测量，返回累计耗时最小的一次的解析结果"""
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import main'],
+            cwd=SCRIPTS_DIR, capture_output=True, text=True, check=True
+        )
+        timings = parse_importtime(result.stderr)
+        if best is None or timings['main'][1] < best['main'][1]:
+            best = timings
+    return best
+
+
+def loaded_deferred_modules():
+    """返回导入 main 后已加载的延迟模块"""
+    code = ('import sys, main; '
+            f'print(",".join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))')
+    result = subprocess.run([sys.executable, '-c', code], cwd=SCRIPTS_DIR, capture_output=True, text=True, check=True)
+    return [name for name in result.stdout.strip().split(',') if name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动耗时基准测试')
+    parser.add_argument('--runs', type=int, default=5, help='测量次数（取最小值）')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS, help='导入 main 的耗时预算（毫秒）')
+    parser.add_argument('--top', type=int, default=10, help='列出累计耗时最多的模块数')
+    args = parser.parse_args()
+    
+    timings = measure(max(1, args.runs))
+    total_ms = timings['main'][1] / 1000
+    
+    # 只列出顶层包（子模块的耗时已计入所属的包）
+    packages = sorted(
+        ((name, cumulative) for name, (_, cumulative) in timings.items() if '.' not in name and name != 'main'),
+        key=lambda item: item[1], reverse=True
+    )
+    print(f"{'模块':<28}{'累计耗时(ms)':>14}")
+    for name, cumulative in packages[:args.top]:
+        print(f"{name:<28}{cumulative / 1000:>14.1f}")
+    print(f"{'main（合计）':<26}{total_ms:>14.1f}")
+    
+    failures = 0
+    loaded = loaded_deferred_modules()
+    if loaded:
+        print(f"✗ 启动时加载了应延迟导入的模块: {', '.join(loaded)}")
+        failures += 1
+    else:
+        print(f"✓ 启动时未加载 {len(DEFERRED_MODULES)} 个延迟导入的模块")
+    
+    if total_ms > args.budget_ms:
+        print(f"✗ 导入耗时 {total_ms:.1f} ms 超过预算 {args.budget_ms:.0f} ms")
+        failures += 1
+    else:
+        print(f"✓ 导入耗时 {total_ms:.1f} ms，预算 {args.budget_ms:.0f} ms")
+    
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
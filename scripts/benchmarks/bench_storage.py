@@ -0,0 +1,132 @@
+"""
+数据存储后端基准测试
+用同一段合成历史分别写入 JSON 文件存储和 SQLite 存储，比较每次检查的写入耗时、
+读取当前名单、查询某只股票的变化记录和查询日期范围内的变化记录的耗时，并检查两种后端的结果相同
+
+用法:
+    python bench_storage.py [--days 500] [--size 5000] [--churn 5] [--queries 200]
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import storage
+from comparator import compare_lists
+from mock_hkex import generate_snapshots
+
+BACKENDS = ('json', 'sqlite')
+
+
+def use_backend(backend, root):
+    """切换到 root 下的存储目录和指定后端"""
+    storage.STORAGE_BACKEND = backend
+    storage.DATA_DIR = root / 'docs'
+    storage.STORE_DIR = root / 'data'
+    storage.CACHE_DIR = root / 'cache'
+
+
+def build_history(snapshots):
+    """
+    逐日保存名单和变化记录（与 main.py 保存阶段相同的调用）
+    
+    Returns:
+        list: 每次检查的保存耗时（秒）
+    """
+    timings = []
+    previous = None
+    for day, stocks in snapshots.items():
+        data = {
+            'date': day,
+            'total': len(stocks),
+            'stocks': [dict(stock, number=str(number)) for number, stock in enumerate(stocks, start=1)]
+        }
+        change_record = compare_lists(previous, data)
+        if change_record:
+            # 固定时间戳，两种后端写入相同的记录
+            change_record['timestamp'] = f"{day}T17:00:00"
+        start = time.perf_counter()
+        with storage.transaction():
+            storage.save_current_list(data)
+            if change_record:
+                storage.save_change_record(change_record)
+        timings.append(time.perf_counter() - start)
+        previous = data
+    return timings
+
+
+def measure(func, args_list):
+    """依次执行查询，返回 (结果列表, 每次查询的平均耗时秒数)"""
+    start = time.perf_counter()
+    results = [func(*args) for args in args_list]
+    return results, (time.perf_counter() - start) / len(args_list)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据存储后端基准测试')
+    parser.add_argument('--days', type=int, default=500, help='历史天数（每个工作日一次检查）')
+    parser.add_argument('--size', type=int, default=5000, help='名单股票数')
+    parser.add_argument('--churn', type=int, default=5, help='每天最多新增/移除的股票数')
+    parser.add_argument('--queries', type=int, default=200, help='每种查询的次数')
+    args = parser.parse_args()
+    
+    print(f"生成 {args.days} 天的名单（{args.size} 只股票，每天最多新增/移除 {args.churn} 只）...", flush=True)
+    snapshots = generate_snapshots(args.days, base_size=args.size, churn=args.churn)
+    days = list(snapshots)
+    
+    rng = random.Random(0)
+    codes = sorted({stock['code'] for stocks in snapshots.values() for stock in stocks}, key=int)
+    code_queries = [(code,) for code in rng.choices(codes, k=args.queries)]
+    range_queries = []
+    for _ in range(args.queries):
+        start = date.fromisoformat(rng.choice(days))
+        range_queries.append((start.isoformat(), (start + timedelta(days=30)).isoformat()))
+    
+    results = {}
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in BACKENDS:
+            use_backend(backend, Path(tmp) / backend)
+            print(f"写入 {backend} 存储...", flush=True)
+            with contextlib.redirect_stdout(io.StringIO()):
+                saves = build_history(snapshots)
+                current, current_seconds = measure(storage.load_current_list, [()] * 5)
+                by_code, code_seconds = measure(storage.load_code_changes, code_queries)
+                by_range, range_seconds = measure(storage.load_changes_between, range_queries)
+            
+            size = sum(path.stat().st_size for path in (Path(tmp) / backend / 'data').rglob('*') if path.is_file())
+            results[backend] = (current[-1], by_code, by_range)
+            timings[backend] = {
+                'save': sorted(saves)[len(saves) // 2],
+                'load_current_list': current_seconds,
+                'load_code_changes': code_seconds,
+                'load_changes_between': range_seconds,
+                'size': size,
+            }
+    storage.STORAGE_BACKEND = 'json'
+    
+    json_timings, sqlite_timings = timings['json'], timings['sqlite']
+    print(f"\n{'操作':<28}{'JSON(ms)':>12}{'SQLite(ms)':>12}{'倍数':>8}")
+    for key, label in (('save', '每次检查保存（中位数）'), ('load_current_list', '读取当前名单'),
+                       ('load_code_changes', '查询某股票的变化记录'), ('load_changes_between', '查询30天内的变化记录')):
+        print(f"{label:<24}{json_timings[key] * 1000:>12.2f}{sqlite_timings[key] * 1000:>12.2f}"
+              f"{json_timings[key] / sqlite_timings[key]:>8.1f}x")
+    print(f"{'数据存储大小(KB)':<22}{json_timings['size'] / 1024:>12.0f}{sqlite_timings['size'] / 1024:>12.0f}")
+    
+    if results['json'] != results['sqlite']:
+        print("✗ 两种后端的查询结果不同")
+        return 1
+    print(f"✓ 两种后端的查询结果相同（{len(days)} 次检查，{sum(len(r) for r in results['json'][1])} 条按代号查到的记录）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+订阅匹配基准测试
+生成 1万 位订阅者（代号列表、单一属性条件和组合条件）和一条大型变化记录，比较逐个订阅者检查每只股票的匹配方式与
+subscriptions 倒排索引的匹配耗时，并比较为每位受影响的订阅者分别渲染邮件与按匹配结果分组渲染的耗时，
+检查两种方式的匹配结果相同
+
+用法:
+    python bench_subscriptions.py [--subscribers 10000] [--changes 1000] [--modified 200]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from emailer import generate_html_email
+from mock_hkex import make_stocks
+from subscriptions import SubscriptionIndex
+
+CURRENCIES = ['HKD', 'USD', 'CNY']
+TYPES = ['股本證券', '基金']
+
+
+def make_change_record(universe, changes, modified, rng):
+    """从股票全集中抽取新增、移除和属性变化的股票"""
+    picked = rng.sample(universe, changes * 2 + modified)
+    modified_stocks = []
+    for stock in picked[changes * 2:]:
+        field = rng.choice(['currency', 'type'])
+        choices = CURRENCIES if field == 'currency' else TYPES
+        new = rng.choice([value for value in choices if value != stock[field]])
+        modified_stocks.append({'code': stock['code'], 'name': stock['name'],
+                                'changes': {field: {'old': stock[field], 'new': new}}})
+    return {
+        'date': '2026-01-07',
+        'timestamp': '2026-01-07T17:00:00',
+        'old_total': len(universe) // 2,
+        'new_total': len(universe) // 2,
+        'net_change': 0,
+        'added': sorted(picked[:changes], key=lambda stock: int(stock['code'])),
+        'removed': sorted(picked[changes:changes * 2], key=lambda stock: int(stock['code'])),
+        'modified': modified_stocks
+    }
+
+
+def make_subscriptions(count, universe, rng):
+    """60% 订阅代号列表，25% 订阅单一属性，15% 订阅组合条件"""
+    subscriptions = []
+    for i in range(count):
+        address = f"user{i}@example.com"
+        kind = rng.random()
+        if kind < 0.6:
+            codes = {stock['code'] for stock in rng.sample(universe, rng.randint(1, 30))}
+            subscriptions.append((address, codes, []))
+        elif kind < 0.85:
+            field = rng.choice(['currency', 'type'])
+            value = rng.choice(CURRENCIES[1:] if field == 'currency' else TYPES[1:])
+            subscriptions.append((address, set(), [{field: value}]))
+        else:
+            subscriptions.append((address, set(), [{'currency': rng.choice(CURRENCIES), 'type': rng.choice(TYPES)}]))
+    return subscriptions
+
+
+def _matches(stock, codes, predicates):
+    return stock.get('code') in codes or any(
+        all(stock.get(field) == value for field, value in predicate.items()) for predicate in predicates)
+
+
+def loop_match(subscriptions, change_record):
+    """原来的做法：逐个订阅者检查变化记录中的每只股票"""
+    hits = {}
+    for subscriber, (_, codes, predicates) in enumerate(subscriptions):
+        positions = {'added': [], 'removed': [], 'modified': []}
+        for key in ('added', 'removed'):
+            for position, stock in enumerate(change_record[key]):
+                if _matches(stock, codes, predicates):
+                    positions[key].append(position)
+        for position, stock in enumerate(change_record['modified']):
+            old = {'code': stock['code'], 'name': stock['name']}
+            new = dict(old)
+            for field, change in stock['changes'].items():
+                old[field] = change['old']
+                new[field] = change['new']
+            if _matches(old, codes, predicates) or _matches(new, codes, predicates):
+                positions['modified'].append(position)
+        if any(positions.values()):
+            hits[subscriber] = positions
+    return hits
+
+
+def filtered_record(change_record, positions):
+    record = dict(change_record)
+    for key in ('added', 'removed', 'modified'):
+        record[key] = [change_record[key][i] for i in positions[key]]
+    record['net_change'] = len(record['added']) - len(record['removed'])
+    record['filtered'] = True
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description='订阅匹配基准测试')
+    parser.add_argument('--subscribers', type=int, default=10000, help='订阅者数')
+    parser.add_argument('--changes', type=int, default=1000, help='新增和移除的股票数（各）')
+    parser.add_argument('--modified', type=int, default=200, help='属性变化的股票数')
+    parser.add_argument('--universe', type=int, default=20000, help='股票全集大小')
+    args = parser.parse_args()
+    
+    rng = random.Random(0)
+    universe = make_stocks(args.universe)
+    change_record = make_change_record(universe, args.changes, args.modified, rng)
+    subscriptions = make_subscriptions(args.subscribers, universe, rng)
+    print(f"{args.subscribers} 位订阅者，变化记录: 新增 {args.changes}，移除 {args.changes}，属性变化 {args.modified}\n")
+    
+    start = time.perf_counter()
+    expected = loop_match(subscriptions, change_record)
+    loop_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    index = SubscriptionIndex()
+    for subscription in subscriptions:
+        index.add(*subscription)
+    build_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    hits = index.match(change_record)
+    match_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    deliveries = index.route(change_record)
+    route_seconds = time.perf_counter() - start
+    
+    print(f"{'逐个订阅者匹配':<28}{loop_seconds * 1000:>10.1f} ms")
+    print(f"{'倒排索引匹配':<30}{match_seconds * 1000:>10.1f} ms（建索引 {build_seconds * 1000:.1f} ms）")
+    print(f"{'倒排索引匹配并分组':<26}{route_seconds * 1000:>10.1f} ms")
+    print(f"{'倍数':<32}{loop_seconds / match_seconds:>10.1f}x\n")
+    
+    start = time.perf_counter()
+    per_subscriber = {subscriber: generate_html_email(filtered_record(change_record, positions))
+                      for subscriber, positions in expected.items()}
+    render_each_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    grouped = [(generate_html_email(record), addresses) for record, addresses in deliveries]
+    render_grouped_seconds = time.perf_counter() - start
+    
+    print(f"{'每位订阅者渲染一封邮件':<22}{render_each_seconds:>10.2f} 秒（{len(per_subscriber)} 封）")
+    print(f"{'按匹配结果分组渲染':<24}{render_grouped_seconds:>10.2f} 秒（{len(grouped)} 封）\n")
+    
+    failures = 0
+    if hits != expected:
+        print("✗ 倒排索引与逐个匹配的结果不同")
+        failures += 1
+    else:
+        print(f"✓ 两种方式的匹配结果相同（{len(hits)} 位订阅者受影响，"
+              f"{args.subscribers - len(hits)} 位不发送）")
+    
+    # 分组渲染的内容与按订阅者单独渲染的内容相同（忽略发送时间）
+    address_ids = {address: subscriber for subscriber, address in enumerate(index.addresses)}
+    strip_time = lambda html: html.rsplit('发送时间', 1)[0]
+    if any(strip_time(html) != strip_time(per_subscriber[address_ids[address]])
+           for html, addresses in grouped for address in addresses):
+        print("✗ 分组渲染的邮件与单独渲染的不同")
+        failures += 1
+    elif sum(len(addresses) for _, addresses in grouped) != len(per_subscriber):
+        print("✗ 分组后的收件人数与受影响的订阅者数不同")
+        failures += 1
+    else:
+        print("✓ 分组渲染的邮件与单独渲染的相同")
+    
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
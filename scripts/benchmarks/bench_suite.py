@@ -0,0 +1,225 @@
+"""
+基准测试套件
+在 1千 到 100万 行的合成名单上测量监控流程各环节的耗时：
+下载解析CSV（本地模拟港交所网站）、对比名单、保存名单和变化记录、更新统计数据、生成邮件
+
+结果保存为 JSON（默认 .cache/benchmarks/<时间>.json），并与上一次（或指定的）结果比较，
+任一环节变慢超过阈值时返回非零退出码
+
+用法:
+    python bench_suite.py                                  # 1千、1万、10万行
+    python bench_suite.py --sizes 1000 1000000 --repeat 3
+    python bench_suite.py --baseline .cache/benchmarks/20260101-120000.json --threshold 1.2
+    python bench_suite.py --baseline none                  # 不比较
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import storage
+from comparator import compare_lists
+from emailer import generate_html_email
+from fetcher import create_session_with_retry, parse_csv_data
+from mock_hkex import MockHKEXSite
+from bench_comparator import make_pair
+
+# 在替换存储目录之前记下结果目录
+RESULTS_DIR = storage.CACHE_DIR / 'benchmarks'
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# 耗时低于此值（秒）的环节不判定变慢，避免计时噪声
+NOISE_FLOOR_SECONDS = 0.002
+
+
+def measure(func, repeat, setup=None):
+    """
+    重复执行 func，setup 在每次执行前运行且不计时
+    
+    Returns:
+        dict: {'best', 'median'} 秒
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {'best': timings[0], 'median': timings[len(timings) // 2]}
+
+
+def use_storage(root):
+    """清空并切换到 root 下的存储目录"""
+    shutil.rmtree(root, ignore_errors=True)
+    storage.DATA_DIR = root / 'docs'
+    storage.STORE_DIR = root / 'data'
+    storage.CACHE_DIR = root / 'cache'
+
+
+def run_size(size, churn, repeat, tmp):
+    """
+    测量一个名单规模下的各环节
+    
+    Returns:
+        dict: {环节: {'best', 'median', 'rows_per_second'}}
+    """
+    old, new, _ = make_pair(size, churn)
+    for number, stock in enumerate(old['stocks'], start=1):
+        stock['number'] = str(number)
+    
+    site = MockHKEXSite({new['date']: new['stocks']}, filler=0).start()
+    csv_url = site.csv_url(new['date'])
+    session = create_session_with_retry()
+    root = tmp / str(size)
+    
+    results = {}
+    try:
+        parsed = {}
+        
+        def parse():
+            parsed['stocks'] = parse_csv_data(csv_url, session)
+        
+        results['parse_csv_data'] = measure(parse, repeat)
+        if [stock['name'] for stock in parsed.pop('stocks')] != [stock['name'] for stock in new['stocks']]:
+            raise RuntimeError("CSV解析结果与生成的名单不一致")
+        
+        change_record = compare_lists(old, new)
+        results['compare_lists'] = measure(lambda: compare_lists(old, new), repeat)
+        
+        use_storage(root)
+        results['save_current_list'] = measure(lambda: storage.save_current_list(new), repeat)
+        results['save_change_record'] = measure(lambda: storage.save_change_record(change_record), repeat,
+                                                setup=lambda: use_storage(root))
+        
+        def stats_setup():
+            # 上次运行已建好统计状态，本次变化记录已写入日志：测量增量更新路径
+            use_storage(root)
+            storage.update_stats(old)
+            storage.save_change_record(change_record)
+        
+        results['update_stats'] = measure(lambda: storage.update_stats(new, change_record), repeat, stats_setup)
+        results['generate_html_email'] = measure(
+            lambda: generate_html_email(change_record, 'https://example.github.io/monitor'), repeat
+        )
+    finally:
+        session.close()
+        site.stop()
+    
+    for values in results.values():
+        values['rows_per_second'] = size / values['best'] if values['best'] else None
+    return results
+
+
+def git_commit():
+    """当前代码的提交号（不在 git 仓库中时返回 None）"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parent, check=True)
+        return result.stdout.strip()
+    except Exception:
+        return None
+
+
+def latest_result(exclude=None):
+    """结果目录中最新的结果文件"""
+    files = sorted(path for path in RESULTS_DIR.glob('*.json') if path != exclude)
+    return files[-1] if files else None
+
+
+def compare_results(current, baseline, threshold):
+    """
+    与基准结果比较
+    
+    Returns:
+        list: 变慢超过阈值的 (环节, 规模, 倍数)
+    """
+    regressions = []
+    print(f"\n与 {baseline.get('created_at', '?')[:19]}（{baseline.get('commit') or '?'}）的结果比较:")
+    print(f"{'环节':<22}{'行数':>10}{'基准(ms)':>12}{'本次(ms)':>12}{'倍数':>8}")
+    for case, sizes in current['results'].items():
+        for size, values in sizes.items():
+            before = baseline.get('results', {}).get(case, {}).get(size)
+            if not before:
+                continue
+            ratio = values['best'] / before['best'] if before['best'] else float('inf')
+            slower = ratio > threshold and values['best'] - before['best'] > NOISE_FLOOR_SECONDS
+            mark = '  ✗' if slower else ''
+            print(f"{case:<22}{size:>10}{before['best'] * 1000:>12.2f}{values['best'] * 1000:>12.2f}{ratio:>8.2f}{mark}")
+            if slower:
+                regressions.append((case, size, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='基准测试套件')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='名单行数')
+    parser.add_argument('--churn', type=float, default=0.01, help='新增、移除、修改各占的比例')
+    parser.add_argument('--repeat', type=int, default=5, help='每个环节的重复次数（取最小值）')
+    parser.add_argument('--output', type=Path, help='结果文件，默认 .cache/benchmarks/<时间>.json')
+    parser.add_argument('--baseline', default='latest', help="比较的结果文件，'latest' 为上一次结果，'none' 不比较")
+    parser.add_argument('--threshold', type=float, default=1.25, help='判定变慢的耗时倍数')
+    args = parser.parse_args()
+    
+    result = {
+        'created_at': datetime.now().isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'churn': args.churn,
+        'results': {}
+    }
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            print(f"正在测量 {size} 行...", flush=True)
+            with contextlib.redirect_stdout(io.StringIO()):
+                timings = run_size(size, args.churn, max(1, args.repeat), Path(tmp))
+            for case, values in timings.items():
+                result['results'].setdefault(case, {})[str(size)] = values
+    
+    print(f"\n{'环节':<22}{'行数':>10}{'最快(ms)':>12}{'中位数(ms)':>12}{'行/秒':>14}")
+    for case, sizes in result['results'].items():
+        for size, values in sizes.items():
+            print(f"{case:<22}{size:>10}{values['best'] * 1000:>12.2f}{values['median'] * 1000:>12.2f}"
+                  f"{values['rows_per_second'] or 0:>14,.0f}")
+    
+    output = args.output or RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    baseline_file = None
+    if args.baseline == 'latest':
+        baseline_file = latest_result(exclude=output)
+    elif args.baseline != 'none':
+        baseline_file = Path(args.baseline)
+    
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n✓ 结果已保存: {output}")
+    
+    if baseline_file is None:
+        return 0
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        regressions = compare_results(result, json.load(f), args.threshold)
+    if regressions:
+        print(f"✗ {len(regressions)} 项比基准慢 {args.threshold:.2f} 倍以上")
+        return 1
+    print(f"✓ 没有比基准慢 {args.threshold:.2f} 倍以上的环节")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
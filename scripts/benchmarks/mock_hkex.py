@@ -0,0 +1,224 @@
+"""
+模拟港交所网站
+在本地启动HTTP服务，提供名单页面和带日期的CSV文件，用于离线测试和基准测试
+
+支持 ETag/If-None-Match 条件请求，并统计每个路径的请求次数
+
+生成的CSV与港交所格式一致：UTF-8 BOM、标题说明行、空行和表头；股票简称包含全角符号和
+需要加引号的逗号，名单规模可从几百行到 100万 行
+"""
+
+import csv
+import hashlib
+import io
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+PAGE_PATH = '/Services/Trading/Securities/Securities-Lists/Designated-Securities-Eligible-for-Short-Selling'
+CSV_DIR = '/-/media/HKEX-Market/Services/Trading/Securities/Securities-Lists/Designated-Securities-Eligible-for-Short-Selling'
+
+CSV_HEADER = ['數目', '股份代號', '股份簡稱', '交易貨幣', '種類', '豁免', '備註']
+
+
+def make_stocks(count, seed=0):
+    """
+    生成模拟股票列表
+    
+    Args:
+        count: 股票数量
+        seed: 随机种子
+    
+    Returns:
+        list: 股票字典列表，按代码排序
+    """
+    rng = random.Random(seed)
+    codes = sorted(rng.sample(range(1, max(count * 8, 100000)), count))
+    return [make_stock(code, rng) for code in codes]
+
+
+# 股票简称的样式：普通中文、全角符号（－Ｗ、（）、ＲＭＢ）和含逗号的英文名（CSV中需加引号）
+NAME_TEMPLATES = ['模擬{code}控股', '模擬{code}－Ｗ', '模擬科技（{code}）', '模擬{code}－ＲＭＢ', 'SIM {code} HOLDINGS, INC.']
+NAME_WEIGHTS = [60, 12, 12, 6, 10]
+
+
+def make_stock(code, rng):
+    """生成一只模拟股票"""
+    currency = rng.choices(['HKD', 'USD', 'CNY'], weights=[85, 8, 7])[0]
+    return {
+        'code': str(code),
+        'name': rng.choices(NAME_TEMPLATES, weights=NAME_WEIGHTS)[0].format(code=code),
+        'currency': currency,
+        'type': rng.choices(['股本證券', '基金'], weights=[80, 20])[0],
+        'exempt': '是' if rng.random() < 0.05 else '',
+        'remarks': '暫停買賣, 見公告' if rng.random() < 0.01 else ''
+    }
+
+
+def render_csv(stocks, effective_date):
+    """
+    按港交所格式生成CSV字节：UTF-8 BOM、标题说明行、空行、表头和数据行
+    
+    Args:
+        stocks: 股票字典列表
+        effective_date: 生效日期 (YYYY-MM-DD)
+    
+    Returns:
+        bytes: CSV文件内容
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\r\n')
+    writer.writerow([f"可進行賣空的指定證券名單 (於{effective_date}生效)", '', '', '', '', '', ''])
+    writer.writerow([''] * 7)
+    writer.writerow(CSV_HEADER)
+    for number, stock in enumerate(stocks, start=1):
+        writer.writerow([
+            number, stock['code'], stock['name'], stock['currency'],
+            stock['type'], stock['exempt'], stock['remarks']
+        ])
+    return b'\xef\xbb\xbf' + buffer.getvalue().encode('utf-8')
+
+
+def generate_snapshots(days, base_size=1200, churn=3, start=date(2020, 1, 2), seed=0):
+    """
+    生成按日期演变的名单快照
+    
+    Args:
+        days: 快照数量（每个工作日一个）
+        base_size: 初始股票数量
+        churn: 每个快照最多新增/移除的股票数
+        start: 第一个快照日期
+        seed: 随机种子
+    
+    Returns:
+        dict: {生效日期: 股票列表}，按日期从旧到新
+    """
+    rng = random.Random(seed)
+    stocks = {int(stock['code']): stock for stock in make_stocks(base_size, seed)}
+    snapshots = {}
+    
+    current = start
+    for _ in range(days):
+        while current.weekday() >= 5:
+            current += timedelta(days=1)
+        
+        for code in rng.sample(sorted(stocks), rng.randint(0, min(churn, len(stocks)))):
+            del stocks[code]
+        for _ in range(rng.randint(0, churn)):
+            code = rng.randint(1, 99999)
+            if code not in stocks:
+                stocks[code] = make_stock(code, rng)
+        
+        snapshots[current.isoformat()] = [stocks[code] for code in sorted(stocks)]
+        current += timedelta(days=1)
+    
+    return snapshots
+
+
+def render_page(dates, filler=200):
+    """生成名单页面HTML，CSV链接按日期从新到旧排列"""
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>賣空名單</title></head><body><nav><ul>']
+    for i in range(filler):
+        parts.append(f'<li><a href="/Services/Menu/Item-{i}">選單項目 {i}</a></li>')
+    parts.append('</ul></nav><main><ul>')
+    for day in sorted(dates, reverse=True):
+        stamp = day.replace('-', '')
+        parts.append(f'<li><a href="{CSV_DIR}/ds_list{stamp}_c.csv">{day}</a></li>')
+    parts.append('</ul></main></body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+class MockHKEXSite:
+    """
+    本地模拟港交所网站
+    
+    用法:
+        site = MockHKEXSite(generate_snapshots(300), latency=0.05, failures=1)
+        site.start()
+        ... 使用 site.page_url ...
+        site.stop()
+    """
+    
+    def __init__(self, snapshots, filler=200, latency=0.0, failures=0):
+        """
+        Args:
+            snapshots: {日期: 股票列表}
+            filler: 页面中无关内容的行数
+            latency: 模拟的每次请求网络延迟（秒）
+            failures: 每个路径的前 failures 次请求返回 503（用于测试重试）
+        """
+        self.files = {PAGE_PATH: (render_page(snapshots, filler), 'text/html; charset=utf-8')}
+        for day, stocks in snapshots.items():
+            path = f"{CSV_DIR}/ds_list{day.replace('-', '')}_c.csv"
+            self.files[path] = (render_csv(stocks, day), 'text/csv')
+        self.latency = latency
+        self.failures = failures
+        self.requests = {}
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        self._server = None
+    
+    @property
+    def page_url(self):
+        return f"http://127.0.0.1:{self._server.server_port}{PAGE_PATH}?sc_lang=zh-HK"
+    
+    def csv_url(self, day):
+        """指定生效日期 (YYYY-MM-DD) 的CSV下载地址"""
+        return f"http://127.0.0.1:{self._server.server_port}{CSV_DIR}/ds_list{day.replace('-', '')}_c.csv"
+    
+    def start(self):
+        site = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                entry = site.files.get(path)
+                with site._lock:
+                    site.requests[path] = site.requests.get(path, 0) + 1
+                
+                # 模拟网络往返延迟
+                if site.latency:
+                    time.sleep(site.latency)
+                
+                if site.requests[path] <= site.failures:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                
+                if entry is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                
+                body, content_type = entry
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    with site._lock:
+                        site.not_modified += 1
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+        
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+    
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
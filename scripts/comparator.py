@@ -4,6 +4,75 @@
 """
 
 from datetime import datetime
+from operator import itemgetter
+
+
+# 检测属性变化时比较的字段（序号随名单增减整体变化，不比较）
+DIFF_FIELDS = ('name', 'currency', 'type', 'exempt', 'remarks')
+
+# 字段的中文名称（用于变化摘要）
+FIELD_LABELS = {'name': '简称', 'currency': '交易货币', 'type': '种类', 'exempt': '豁免', 'remarks': '备注'}
+
+
+# 在C层取比较字段；行缺少字段时抛出 KeyError，由 _diff_values 逐个用 get 取值
+_diff_fields = itemgetter(*DIFF_FIELDS)
+
+
+def _diff_values(stock):
+    """股票的比较字段（用 get 取值，缺少的字段视为 None）"""
+    return tuple(stock.get(field) for field in DIFF_FIELDS)
+
+
+def diff_stocks(old_stocks, new_stocks):
+    """
+    按股票代码比较两份股票列表
+    
+    旧列表按代码建一次索引，新列表只扫描一遍：
+    索引中找不到的是新增，找到的比较各字段，扫描结束后索引中剩下的是移除
+    
+    Args:
+        old_stocks: 旧股票列表
+        new_stocks: 新股票列表
+        
+    Returns:
+        tuple: (新增股票列表, 移除股票列表, 属性变化列表)，均按股票代码排序
+    """
+    remaining = {stock['code']: stock for stock in old_stocks}
+    pop = remaining.pop
+    diff_fields = _diff_fields
+    
+    added = []
+    changed = []
+    for stock in new_stocks:
+        old = pop(stock['code'], None)
+        if old is None:
+            added.append(stock)
+            continue
+        # 每一行都检查字段，个别行缺少字段（如CSV末尾的空列）时改用 get 取值
+        try:
+            differs = diff_fields(old) != diff_fields(stock)
+        except KeyError:
+            differs = _diff_values(old) != _diff_values(stock)
+        if differs:
+            changed.append((old, stock))
+    
+    removed = list(remaining.values())
+    
+    modified = []
+    for old, new in changed:
+        changes = {
+            field: {'old': old.get(field), 'new': new.get(field)}
+            for field in DIFF_FIELDS
+            if old.get(field) != new.get(field)
+        }
+        modified.append({'code': new['code'], 'name': new.get('name'), 'changes': changes})
+    
+    # 按股票代码排序
+    added.sort(key=lambda x: x['code'])
+    removed.sort(key=lambda x: x['code'])
+    modified.sort(key=lambda x: x['code'])
+    
+    return added, removed, modified
 
 
 def compare_lists(old_data, new_data):
@@ -22,47 +91,28 @@ def compare_lists(old_data, new_data):
         print("✓ 首次运行，初始化数据")
         return None
     
-    # 提取股票代码集合
-    old_codes = {stock['code'] for stock in old_data['stocks']}
-    new_codes = {stock['code'] for stock in new_data['stocks']}
-    
-    # 检测新增和删除
-    added_codes = new_codes - old_codes
-    removed_codes = old_codes - new_codes
+    added_stocks, removed_stocks, modified_stocks = diff_stocks(old_data['stocks'], new_data['stocks'])
     
     # 如果没有变化
-    if not added_codes and not removed_codes:
+    if not added_stocks and not removed_stocks and not modified_stocks:
         print("✓ 名单无变化")
         return None
     
-    # 构建详细的变化信息
-    added_stocks = [
-        stock for stock in new_data['stocks'] 
-        if stock['code'] in added_codes
-    ]
-    
-    removed_stocks = [
-        stock for stock in old_data['stocks'] 
-        if stock['code'] in removed_codes
-    ]
-    
-    # 按股票代码排序
-    added_stocks.sort(key=lambda x: x['code'])
-    removed_stocks.sort(key=lambda x: x['code'])
-    
     change_record = {
         'date': new_data['date'],
         'timestamp': datetime.now().isoformat(),
         'old_total': old_data['total'],
         'new_total': new_data['total'],
-        'net_change': len(added_codes) - len(removed_codes),
+        'net_change': len(added_stocks) - len(removed_stocks),
         'added': added_stocks,
-        'removed': removed_stocks
+        'removed': removed_stocks,
+        'modified': modified_stocks
     }
     
     print(f"✓ 检测到变化:")
     print(f"  新增: {len(added_stocks)} 只")
     print(f"  移除: {len(removed_stocks)} 只")
+    print(f"  属性变化: {len(modified_stocks)} 只")
     print(f"  净变化: {change_record['net_change']:+d} 只")
     
     return change_record
@@ -80,7 +130,12 @@ def format_change_summary(change_record):
     """
     lines = []
     lines.append(f"更新日期: {change_record['date']}")
-    lines.append(f"总数变化: {change_record['old_total']} → {change_record['new_total']} ({change_record['net_change']:+d})")
+    if change_record.get('filtered'):
+        # 按订阅筛选的记录：总数是整个名单的，净变化只计算列出的股票
+        lines.append(f"名单总数: {change_record['old_total']} → {change_record['new_total']}（整个名单）")
+        lines.append(f"相关股票净变化: {change_record['net_change']:+d}")
+    else:
+        lines.append(f"总数变化: {change_record['old_total']} → {change_record['new_total']} ({change_record['net_change']:+d})")
     
     if change_record['added']:
         lines.append(f"\n新增 {len(change_record['added'])} 只股票:")
@@ -92,6 +147,14 @@ def format_change_summary(change_record):
         for stock in change_record['removed']:
             lines.append(f"  [{stock['code']}] {stock['name']}")
     
+    modified = change_record.get('modified', [])
+    if modified:
+        lines.append(f"\n属性变化 {len(modified)} 只股票:")
+        for stock in modified:
+            details = '，'.join(f"{FIELD_LABELS.get(field, field)}: {change['old']} → {change['new']}"
+                               for field, change in stock['changes'].items())
+            lines.append(f"  [{stock['code']}] {stock['name']} ({details})")
+    
     return '\n'.join(lines)
 
 
@@ -115,7 +178,7 @@ if __name__ == '__main__':
         'total': 3,
         'stocks': [
             {'code': '00001', 'name': '长和', 'currency': 'HKD'},
-            {'code': '00002', 'name': '中电控股', 'currency': 'HKD'},
+            {'code': '00002', 'name': '中电控股', 'currency': 'USD'},
             {'code': '00700', 'name': '腾讯控股', 'currency': 'HKD'},
         ]
     }
@@ -0,0 +1,322 @@
+"""
+常驻运行模块
+在一个进程中按固定间隔反复执行监控，两次检查之间保留 HTTP 连接池、缓存和各名单的内存状态，
+并在本机提供健康检查和运行指标接口
+
+邮件通知在单独的线程中发送：每次检查结束后立即投递发件箱（outbox.py）中的新通知，
+之后每 DELIVER_INTERVAL 秒重试一次到期的未送达通知，邮件发送不会推迟下一次检查
+
+接口:
+    GET /health     JSON格式的运行状态，最近一次检查有名单失败时返回 503
+    GET /metrics    Prometheus 文本格式的运行指标
+
+用法:
+    python main.py --daemon [--interval 900] [--host 127.0.0.1] [--port 8765]
+"""
+
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fetcher import HTTPCache, create_session_with_retry
+from instrument import RunRecorder
+
+
+# 默认检查间隔（秒），可用环境变量 MONITOR_INTERVAL 覆盖
+DEFAULT_INTERVAL = int(os.getenv('MONITOR_INTERVAL', '900'))
+
+# 健康检查接口默认只监听本机
+DEFAULT_HOST = os.getenv('MONITOR_HOST', '127.0.0.1')
+DEFAULT_PORT = int(os.getenv('MONITOR_PORT', '8765'))
+
+# 检查发件箱中到期通知的间隔（秒）
+DELIVER_INTERVAL = 60
+
+
+class MonitorDaemon:
+    """
+    常驻监控进程
+    
+    用法:
+        daemon = MonitorDaemon(lists, run_all, interval=900)
+        daemon.run()    # 阻塞，收到 SIGTERM/SIGINT 后完成当前检查再退出
+    """
+    
+    def __init__(self, lists, cycle, interval=DEFAULT_INTERVAL, host=DEFAULT_HOST, port=DEFAULT_PORT, cache=None,
+                 deliver=None):
+        """
+        Args:
+            lists: 名单配置列表
+            cycle: 执行一次检查的函数，签名同 main.run_all(lists, cache, session, states, recorder)
+            interval: 两次检查开始时间的间隔（秒）
+            host: 健康检查接口监听地址
+            port: 健康检查接口端口，0 表示不启动接口
+            cache: HTTPCache 实例（可选），默认使用本地缓存目录
+            deliver: 发送发件箱中通知的函数（可选），签名同 main.deliver_notifications(lists)
+        """
+        self.lists = lists
+        self.cycle = cycle
+        self.deliver = deliver
+        self.interval = interval
+        self.host = host
+        self.port = port
+        
+        # 两次检查之间保留的资源
+        self.cache = cache or HTTPCache()
+        self.session = create_session_with_retry(cache=self.cache, pool_size=max(10, 2 * len(lists)))
+        self.states = {}
+        
+        self._stop = threading.Event()
+        self._deliver_now = threading.Event()
+        self._lock = threading.Lock()
+        self._server = None
+        self.started_at = time.time()
+        self.next_run = None
+        self.metrics = {
+            'cycles': 0,
+            'failed_cycles': 0,
+            'last_cycle': None,
+            'lists': {},
+            'notifications': {'delivered': 0, 'retrying': 0, 'failed': 0}
+        }
+    
+    def run_cycle(self):
+        """
+        执行一次检查并记录指标（各阶段指标同时追加到 metrics.json）
+        
+        Returns:
+            dict: {名单名称: (返回码, 耗时秒数)}
+        """
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        recorder = RunRecorder()
+        
+        results = self.cycle(self.lists, cache=self.cache, session=self.session, states=self.states,
+                             recorder=recorder)
+        
+        seconds = time.perf_counter() - started
+        cpu_seconds = time.process_time() - cpu_started
+        failed = any(code != 0 for code, _ in results.values())
+        recorder.save(1 if failed else 0)
+        
+        with self._lock:
+            self.metrics['cycles'] += 1
+            if failed:
+                self.metrics['failed_cycles'] += 1
+            self.metrics['last_cycle'] = {
+                'finished_at': time.time(),
+                'seconds': seconds,
+                'cpu_seconds': cpu_seconds,
+                'failed': failed
+            }
+            for name, (code, list_seconds) in results.items():
+                entry = self.metrics['lists'].setdefault(name, {
+                    'checks': 0,
+                    'failures': 0,
+                    'fast_path': 0,
+                    'last_success': None
+                })
+                entry['checks'] += 1
+                entry['code'] = code
+                entry['seconds'] = list_seconds
+                entry['stages'] = {
+                    stage: values['seconds'] for stage, values in recorder.lists[name].stages.items()
+                } if name in recorder.lists else {}
+                last_check = self.states.get(name, {}).get('last_check') or {}
+                entry['path'] = last_check.get('path') if code == 0 else None
+                if code == 0:
+                    entry['last_success'] = time.time()
+                    if entry['path'] == 'fast':
+                        entry['fast_path'] += 1
+                else:
+                    entry['failures'] += 1
+        
+        print(f"\n{'✗' if failed else '✓'} 第 {self.metrics['cycles']} 次检查完成: "
+              f"耗时 {seconds * 1000:.0f} ms，CPU {cpu_seconds * 1000:.0f} ms")
+        self._deliver_now.set()
+        return results
+    
+    def run_deliveries(self):
+        """发送线程：每次检查结束后或每 DELIVER_INTERVAL 秒投递一次发件箱，直到停止"""
+        while True:
+            self._deliver_now.wait(DELIVER_INTERVAL)
+            self._deliver_now.clear()
+            if self._stop.is_set():
+                break
+            try:
+                summaries = self.deliver(self.lists)
+            except Exception as e:
+                print(f"✗ 通知发送失败: {str(e)}")
+                continue
+            with self._lock:
+                for summary in summaries.values():
+                    for key in self.metrics['notifications']:
+                        self.metrics['notifications'][key] += summary[key]
+    
+    def health(self):
+        """
+        返回健康状态
+        
+        Returns:
+            tuple: (HTTP状态码, 状态字典)
+        """
+        with self._lock:
+            last_cycle = self.metrics['last_cycle']
+            if last_cycle is None:
+                status = 'starting'
+            else:
+                status = 'failing' if last_cycle['failed'] else 'ok'
+            
+            body = {
+                'status': status,
+                'started_at': datetime.fromtimestamp(self.started_at).isoformat(),
+                'uptime_seconds': round(time.time() - self.started_at, 1),
+                'interval_seconds': self.interval,
+                'cycles': self.metrics['cycles'],
+                'next_run_in_seconds': round(max(0.0, self.next_run - time.monotonic()), 1)
+                if self.next_run is not None else None,
+                'last_cycle': dict(last_cycle, finished_at=datetime.fromtimestamp(last_cycle['finished_at']).isoformat())
+                if last_cycle else None,
+                'lists': {
+                    name: {
+                        'code': entry.get('code'),
+                        'path': entry.get('path'),
+                        'seconds': round(entry.get('seconds', 0), 3),
+                        'last_success': datetime.fromtimestamp(entry['last_success']).isoformat()
+                        if entry['last_success'] else None
+                    }
+                    for name, entry in self.metrics['lists'].items()
+                }
+            }
+        
+        return (503 if status == 'failing' else 200), body
+    
+    def render_metrics(self):
+        """
+        生成 Prometheus 文本格式的运行指标
+        
+        Returns:
+            str: 指标文本
+        """
+        with self._lock:
+            last_cycle = self.metrics['last_cycle'] or {}
+            lines = [
+                '# TYPE monitor_uptime_seconds gauge',
+                f"monitor_uptime_seconds {time.time() - self.started_at:.1f}",
+                '# TYPE monitor_cycles_total counter',
+                f"monitor_cycles_total {self.metrics['cycles']}",
+                '# TYPE monitor_failed_cycles_total counter',
+                f"monitor_failed_cycles_total {self.metrics['failed_cycles']}",
+                '# TYPE monitor_last_cycle_seconds gauge',
+                f"monitor_last_cycle_seconds {last_cycle.get('seconds', 0):.6f}",
+                '# TYPE monitor_last_cycle_cpu_seconds gauge',
+                f"monitor_last_cycle_cpu_seconds {last_cycle.get('cpu_seconds', 0):.6f}"
+            ]
+            for key, count in self.metrics['notifications'].items():
+                lines.append(f"# TYPE monitor_notifications_{key}_total counter")
+                lines.append(f"monitor_notifications_{key}_total {count}")
+            
+            per_list = [
+                ('monitor_list_checks_total', 'counter', lambda entry: entry['checks']),
+                ('monitor_list_failures_total', 'counter', lambda entry: entry['failures']),
+                ('monitor_list_fast_path_total', 'counter', lambda entry: entry['fast_path']),
+                ('monitor_list_last_check_seconds', 'gauge', lambda entry: f"{entry.get('seconds', 0):.6f}"),
+                ('monitor_list_last_success_timestamp', 'gauge', lambda entry: f"{entry['last_success'] or 0:.0f}")
+            ]
+            for metric, kind, value in per_list:
+                lines.append(f"# TYPE {metric} {kind}")
+                for name, entry in self.metrics['lists'].items():
+                    lines.append(f'{metric}{{list="{name}"}} {value(entry)}')
+            
+            lines.append('# TYPE monitor_list_stage_seconds gauge')
+            for name, entry in self.metrics['lists'].items():
+                for stage, stage_seconds in entry.get('stages', {}).items():
+                    lines.append(f'monitor_list_stage_seconds{{list="{name}",stage="{stage}"}} {stage_seconds:.6f}')
+        
+        return '\n'.join(lines) + '\n'
+    
+    def start_server(self):
+        """在后台线程中启动健康检查接口"""
+        if not self.port:
+            return None
+        
+        daemon = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                if path == '/health':
+                    code, body = daemon.health()
+                    payload = json.dumps(body, ensure_ascii=False, indent=2).encode('utf-8')
+                    content_type = 'application/json; charset=utf-8'
+                elif path == '/metrics':
+                    code = 200
+                    payload = daemon.render_metrics().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                
+                self.send_response(code)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+        
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"✓ 健康检查接口: http://{self.host}:{self._server.server_port}/health 和 /metrics")
+        return self._server
+    
+    def stop(self, signum=None, frame=None):
+        """请求停止：当前检查完成后退出主循环（可作为信号处理函数）"""
+        if signum is not None:
+            print(f"\n收到信号 {signal.Signals(signum).name}，当前检查完成后退出")
+        self._stop.set()
+    
+    def run(self):
+        """
+        运行主循环，直到收到 SIGTERM/SIGINT
+        
+        Returns:
+            int: 退出码，0 表示正常退出
+        """
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        
+        self.start_server()
+        deliverer = None
+        if self.deliver:
+            # 先投递上次运行留下的未送达通知
+            self._deliver_now.set()
+            deliverer = threading.Thread(target=self.run_deliveries, name='outbox', daemon=True)
+            deliverer.start()
+        print(f"✓ 常驻运行: 每 {self.interval} 秒检查一次，监控 {len(self.lists)} 个名单")
+        
+        try:
+            while not self._stop.is_set():
+                # 按固定间隔安排下一次检查；检查耗时超过间隔时立即开始下一次
+                self.next_run = time.monotonic() + self.interval
+                self.run_cycle()
+                self._stop.wait(max(0.0, self.next_run - time.monotonic()))
+        finally:
+            if deliverer:
+                # 等待正在进行的投递完成，未送达的通知留在发件箱中下次启动时发送
+                self._deliver_now.set()
+                deliverer.join()
+            if self._server:
+                self._server.shutdown()
+                self._server.server_close()
+            self.session.close()
+        
+        print(f"✓ 已停止常驻运行，共执行 {self.metrics['cycles']} 次检查")
+        return 0
@@ -1,305 +1,652 @@
 """
 邮件发送模块
 负责发送变化通知邮件
+
+收件人来自环境变量 RECIPIENT_EMAIL（逗号、分号或换行分隔）和 RECIPIENT_FILE（每行一个地址，# 开头为注释），
+每位收件人单独收到一封邮件。发送时最多同时打开 SMTP_MAX_CONNECTIONS 个连接，
+每个连接登录一次后连续发送多封邮件，连接断开或临时失败时重新连接并重试
 """
 
 import smtplib
 import os
+import queue
+import re
+import threading
+from html import escape
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 
+from comparator import FIELD_LABELS, format_change_summary
+from instrument import count
+
+
+# SMTP服务器，默认为 Gmail
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+
+# 同时打开的最大连接数（Gmail 对单个账号的并发连接有限制，不宜过大）
+SMTP_MAX_CONNECTIONS = int(os.getenv('SMTP_MAX_CONNECTIONS', '4'))
+
+# 每个连接最多发送的邮件数，达到后重新连接
+MESSAGES_PER_CONNECTION = 100
+
+# 连接断开或临时失败（4xx）时每位收件人的最多重试次数
+SEND_RETRIES = 2
+
+SMTP_TIMEOUT = 30
+
+
+# 邮件模板在导入时组装一次，渲染时只填入数据并把片段追加到列表，最后一次性拼接
+_NEEDS_ESCAPE = re.compile(r'[&<>"\']').search
+
+_EMAIL_STYLE = """
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif;
+            line-height: 1.6;
+            color: #333;
+            max-width: 600px;
+            margin: 0 auto;
+            padding: 20px;
+            background-color: #f5f5f5;
+        }
+        .container {
+            background: white;
+            border-radius: 12px;
+            padding: 30px;
+            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+        }
+        .header {
+            text-align: center;
+            padding-bottom: 20px;
+            border-bottom: 3px solid #3b82f6;
+            margin-bottom: 30px;
+        }
+        .header h1 {
+            margin: 0;
+            color: #1e293b;
+            font-size: 24px;
+        }
+        .header .date {
+            color: #64748b;
+            font-size: 14px;
+            margin-top: 8px;
+        }
+        .stats {
+            display: flex;
+            justify-content: space-around;
+            margin: 20px 0;
+            padding: 20px;
+            background: #f8fafc;
+            border-radius: 8px;
+        }
+        .stat {
+            text-align: center;
+        }
+        .stat-value {
+            font-size: 28px;
+            font-weight: bold;
+            margin-bottom: 5px;
+        }
+        .stat-label {
+            font-size: 12px;
+            color: #64748b;
+            text-transform: uppercase;
+        }
+        .stat-value.positive {
+            color: #00ff88;
+        }
+        .stat-value.negative {
+            color: #ff6b6b;
+        }
+        .section {
+            margin: 25px 0;
+        }
+        .section-title {
+            font-size: 16px;
+            font-weight: 600;
+            color: #1e293b;
+            margin-bottom: 15px;
+            padding-left: 12px;
+            border-left: 4px solid #3b82f6;
+        }
+        .stock-list {
+            background: #f8fafc;
+            border-radius: 8px;
+            padding: 15px;
+        }
+        .stock-item {
+            padding: 10px;
+            margin: 5px 0;
+            background: white;
+            border-radius: 6px;
+            display: flex;
+            justify-content: space-between;
+            align-items: center;
+        }
+        .stock-code {
+            font-weight: 600;
+            color: #3b82f6;
+            font-family: 'Courier New', monospace;
+        }
+        .stock-name {
+            flex: 1;
+            margin: 0 15px;
+        }
+        .stock-currency {
+            color: #64748b;
+            font-size: 12px;
+        }
+        .added-badge {
+            background: #d1fae5;
+            color: #065f46;
+            padding: 4px 12px;
+            border-radius: 12px;
+            font-size: 12px;
+            font-weight: 600;
+        }
+        .removed-badge {
+            background: #fee2e2;
+            color: #991b1b;
+            padding: 4px 12px;
+            border-radius: 12px;
+            font-size: 12px;
+            font-weight: 600;
+        }
+        .modified-badge {
+            background: #fef3c7;
+            color: #92400e;
+            padding: 4px 12px;
+            border-radius: 12px;
+            font-size: 12px;
+            font-weight: 600;
+        }
+        .footer {
+            margin-top: 30px;
+            padding-top: 20px;
+            border-top: 1px solid #e2e8f0;
+            text-align: center;
+            color: #64748b;
+            font-size: 13px;
+        }
+        .button {
+            display: inline-block;
+            padding: 12px 24px;
+            background: #3b82f6;
+            color: white !important;
+            text-decoration: none;
+            border-radius: 6px;
+            margin: 10px 0;
+            font-weight: 600;
+        }
+        .empty-state {
+            text-align: center;
+            padding: 20px;
+            color: #94a3b8;
+        }
+"""
+
+_EMAIL_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <style>""" + _EMAIL_STYLE + """    </style>
+</head>
+<body>
+    <div class="container">
+"""
+
+_SUMMARY_TEMPLATE = """        <div class="header">
+            <h1>🚨 {title}更新</h1>
+            <div class="date">{date}</div>
+        </div>
+        <div class="stats">
+            <div class="stat">
+                <div class="stat-value">{new_total}</div>
+                <div class="stat-label">{total_label}</div>
+            </div>
+            <div class="stat">
+                <div class="stat-value positive">{added}</div>
+                <div class="stat-label">新增</div>
+            </div>
+            <div class="stat">
+                <div class="stat-value negative">{removed}</div>
+                <div class="stat-label">移除</div>
+            </div>
+            <div class="stat">
+                <div class="stat-value {net_class}">{net_change:+d}</div>
+                <div class="stat-label">{net_label}</div>
+            </div>
+        </div>
+"""
+
+_SECTION_START = """        <div class="section">
+            <div class="section-title">{title} ({count})</div>
+            <div class="stock-list">
+"""
+
+_SECTION_END = """            </div>
+        </div>
+"""
+
+_BUTTON_TEMPLATE = """        <div style="text-align: center; margin: 30px 0;">
+            <a href="{url}" class="button">查看完整数据</a>
+        </div>
+"""
+
+_FOOTER_TEMPLATE = """        <div class="footer">
+            <p>此邮件由{title}监控系统自动发送</p>
+            <p>{totals_label}上次更新: {old_total} 只 → 本次更新: {new_total} 只</p>
+            <p style="margin-top: 10px; font-size: 11px;">
+                发送时间: {sent_at}
+            </p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
 
-def generate_html_email(change_record, website_url=None):
+def _escape_column(values):
+    """
+    对一列字段做HTML转义
+    
+    先把整列用 NUL 连接后检查一次，都不含特殊字符时（常见情况）原样返回；
+    否则整体转义一次再拆分，字段本身含 NUL 导致拆分结果不对应时才逐个转义
+    """
+    joined = '\0'.join(values)
+    if not _NEEDS_ESCAPE(joined):
+        return values
+    escaped = escape(joined).split('\0')
+    if len(escaped) != len(values):
+        escaped = [escape(value) for value in values]
+    return escaped
+
+
+def _modified_details(stock):
+    return '<br>'.join(escape(f"{FIELD_LABELS.get(field, field)}: {change['old']} → {change['new']}")
+                       for field, change in stock['changes'].items())
+
+
+def generate_html_email(change_record, website_url=None, list_title='港股卖空名单'):
     """
     生成HTML格式的邮件内容
     
+    股票代码、名称等来自CSV的文字都经过HTML转义
+    
     Args:
         change_record: 变化记录字典
         website_url: 网站URL（可选）
-        
+        list_title: 名单显示名称
+    
     Returns:
         str: HTML邮件内容
     """
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <style>
-            body {{
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', system-ui, sans-serif;
-                line-height: 1.6;
-                color: #333;
-                max-width: 600px;
-                margin: 0 auto;
-                padding: 20px;
-                background-color: #f5f5f5;
-            }}
-            .container {{
-                background: white;
-                border-radius: 12px;
-                padding: 30px;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-            }}
-            .header {{
-                text-align: center;
-                padding-bottom: 20px;
-                border-bottom: 3px solid #3b82f6;
-                margin-bottom: 30px;
-            }}
-            .header h1 {{
-                margin: 0;
-                color: #1e293b;
-                font-size: 24px;
-            }}
-            .header .date {{
-                color: #64748b;
-                font-size: 14px;
-                margin-top: 8px;
-            }}
-            .stats {{
-                display: flex;
-                justify-content: space-around;
-                margin: 20px 0;
-                padding: 20px;
-                background: #f8fafc;
-                border-radius: 8px;
-            }}
-            .stat {{
-                text-align: center;
-            }}
-            .stat-value {{
-                font-size: 28px;
-                font-weight: bold;
-                margin-bottom: 5px;
-            }}
-            .stat-label {{
-                font-size: 12px;
-                color: #64748b;
-                text-transform: uppercase;
-            }}
-            .stat-value.positive {{
-                color: #00ff88;
-            }}
-            .stat-value.negative {{
-                color: #ff6b6b;
-            }}
-            .section {{
-                margin: 25px 0;
-            }}
-            .section-title {{
-                font-size: 16px;
-                font-weight: 600;
-                color: #1e293b;
-                margin-bottom: 15px;
-                padding-left: 12px;
-                border-left: 4px solid #3b82f6;
-            }}
-            .stock-list {{
-                background: #f8fafc;
-                border-radius: 8px;
-                padding: 15px;
-            }}
-            .stock-item {{
-                padding: 10px;
-                margin: 5px 0;
-                background: white;
-                border-radius: 6px;
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-            }}
-            .stock-code {{
-                font-weight: 600;
-                color: #3b82f6;
-                font-family: 'Courier New', monospace;
-            }}
-            .stock-name {{
-                flex: 1;
-                margin: 0 15px;
-            }}
-            .stock-currency {{
-                color: #64748b;
-                font-size: 12px;
-            }}
-            .added-badge {{
-                background: #d1fae5;
-                color: #065f46;
-                padding: 4px 12px;
-                border-radius: 12px;
-                font-size: 12px;
-                font-weight: 600;
-            }}
-            .removed-badge {{
-                background: #fee2e2;
-                color: #991b1b;
-                padding: 4px 12px;
-                border-radius: 12px;
-                font-size: 12px;
-                font-weight: 600;
-            }}
-            .footer {{
-                margin-top: 30px;
-                padding-top: 20px;
-                border-top: 1px solid #e2e8f0;
-                text-align: center;
-                color: #64748b;
-                font-size: 13px;
-            }}
-            .button {{
-                display: inline-block;
-                padding: 12px 24px;
-                background: #3b82f6;
-                color: white !important;
-                text-decoration: none;
-                border-radius: 6px;
-                margin: 10px 0;
-                font-weight: 600;
-            }}
-            .empty-state {{
-                text-align: center;
-                padding: 20px;
-                color: #94a3b8;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>🚨 港股卖空名单更新</h1>
-                <div class="date">{change_record['date']}</div>
-            </div>
-            
-            <div class="stats">
-                <div class="stat">
-                    <div class="stat-value">{change_record['new_total']}</div>
-                    <div class="stat-label">当前总数</div>
-                </div>
-                <div class="stat">
-                    <div class="stat-value positive">{len(change_record['added'])}</div>
-                    <div class="stat-label">新增</div>
-                </div>
-                <div class="stat">
-                    <div class="stat-value negative">{len(change_record['removed'])}</div>
-                    <div class="stat-label">移除</div>
-                </div>
-                <div class="stat">
-                    <div class="stat-value {'positive' if change_record['net_change'] > 0 else 'negative'}">{change_record['net_change']:+d}</div>
-                    <div class="stat-label">净变化</div>
-                </div>
-            </div>
-    """
+    added = change_record['added']
+    removed = change_record['removed']
+    modified = change_record.get('modified', [])
+    title = escape(list_title)
+    # 按订阅筛选的记录只列出相关股票，总数仍是整个名单的
+    filtered = change_record.get('filtered', False)
     
-    # 新增股票
-    if change_record['added']:
-        html += f"""
-            <div class="section">
-                <div class="section-title">📈 新增股票 ({len(change_record['added'])})</div>
-                <div class="stock-list">
-        """
-        for stock in change_record['added']:
-            html += f"""
-                    <div class="stock-item">
-                        <span class="stock-code">{stock['code']}</span>
-                        <span class="stock-name">{stock['name']}</span>
-                        <span class="stock-currency">{stock['currency']}</span>
-                        <span class="added-badge">NEW</span>
-                    </div>
-            """
-        html += """
-                </div>
-            </div>
-        """
+    parts = [_EMAIL_HEAD, _SUMMARY_TEMPLATE.format(
+        title=title,
+        date=escape(str(change_record['date'])),
+        new_total=change_record['new_total'],
+        total_label='名单总数' if filtered else '当前总数',
+        net_label='相关净变化' if filtered else '净变化',
+        added=len(added),
+        removed=len(removed),
+        net_class='positive' if change_record['net_change'] > 0 else 'negative',
+        net_change=change_record['net_change']
+    )]
+    
+    # 新增股票（行模板为 f-string，与函数一起编译一次）
+    if added:
+        codes = _escape_column([stock['code'] for stock in added])
+        names = _escape_column([stock['name'] for stock in added])
+        currencies = _escape_column([stock.get('currency', '') for stock in added])
+        parts.append(_SECTION_START.format(title='📈 新增股票', count=len(added)))
+        parts.extend([
+            f'                <div class="stock-item"><span class="stock-code">{code}</span>'
+            f'<span class="stock-name">{name}</span><span class="stock-currency">{currency}</span>'
+            f'<span class="added-badge">NEW</span></div>\n'
+            for code, name, currency in zip(codes, names, currencies)
+        ])
+        parts.append(_SECTION_END)
     
     # 移除股票
-    if change_record['removed']:
-        html += f"""
-            <div class="section">
-                <div class="section-title">📉 移除股票 ({len(change_record['removed'])})</div>
-                <div class="stock-list">
-        """
-        for stock in change_record['removed']:
-            html += f"""
-                    <div class="stock-item">
-                        <span class="stock-code">{stock['code']}</span>
-                        <span class="stock-name">{stock['name']}</span>
-                        <span class="removed-badge">REMOVED</span>
-                    </div>
-            """
-        html += """
-                </div>
-            </div>
-        """
+    if removed:
+        codes = _escape_column([stock['code'] for stock in removed])
+        names = _escape_column([stock['name'] for stock in removed])
+        parts.append(_SECTION_START.format(title='📉 移除股票', count=len(removed)))
+        parts.extend([
+            f'                <div class="stock-item"><span class="stock-code">{code}</span>'
+            f'<span class="stock-name">{name}</span><span class="removed-badge">REMOVED</span></div>\n'
+            for code, name in zip(codes, names)
+        ])
+        parts.append(_SECTION_END)
+    
+    # 属性变化的股票
+    if modified:
+        codes = _escape_column([stock['code'] for stock in modified])
+        names = _escape_column([stock['name'] for stock in modified])
+        parts.append(_SECTION_START.format(title='✏️ 属性变化', count=len(modified)))
+        parts.extend([
+            f'                <div class="stock-item"><span class="stock-code">{code}</span>'
+            f'<span class="stock-name">{name}<br><span class="stock-currency">{_modified_details(stock)}</span></span>'
+            f'<span class="modified-badge">CHANGED</span></div>\n'
+            for code, name, stock in zip(codes, names, modified)
+        ])
+        parts.append(_SECTION_END)
     
     # 网站链接
     if website_url:
-        html += f"""
-            <div style="text-align: center; margin: 30px 0;">
-                <a href="{website_url}" class="button">查看完整数据</a>
-            </div>
-        """
+        parts.append(_BUTTON_TEMPLATE.format(url=escape(website_url)))
     
     # 页脚
-    html += f"""
-            <div class="footer">
-                <p>此邮件由港股卖空名单监控系统自动发送</p>
-                <p>上次更新: {change_record['old_total']} 只 → 本次更新: {change_record['new_total']} 只</p>
-                <p style="margin-top: 10px; font-size: 11px;">
-                    发送时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-                </p>
-            </div>
-        </div>
-    </body>
-    </html>
+    parts.append(_FOOTER_TEMPLATE.format(
+        title=title,
+        totals_label='整个名单 ' if filtered else '',
+        old_total=change_record['old_total'],
+        new_total=change_record['new_total'],
+        sent_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    ))
+    
+    return ''.join(parts)
+
+
+def generate_text_email(change_record, website_url=None, list_title='港股卖空名单'):
+    """
+    生成纯文本格式的邮件内容（与HTML内容对应，供不显示HTML的邮件客户端使用）
+    
+    Args:
+        change_record: 变化记录字典
+        website_url: 网站URL（可选）
+        list_title: 名单显示名称
+    
+    Returns:
+        str: 纯文本邮件内容
     """
+    lines = [f"{list_title}更新", '', format_change_summary(change_record)]
+    if website_url:
+        lines.extend(['', f"查看完整数据: {website_url}"])
+    lines.extend([
+        '',
+        '--',
+        f"此邮件由{list_title}监控系统自动发送",
+        f"发送时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    ])
+    return '\n'.join(lines) + '\n'
+
+
+def load_recipients(default=None):
+    """
+    读取收件人列表
+    
+    合并环境变量 RECIPIENT_EMAIL 和 RECIPIENT_FILE 指定文件中的地址，去除重复（不区分大小写）并保持顺序
+    
+    Args:
+        default: 未配置任何收件人时使用的地址（通常为发件人自己）
     
-    return html
+    Returns:
+        list: 收件人地址列表
+    """
+    entries = re.split(r'[,;\n]', os.environ.get('RECIPIENT_EMAIL', ''))
+    
+    recipient_file = os.environ.get('RECIPIENT_FILE')
+    if recipient_file:
+        try:
+            with open(recipient_file, 'r', encoding='utf-8') as f:
+                entries.extend(line.split('#', 1)[0] for line in f)
+        except Exception as e:
+            print(f"✗ 读取收件人文件失败: {str(e)}")
+    
+    recipients = []
+    seen = set()
+    for entry in entries:
+        address = entry.strip()
+        if address and address.lower() not in seen:
+            seen.add(address.lower())
+            recipients.append(address)
+    
+    if not recipients and default:
+        recipients.append(default)
+    return recipients
 
 
-def send_email(change_record, gmail_address, gmail_password, website_url=None):
+class SMTPConnection:
     """
-    发送邮件通知
+    可复用的SMTP连接
+    
+    第一次发送时才连接并登录，之后连续发送多封邮件；
+    达到 MESSAGES_PER_CONNECTION 封或出错关闭后，下一次发送时自动重新连接
+    """
+    
+    def __init__(self, host, port, username, password, starttls=True, timeout=SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.server = None
+        self.sent = 0
+        self.connects = 0
+    
+    def connect(self):
+        self.close()
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+        self.sent = 0
+        self.connects += 1
+    
+    def send(self, sender, recipient, message):
+        """
+        发送一封邮件
+        
+        Args:
+            sender: 发件人地址
+            recipient: 收件人地址
+            message: 已序列化的邮件内容（含 To 头）
+        """
+        if self.server is None or self.sent >= MESSAGES_PER_CONNECTION:
+            self.connect()
+        self.server.sendmail(sender, [recipient], message)
+        self.sent += 1
+    
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except Exception:
+            self.server.close()
+        self.server = None
+
+
+def _is_permanent(error):
+    """收件人被拒或 5xx 响应重试也不会成功；连接断开和 4xx 响应可以重试"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def deliver_messages(sender, recipients, message, username, password, host=SMTP_HOST, port=SMTP_PORT,
+                     starttls=True, max_connections=SMTP_MAX_CONNECTIONS):
+    """
+    把同一封邮件分别发送给每位收件人
+    
+    最多同时打开 max_connections 个连接，每个连接由一个线程从共享队列中取收件人依次发送
+    
+    Args:
+        sender: 发件人地址
+        recipients: 收件人地址列表
+        message: 已序列化的邮件内容（不含 To 头，发送时为每位收件人添加）
+        username: SMTP登录用户名（为空时不登录）
+        password: SMTP登录密码
+        host: SMTP服务器地址
+        port: SMTP服务器端口
+        starttls: 是否使用 STARTTLS
+        max_connections: 最大并发连接数
+    
+    Returns:
+        list: 每位收件人的发送结果 {recipient, ok, attempts, error}，顺序与 recipients 相同
+    """
+    pending = queue.Queue()
+    for recipient in recipients:
+        pending.put(recipient)
+    
+    results = {}
+    aborted = []
+    lock = threading.Lock()
+    
+    def worker():
+        connection = SMTPConnection(host, port, username, password, starttls)
+        try:
+            while True:
+                try:
+                    recipient = pending.get_nowait()
+                except queue.Empty:
+                    return
+                
+                attempts = 0
+                error = None
+                while not aborted:
+                    attempts += 1
+                    try:
+                        connection.send(sender, recipient, f"To: {recipient}\n{message}")
+                        error = None
+                        break
+                    except smtplib.SMTPAuthenticationError as e:
+                        # 登录失败时其他收件人也无法发送，停止全部发送
+                        with lock:
+                            aborted.append(e)
+                        error = e
+                        break
+                    except (smtplib.SMTPException, OSError) as e:
+                        error = e
+                        connection.close()
+                        if _is_permanent(e) or attempts > SEND_RETRIES:
+                            break
+                
+                if attempts == 0:
+                    # 登录失败后剩余的收件人不再尝试
+                    error = aborted[0]
+                with lock:
+                    results[recipient] = {
+                        'recipient': recipient,
+                        'ok': error is None,
+                        'attempts': attempts,
+                        'error': str(error) if error else None
+                    }
+        finally:
+            connection.close()
+    
+    threads = [threading.Thread(target=worker) for _ in range(max(1, min(max_connections, len(recipients))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    return [results[recipient] for recipient in recipients]
+
+
+def send_notification(change_record, gmail_address, gmail_password, website_url=None, list_title='港股卖空名单',
+                      recipients=None, host=SMTP_HOST, port=SMTP_PORT, starttls=True,
+                      max_connections=SMTP_MAX_CONNECTIONS):
+    """
+    发送邮件通知，返回每位收件人的发送结果
     
     Args:
         change_record: 变化记录字典
         gmail_address: Gmail邮箱地址
         gmail_password: Gmail应用专用密码
         website_url: 网站URL（可选）
-        
+        list_title: 名单显示名称（用于邮件标题）
+        recipients: 收件人地址列表（可选），默认由 load_recipients() 读取
+        host: SMTP服务器地址
+        port: SMTP服务器端口
+        starttls: 是否使用 STARTTLS
+        max_connections: 最大并发连接数
+    
     Returns:
-        bool: 是否发送成功
+        list: 每位收件人的发送结果 {recipient, ok, attempts, error}
     """
+    # 未配置收件人时默认发送到发件人自己
+    if recipients is None:
+        recipients = load_recipients(gmail_address)
+    
     try:
-        # 从环境变量读取收件人邮箱，如果未配置则默认发送到发件人自己
-        recipient_email = os.environ.get('RECIPIENT_EMAIL', gmail_address)
-        
         # 创建邮件
         msg = MIMEMultipart('alternative')
-        msg['Subject'] = f"🚨 港股卖空名单更新 - {change_record['date']} (新增{len(change_record['added'])} 移除{len(change_record['removed'])})"
+        modified_count = len(change_record.get('modified', []))
+        modified_note = f" 属性变化{modified_count}" if modified_count else ''
+        msg['Subject'] = f"🚨 {list_title}更新 - {change_record['date']} (新增{len(change_record['added'])} 移除{len(change_record['removed'])}{modified_note})"
         msg['From'] = gmail_address
-        msg['To'] = recipient_email  # 使用环境变量配置的收件人
-        
-        # 生成HTML内容
-        html_content = generate_html_email(change_record, website_url)
-        html_part = MIMEText(html_content, 'html', 'utf-8')
-        msg.attach(html_part)
         
-        # 发送邮件
-        print("正在连接Gmail SMTP服务器...")
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(gmail_address, gmail_password)
-        server.send_message(msg)
-        server.quit()
+        # 纯文本和HTML两个版本，邮件客户端优先显示最后一个（HTML）
+        text_content = generate_text_email(change_record, website_url, list_title)
+        msg.attach(MIMEText(text_content, 'plain', 'utf-8'))
+        html_content = generate_html_email(change_record, website_url, list_title)
+        msg.attach(MIMEText(html_content, 'html', 'utf-8'))
         
-        print(f"✓ 邮件发送成功到 {recipient_email}")
-        return True
+        # 邮件只序列化一次，发送时为每位收件人加上 To 头
+        message = msg.as_string()
         
+        # 发送邮件
+        connections = max(1, min(max_connections, len(recipients)))
+        print(f"正在连接SMTP服务器 {host}:{port}，发送给 {len(recipients)} 位收件人（{connections} 个连接）...")
+        results = deliver_messages(gmail_address, recipients, message, gmail_address, gmail_password,
+                                   host, port, starttls, max_connections)
     except Exception as e:
         print(f"✗ 邮件发送失败: {str(e)}")
-        return False
+        return [{'recipient': recipient, 'ok': False, 'attempts': 0, 'error': str(e)} for recipient in recipients]
+    
+    failed = [result for result in results if not result['ok']]
+    count('messages', len(results) - len(failed))
+    count('bytes', len(message) * (len(results) - len(failed)))
+    count('retries', sum(max(0, result['attempts'] - 1) for result in results))
+    for result in results:
+        if result['ok']:
+            retried = f"（第 {result['attempts']} 次尝试）" if result['attempts'] > 1 else ''
+            print(f"  ✓ {result['recipient']}{retried}")
+        else:
+            print(f"  ✗ {result['recipient']}: {result['error']}")
+    
+    if failed:
+        print(f"⚠ 邮件发送完成: 成功 {len(results) - len(failed)} 位，失败 {len(failed)} 位")
+    else:
+        print(f"✓ 邮件发送成功到 {len(results)} 位收件人")
+    return results
+
+
+def send_email(change_record, gmail_address, gmail_password, website_url=None, list_title='港股卖空名单', **options):
+    """
+    发送邮件通知
+    
+    Args:
+        change_record: 变化记录字典
+        gmail_address: Gmail邮箱地址
+        gmail_password: Gmail应用专用密码
+        website_url: 网站URL（可选）
+        list_title: 名单显示名称（用于邮件标题）
+        **options: 传给 send_notification() 的其他参数（recipients、host、port 等）
+    
+    Returns:
+        bool: 是否全部发送成功
+    """
+    results = send_notification(change_record, gmail_address, gmail_password, website_url, list_title, **options)
+    return all(result['ok'] for result in results)
 
 
 if __name__ == '__main__':
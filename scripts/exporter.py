@@ -0,0 +1,396 @@
+"""
+网站数据导出模块
+把名单、变化历史和统计数据导出为网站使用的精简JSON，并预先生成 gzip/brotli 压缩版本
+
+股票记录打包为数组，字段名只在文件头出现一次:
+    {"format": "packed", "version": 1, "fields": [...], "data": {... "stocks": [[...], ...]}}
+
+完整变化历史按固定大小分页导出到 history/ 目录:
+    history/index.min.json           清单：总数、累计新增/移除、分页列表（最新的在前面）
+    history/page-000000.min.json     分页：每条记录的摘要（最新的在前面）
+    history/detail/000000.min.json   详情：单条记录新增和移除的股票
+
+用法:
+    python exporter.py [--pretty] [--rebuild]
+"""
+
+import argparse
+import gzip
+import multiprocessing
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import serializer
+import storage
+from analytics import membership_stats
+from storage import (
+    HISTORY_EXPORT_LIMIT, ensure_data_dir, load_current_list, load_recent_changes, load_changes, count_changes,
+    build_stats
+)
+
+
+PACKED_FORMAT = 'packed'
+PACKED_VERSION = 1
+
+# 股票字典的字段顺序（与 fetcher 解析CSV的列顺序一致）
+STOCK_FIELDS = ['number', 'code', 'name', 'currency', 'type', 'exempt', 'remarks']
+
+# 值为股票列表、需要打包的键
+PACKED_KEYS = ('stocks', 'added', 'removed')
+
+# 只供监控内部使用、不导出到网站的名单字段
+INTERNAL_FIELDS = {'digest', 'unchanged'}
+
+# 分页导出的变化历史：目录、清单版本和每页记录数
+HISTORY_SHARD_DIR = 'history'
+HISTORY_MANIFEST_VERSION = 2
+HISTORY_PAGE_SIZE = 20
+
+# 设置 EXPORT_PRETTY=1 时额外保留带缩进的 .json 文件
+EXPORT_PRETTY_ENV = 'EXPORT_PRETTY'
+
+# 多个名单并发导出时执行 brotli 压缩的进程池（见 parallel_compression）
+_compression_pool = None
+
+
+def _pack_value(value):
+    if isinstance(value, list):
+        return [_pack_value(item) for item in value]
+    if isinstance(value, dict):
+        return {
+            key: [[stock.get(field, '') for field in STOCK_FIELDS] for stock in item]
+            if key in PACKED_KEYS and isinstance(item, list) else _pack_value(item)
+            for key, item in value.items()
+        }
+    return value
+
+
+def _unpack_value(value, fields):
+    if isinstance(value, list):
+        return [_unpack_value(item, fields) for item in value]
+    if isinstance(value, dict):
+        return {
+            key: [dict(zip(fields, row)) for row in item]
+            if key in PACKED_KEYS and isinstance(item, list) else _unpack_value(item, fields)
+            for key, item in value.items()
+        }
+    return value
+
+
+def pack(data):
+    """
+    把数据中的股票列表打包为共享字段头的数组
+    
+    Args:
+        data: 名单、变化记录列表或其他可JSON序列化的数据
+    
+    Returns:
+        dict: 打包后的数据
+    """
+    return {
+        'format': PACKED_FORMAT,
+        'version': PACKED_VERSION,
+        'fields': STOCK_FIELDS,
+        'data': _pack_value(data)
+    }
+
+
+def unpack(packed):
+    """
+    还原 pack() 打包的数据（非打包格式原样返回）
+    
+    Args:
+        packed: pack() 的结果
+    
+    Returns:
+        原始数据
+    """
+    if not isinstance(packed, dict) or packed.get('format') != PACKED_FORMAT:
+        return packed
+    return _unpack_value(packed['data'], packed['fields'])
+
+
+def _brotli_compress(data):
+    """brotli 为可选依赖，未安装时返回None"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+@contextmanager
+def parallel_compression(workers):
+    """
+    在此期间把 brotli 压缩交给进程池执行
+    
+    brotli 压缩（quality=11）是导出阶段最耗时的部分，且执行时不释放GIL，
+    多个名单在线程中并发导出时只能轮流压缩；交给进程池后可以同时使用多个CPU。
+    进程在第一次压缩时才启动，名单都没有变化时没有额外开销
+    
+    Args:
+        workers: 进程数，小于 2 时仍在当前线程中压缩
+    """
+    global _compression_pool
+    if workers < 2:
+        yield
+        return
+    
+    # 调用方通常已经启动了其他线程，使用 spawn 避免在多线程进程中 fork
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    _compression_pool = pool
+    try:
+        yield
+    finally:
+        _compression_pool = None
+        pool.shutdown()
+
+
+def _write_if_changed(path, data):
+    """内容未变化时不重写文件，避免产生无意义的提交"""
+    if path.exists() and path.read_bytes() == data:
+        return False
+    path.write_bytes(data)
+    return True
+
+
+def write_artifact(name, data, pretty=False, directory=None, compress=True):
+    """
+    导出一个数据文件
+    
+    写入 {name}.min.json 及其 .gz/.br 压缩版本；pretty 为 False 时删除旧的 {name}.json
+    
+    Args:
+        name: 文件名（不含扩展名）
+        data: 要导出的数据
+        pretty: 是否同时写入带缩进的 {name}.json
+        directory: 输出目录，默认为网站数据目录
+        compress: 是否生成 .gz/.br 压缩版本
+    
+    Returns:
+        dict: 各版本的字节数 {name, pretty, min, gz, br, changed}
+    """
+    directory = directory or storage.data_dir()
+    pretty_bytes = serializer.dumps(data, pretty=True)
+    minified = serializer.dumps(pack(data))
+    # brotli 在进程池中压缩时，当前线程同时执行 gzip 压缩（zlib 压缩时释放GIL）
+    pool = _compression_pool if compress else None
+    pending = pool.submit(_brotli_compress, minified) if pool is not None else None
+    # mtime 固定为0，内容不变时压缩结果逐字节相同
+    gzipped = gzip.compress(minified, compresslevel=9, mtime=0) if compress else None
+    if pending is not None:
+        brotli_bytes = pending.result()
+    else:
+        brotli_bytes = _brotli_compress(minified) if compress else None
+    
+    changed = _write_if_changed(directory / f"{name}.min.json", minified)
+    if gzipped is not None:
+        _write_if_changed(directory / f"{name}.min.json.gz", gzipped)
+    if brotli_bytes is not None:
+        _write_if_changed(directory / f"{name}.min.json.br", brotli_bytes)
+    
+    pretty_file = directory / f"{name}.json"
+    if pretty:
+        _write_if_changed(pretty_file, pretty_bytes)
+    elif pretty_file.exists():
+        pretty_file.unlink()
+    
+    return {
+        'name': name,
+        'pretty': len(pretty_bytes),
+        'min': len(minified),
+        'gz': len(gzipped) if gzipped is not None else None,
+        'br': len(brotli_bytes) if brotli_bytes is not None else None,
+        'changed': changed
+    }
+
+
+def format_export_report(entries):
+    """
+    生成导出大小报告
+    
+    Args:
+        entries: write_artifact() 的结果列表
+    
+    Returns:
+        str: 报告文本
+    """
+    def kb(size):
+        return f"{size / 1024:.1f}" if size is not None else '-'
+    
+    lines = [f"  {'文件':<10}{'原始(KB)':>10}{'精简(KB)':>10}{'gzip(KB)':>10}{'brotli(KB)':>12}  状态"]
+    for entry in entries:
+        status = '已更新' if entry['changed'] else '无变化'
+        lines.append(f"  {entry['name']:<10}{kb(entry['pretty']):>10}{kb(entry['min']):>10}"
+                     f"{kb(entry['gz']):>10}{kb(entry['br']):>12}  {status}")
+    
+    total_pretty = sum(entry['pretty'] for entry in entries)
+    total_gz = sum(entry['gz'] for entry in entries)
+    lines.append(f"  合计: {kb(total_pretty)} KB → 精简 {kb(sum(entry['min'] for entry in entries))} KB，"
+                 f"gzip {kb(total_gz)} KB（{total_gz / total_pretty:.1%}）")
+    return '\n'.join(lines)
+
+
+def _page_name(page):
+    return f"page-{page:06d}"
+
+
+def _summarize_change(seq, record):
+    """变化记录摘要（不含股票明细）"""
+    return {
+        'id': seq,
+        'date': record['date'],
+        'timestamp': record.get('timestamp'),
+        'old_total': record['old_total'],
+        'new_total': record['new_total'],
+        'net_change': record['net_change'],
+        'added_count': len(record['added']),
+        'removed_count': len(record['removed']),
+        'modified_count': len(record.get('modified', []))
+    }
+
+
+def _load_history_manifest(shard_dir):
+    manifest_file = shard_dir / 'index.min.json'
+    if not manifest_file.exists():
+        return None
+    try:
+        return unpack(serializer.load(manifest_file))
+    except Exception as e:
+        print(f"✗ 读取历史清单失败: {str(e)}")
+        return None
+
+
+def export_history_shards(page_size=HISTORY_PAGE_SIZE, rebuild=False):
+    """
+    把完整变化历史分页导出到 history/ 目录
+    
+    分页从最旧的记录开始按固定大小划分，已满的分页和已导出的详情文件不再改变，
+    每次只需写入新记录的详情、最新的分页和清单
+    
+    Args:
+        page_size: 每页记录数
+        rebuild: 是否删除已导出的文件后完整重建（变化日志被整体重写时使用）
+    
+    Returns:
+        dict: 历史清单
+    """
+    shard_dir = storage.data_dir() / HISTORY_SHARD_DIR
+    detail_dir = shard_dir / 'detail'
+    total = count_changes()
+    
+    manifest = None if rebuild else _load_history_manifest(shard_dir)
+    if manifest is not None and (manifest.get('version') != HISTORY_MANIFEST_VERSION
+                                 or manifest.get('page_size') != page_size
+                                 or manifest.get('total_records', 0) > total):
+        manifest = None
+    if manifest is None:
+        if shard_dir.exists():
+            shutil.rmtree(shard_dir)
+        manifest = {
+            'version': HISTORY_MANIFEST_VERSION,
+            'page_size': page_size,
+            'total_records': 0,
+            'total_added': 0,
+            'total_removed': 0,
+            'pages': []
+        }
+    detail_dir.mkdir(parents=True, exist_ok=True)
+    
+    exported = manifest['total_records']
+    first_page = exported // page_size
+    records = load_changes(first_page * page_size)
+    
+    pages = [entry for entry in manifest['pages'] if entry['page'] < first_page]
+    for start in range(0, len(records), page_size):
+        page = first_page + start // page_size
+        summaries = []
+        for offset, record in enumerate(records[start:start + page_size]):
+            seq = page * page_size + offset
+            if seq >= exported:
+                detail = {
+                    'id': seq,
+                    'date': record['date'],
+                    'added': record['added'],
+                    'removed': record['removed'],
+                    'modified': record.get('modified', [])
+                }
+                write_artifact(f"{seq:06d}", detail, directory=detail_dir, compress=False)
+                manifest['total_added'] += len(record['added'])
+                manifest['total_removed'] += len(record['removed'])
+            summaries.append(_summarize_change(seq, record))
+        
+        summaries.reverse()
+        write_artifact(_page_name(page), summaries, directory=shard_dir)
+        pages.append({
+            'page': page,
+            'file': _page_name(page),
+            'count': len(summaries),
+            'first_date': summaries[-1]['date'],
+            'last_date': summaries[0]['date']
+        })
+    
+    manifest['total_records'] = total
+    manifest['pages'] = sorted(pages, key=lambda entry: entry['page'], reverse=True)
+    write_artifact('index', manifest, directory=shard_dir)
+    
+    print(f"✓ 已分页导出变化历史: {total} 条记录，{len(manifest['pages'])} 页，新增 {total - exported} 条详情")
+    return manifest
+
+
+def export_site_data(current_data=None, pretty=None, rebuild_history=False):
+    """
+    导出网站使用的全部数据文件（current、history、stats 和分页历史）
+    
+    Args:
+        current_data: 当前名单数据（可选），默认从数据存储读取
+        pretty: 是否保留带缩进的 .json 文件，默认由环境变量 EXPORT_PRETTY 决定
+        rebuild_history: 是否完整重建分页历史
+    
+    Returns:
+        list: 各文件的导出结果
+    """
+    if pretty is None:
+        pretty = os.getenv(EXPORT_PRETTY_ENV) == '1'
+    
+    current = current_data or load_current_list()
+    if current is None:
+        print("⚠ 没有当前名单，跳过导出")
+        return []
+    
+    ensure_data_dir()
+    # 快速路径使用的 digest 等内部字段不发布
+    site_current = {key: value for key, value in current.items() if key not in INTERNAL_FIELDS}
+    
+    stats = build_stats(current)
+    membership = membership_stats(current)
+    if membership is not None:
+        stats['membership'] = membership  # 长期名单统计
+    
+    entries = [
+        write_artifact('current', site_current, pretty),
+        write_artifact('history', load_recent_changes(HISTORY_EXPORT_LIMIT), pretty),
+        write_artifact('stats', stats, pretty)
+    ]
+    
+    export_history_shards(rebuild=rebuild_history)
+    
+    print("✓ 已导出网站数据")
+    print(format_export_report(entries))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description='导出网站数据文件')
+    parser.add_argument('--pretty', action='store_true', help='同时保留带缩进的 .json 文件')
+    parser.add_argument('--rebuild', action='store_true', help='完整重建分页历史')
+    args = parser.parse_args()
+    
+    return 0 if export_site_data(pretty=args.pretty or None, rebuild_history=args.rebuild) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,18 +6,333 @@
 import requests
 import re
 import csv
+import codecs
+import json
+import os
+import hashlib
+import threading
 import time
-from io import StringIO
 from datetime import datetime
-from bs4 import BeautifulSoup
+from pathlib import Path
+from html.parser import HTMLParser
+from urllib.parse import urljoin
 from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
 from urllib3.util.retry import Retry
 
+from instrument import count, count_retries
 
-def create_session_with_retry():
+
+# 港交所卖空名单页面
+BASE_URL = "https://www.hkex.com.hk/Services/Trading/Securities/Securities-Lists/Designated-Securities-Eligible-for-Short-Selling?sc_lang=zh-HK"
+
+# CSV文件链接格式 (如 ds_list20260109_c.csv)
+CSV_LINK_PATTERN = re.compile(r'ds_list(\d{8})_c\.csv')
+
+# CSV表头行中必定出现的文字（表头之前是标题说明行）
+CSV_HEADER_MARKER = '股份代號'
+
+# 流式下载时每次读取的字节数
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# HTTP缓存目录（不放在 docs/ 下，避免被发布到网站）
+HTTP_CACHE_DIR = Path(os.getenv('HTTP_CACHE_DIR', Path(__file__).parent.parent / '.cache' / 'http'))
+
+# 缓存命中时不需要保存的响应头（缓存的是解码后的响应体）
+_UNCACHED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+
+class ContentDigest:
+    """
+    计算规范化内容的 SHA-256 摘要
+    
+    规范化规则：去掉开头的UTF-8 BOM，统一 CRLF 换行为 LF，
+    使同一份名单不会因为编码细节不同而被视为变化
+    """
+    
+    _BOM = codecs.BOM_UTF8
+    
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self._head = b''
+        self._started = False
+        self._pending_cr = False
+    
+    def update(self, chunk):
+        if not self._started:
+            # 至少攒够BOM的长度再判断
+            self._head += chunk
+            if len(self._head) < len(self._BOM):
+                return
+            chunk = self._head[len(self._BOM):] if self._head.startswith(self._BOM) else self._head
+            self._head = b''
+            self._started = True
+        
+        if self._pending_cr:
+            chunk = b'\r' + chunk
+        # 块末尾的 \r 可能与下一块开头的 \n 组成 CRLF
+        self._pending_cr = chunk.endswith(b'\r')
+        if self._pending_cr:
+            chunk = chunk[:-1]
+        
+        self._hash.update(chunk.replace(b'\r\n', b'\n'))
+    
+    def tee(self, chunks):
+        """透传字节块，同时更新摘要"""
+        for chunk in chunks:
+            self.update(chunk)
+            yield chunk
+    
+    def hexdigest(self):
+        """返回摘要（不影响后续 update）"""
+        final = self._hash.copy()
+        if not self._started and self._head and not self._BOM.startswith(self._head):
+            final.update(self._head.replace(b'\r\n', b'\n'))
+        if self._pending_cr:
+            final.update(b'\r')
+        return final.hexdigest()
+
+
+class HTTPCache:
+    """
+    基于磁盘的HTTP条件请求缓存
+    
+    以URL为键保存 ETag/Last-Modified 和响应体，
+    下次请求时发送 If-None-Match/If-Modified-Since，收到304时直接复用缓存的响应体
+    """
+    
+    def __init__(self, cache_dir=HTTP_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def _paths(self, url):
+        """返回URL对应的 (元数据文件, 响应体文件) 路径"""
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{key}.json", self.cache_dir / f"{key}.body"
+    
+    def lookup(self, url):
+        """
+        查找URL的缓存条目
+        
+        Returns:
+            dict or None: 缓存元数据，不存在或响应体缺失时返回None
+        """
+        meta_file, body_file = self._paths(url)
+        
+        if not meta_file.exists() or not body_file.exists():
+            return None
+        
+        try:
+            with open(meta_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return None
+    
+    def body_path(self, url):
+        """返回URL缓存响应体的文件路径"""
+        return self._paths(url)[1]
+    
+    def open_writer(self, url, headers):
+        """
+        打开一个缓存写入器，响应体写完后调用 commit() 才会生效
+        
+        Args:
+            url: 请求URL
+            headers: 响应头
+        
+        Returns:
+            _CacheWriter: 缓存写入器
+        """
+        return _CacheWriter(self, url, headers)
+    
+    def store(self, url, headers, body):
+        """一次性保存完整的响应体"""
+        writer = self.open_writer(url, headers)
+        writer.write(body)
+        writer.commit()
+    
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+    
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+    
+    def stats(self):
+        """
+        返回缓存命中统计
+        
+        Returns:
+            dict: 命中数和未命中数
+        """
+        return {'hits': self.hits, 'misses': self.misses}
+    
+    def report(self):
+        """打印缓存命中统计"""
+        print(f"✓ HTTP缓存: 命中 {self.hits} 次，未命中 {self.misses} 次")
+
+
+class _CacheWriter:
+    """将响应体写入临时文件，提交时原子替换缓存条目"""
+    
+    def __init__(self, cache, url, headers):
+        self.cache = cache
+        self.url = url
+        self.meta = {
+            'url': url,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'headers': {k: v for k, v in headers.items() if k.lower() not in _UNCACHED_HEADERS},
+            'stored_at': datetime.now().isoformat(),
+        }
+        self.cache.cache_dir.mkdir(parents=True, exist_ok=True)
+        meta_file, body_file = self.cache._paths(url)
+        self._meta_file = meta_file
+        self._body_file = body_file
+        self._tmp_file = body_file.with_name(f"{body_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        self._handle = open(self._tmp_file, 'wb')
+        self._size = 0
+        self._digest = ContentDigest()
+        self.done = False
+    
+    def write(self, chunk):
+        self._handle.write(chunk)
+        self._digest.update(chunk)
+        self._size += len(chunk)
+    
+    def commit(self):
+        """响应体完整写入后保存缓存条目"""
+        if self.done:
+            return
+        self.done = True
+        self._handle.close()
+        self.meta['size'] = self._size
+        self.meta['digest'] = self._digest.hexdigest()
+        os.replace(self._tmp_file, self._body_file)
+        
+        tmp_meta = self._meta_file.with_name(f"{self._meta_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(tmp_meta, self._meta_file)
+    
+    def discard(self):
+        """响应体未读完时丢弃临时文件"""
+        if self.done:
+            return
+        self.done = True
+        self._handle.close()
+        try:
+            os.remove(self._tmp_file)
+        except OSError:
+            pass
+
+
+class _TeeReader:
+    """包装 urllib3 响应，流式读取的同时把响应体写入缓存"""
+    
+    def __init__(self, raw, writer):
+        self._raw = raw
+        self._writer = writer
+    
+    def stream(self, amt=2 ** 16, decode_content=True):
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            self._writer.write(chunk)
+            yield chunk
+        self._writer.commit()
+    
+    def read(self, amt=None, decode_content=True, **kwargs):
+        chunk = self._raw.read(amt, decode_content=decode_content, **kwargs)
+        if chunk:
+            self._writer.write(chunk)
+        else:
+            self._writer.commit()
+        return chunk
+    
+    def close(self):
+        self._writer.discard()
+        self._raw.close()
+    
+    def release_conn(self):
+        self._raw.release_conn()
+    
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class CachingHTTPAdapter(HTTPAdapter):
+    """
+    支持条件请求的 HTTPAdapter
+    
+    对GET请求自动附加缓存验证头，304时返回由缓存构造的200响应，
+    响应对象上的 from_cache 属性标记是否来自缓存
+    """
+    
+    def __init__(self, cache, **kwargs):
+        self.cache = cache
+        super().__init__(**kwargs)
+    
+    def send(self, request, stream=False, **kwargs):
+        if request.method != 'GET':
+            return super().send(request, stream=stream, **kwargs)
+        
+        meta = self.cache.lookup(request.url)
+        if meta:
+            if meta.get('etag'):
+                request.headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                request.headers['If-Modified-Since'] = meta['last_modified']
+        
+        response = super().send(request, stream=stream, **kwargs)
+        
+        if response.status_code == 304 and meta:
+            self.cache.record_hit()
+            return self._build_cached_response(request, response, meta)
+        
+        self.cache.record_miss()
+        response.from_cache = False
+        
+        # 只缓存带验证信息的成功响应
+        if response.status_code == 200 and (response.headers.get('ETag') or response.headers.get('Last-Modified')):
+            writer = self.cache.open_writer(request.url, response.headers)
+            if stream:
+                response.raw = _TeeReader(response.raw, writer)
+            else:
+                writer.write(response.content)
+                writer.commit()
+        
+        return response
+    
+    def _build_cached_response(self, request, not_modified, meta):
+        """用缓存的响应体构造一个200响应"""
+        not_modified.close()
+        
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(meta.get('headers', {}))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = open(self.cache.body_path(request.url), 'rb')
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = not_modified.elapsed
+        response.from_cache = True
+        response.cache_meta = meta
+        return response
+
+
+def create_session_with_retry(cache=None, pool_size=10):
     """
     创建带有重试机制的 requests session
     
+    Args:
+        cache: HTTPCache 实例（可选），提供时启用条件请求缓存
+        pool_size: 每个主机的连接池大小（并发下载时调大）
+    
     Returns:
         requests.Session: 配置好重试策略的 session
     """
@@ -30,149 +345,459 @@ def create_session_with_retry():
         status_forcelist=[429, 500, 502, 503, 504],  # 这些状态码会触发重试
     )
     
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+    if cache is not None:
+        adapter = CachingHTTPAdapter(cache, max_retries=retry_strategy, pool_maxsize=pool_size)
+    else:
+        adapter = HTTPAdapter(max_retries=retry_strategy, pool_maxsize=pool_size)
     session.mount("https://", adapter)
     session.mount("http://", adapter)
     
     return session
 
 
-def fetch_latest_csv_url():
+class _CSVLinkFinder(HTMLParser):
+    """
+    流式查找匹配的CSV链接
+    
+    first_only 为 True 时找到第一个链接后不再处理后续标签
+    """
+    
+    def __init__(self, pattern, first_only=True):
+        super().__init__(convert_charrefs=True)
+        self.pattern = pattern
+        self.first_only = first_only
+        self.links = []
+    
+    @property
+    def href(self):
+        return self.links[0] if self.links else None
+    
+    def handle_starttag(self, tag, attrs):
+        if tag != 'a' or (self.first_only and self.links):
+            return
+        for name, value in attrs:
+            if name == 'href' and value and self.pattern.search(value):
+                self.links.append(value)
+                return
+
+
+def extract_first_csv_link(chunks, encoding='utf-8', pattern=CSV_LINK_PATTERN):
+    """
+    从HTML字节块中查找第一个CSV下载链接，找到即停止读取
+    
+    Args:
+        chunks: HTML字节块迭代器
+        encoding: 页面编码
+        pattern: 链接匹配的正则表达式
+    
+    Returns:
+        str or None: 链接的href，未找到返回None
+    """
+    finder = _CSVLinkFinder(pattern)
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    
+    for chunk in chunks:
+        finder.feed(decoder.decode(chunk))
+        if finder.href is not None:
+            return finder.href
+    
+    finder.feed(decoder.decode(b'', final=True))
+    finder.close()
+    return finder.href
+
+
+def _find_csv_link_with_bs4(html, pattern=CSV_LINK_PATTERN):
+    """使用 BeautifulSoup 完整解析页面查找CSV链接（备用方案）"""
+    from bs4 import BeautifulSoup
+    
+    soup = BeautifulSoup(html, 'html.parser')
+    link = soup.find('a', href=pattern)
+    return link['href'] if link else None
+
+
+def _link_date(link, pattern=CSV_LINK_PATTERN):
+    """
+    从CSV链接中提取生效日期
+    
+    Returns:
+        str or None: YYYY-MM-DD 格式的日期，无法提取时返回None
+    """
+    # 提取日期 (格式: ds_list20260109_c.csv -> 20260109)
+    date_match = pattern.search(link)
+    if not date_match:
+        return None
+    
+    date_str = date_match.group(1)
+    # 转换为 YYYY-MM-DD 格式
+    return f"{date_str[0:4]}-{date_str[4:6]}-{date_str[6:8]}"
+
+
+def fetch_all_csv_urls(session=None, base_url=BASE_URL, pattern=CSV_LINK_PATTERN):
+    """
+    获取港交所页面上所有带日期的CSV文件链接（用于回填历史）
+    
+    Args:
+        session: requests session（可选），默认新建带重试机制的 session
+        base_url: 名单页面URL
+        pattern: CSV链接匹配的正则表达式，第一个分组为日期
+    
+    Returns:
+        list: [(CSV URL, 生效日期), ...]，按日期从旧到新排序，同一日期只保留一个
+    """
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+    }
+    
+    if session is None:
+        session = create_session_with_retry()
+    
+    print("正在连接港交所网站...")
+    response = session.get(base_url, headers=headers, timeout=60)
+    response.raise_for_status()
+    
+    finder = _CSVLinkFinder(pattern, first_only=False)
+    finder.feed(response.text)
+    finder.close()
+    
+    links = {}
+    for link in finder.links:
+        date = _link_date(link, pattern)
+        if date and date not in links:
+            links[date] = urljoin(response.url or base_url, link)
+    
+    print(f"✓ 找到 {len(links)} 个带日期的CSV文件")
+    return [(links[date], date) for date in sorted(links)]
+
+
+def fetch_latest_csv_url(session=None, base_url=BASE_URL, pattern=CSV_LINK_PATTERN):
     """
     从港交所页面获取最新CSV文件的下载链接
     
+    Args:
+        session: requests session（可选），默认新建带重试机制的 session
+        base_url: 名单页面URL
+        pattern: CSV链接匹配的正则表达式，第一个分组为日期
+    
     Returns:
         tuple: (CSV URL, 生效日期)
     """
-    base_url = "https://www.hkex.com.hk/Services/Trading/Securities/Securities-Lists/Designated-Securities-Eligible-for-Short-Selling?sc_lang=zh-HK"
-    
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
     }
     
     try:
         # 使用带重试机制的 session
-        session = create_session_with_retry()
+        if session is None:
+            session = create_session_with_retry()
         
         print("正在连接港交所网站...")
-        response = session.get(base_url, headers=headers, timeout=60)  # 增加超时时间到60秒
-        response.raise_for_status()
+        response = session.get(base_url, headers=headers, timeout=60, stream=True)  # 增加超时时间到60秒
+        count_retries(response)
         
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 查找第一个CSV下载链接（即最新的）
-        csv_links = soup.find_all('a', href=re.compile(r'ds_list\d{8}_c\.csv'))
+        try:
+            response.raise_for_status()
+            # 响应头未声明字符集时按 UTF-8 处理
+            content_type = response.headers.get('Content-Type', '')
+            encoding = response.encoding if 'charset' in content_type.lower() else 'utf-8'
+            
+            # 保留已读取的字节块，供备用解析使用
+            received = []
+            chunks = _count_bytes(response.iter_content(STREAM_CHUNK_SIZE))
+            
+            def remember(chunks):
+                for chunk in chunks:
+                    received.append(chunk)
+                    yield chunk
+            
+            # 查找第一个CSV下载链接（即最新的）
+            latest_link = extract_first_csv_link(remember(chunks), encoding, pattern)
+            
+            if latest_link is None:
+                print("  流式查找未找到链接，改用BeautifulSoup完整解析")
+                latest_link = _find_csv_link_with_bs4(b''.join(received).decode(encoding, errors='replace'), pattern)
+            elif isinstance(response.raw, _TeeReader):
+                # 页面正在写入缓存，读完剩余字节（不再解析）以便下次命中
+                for _ in chunks:
+                    pass
+        finally:
+            response.close()
         
-        if not csv_links:
+        if not latest_link:
             raise Exception("未找到CSV下载链接")
         
-        # 获取最新的链接
-        latest_link = csv_links[0]['href']
-        
-        # 提取日期 (格式: ds_list20260109_c.csv -> 20260109)
-        date_match = re.search(r'ds_list(\d{8})_c\.csv', latest_link)
-        if date_match:
-            date_str = date_match.group(1)
-            # 转换为 YYYY-MM-DD 格式
-            effective_date = f"{date_str[0:4]}-{date_str[4:6]}-{date_str[6:8]}"
-        else:
-            effective_date = datetime.now().strftime('%Y-%m-%d')
+        effective_date = _link_date(latest_link, pattern) or datetime.now().strftime('%Y-%m-%d')
         
         # 构建完整URL
-        if latest_link.startswith('http'):
-            csv_url = latest_link
-        else:
-            csv_url = f"https://www.hkex.com.hk{latest_link}"
+        csv_url = urljoin(response.url or base_url, latest_link)
         
         print(f"✓ 找到最新CSV: {csv_url}")
         print(f"✓ 生效日期: {effective_date}")
         
         return csv_url, effective_date
-        
+    
     except Exception as e:
         print(f"✗ 获取CSV链接失败: {str(e)}")
         raise
 
 
-def parse_csv_data(csv_url):
+def _count_bytes(chunks):
+    """把读取的响应体字节数计入运行指标"""
+    for chunk in chunks:
+        count('bytes', len(chunk))
+        yield chunk
+
+
+def _iter_decoded_lines(chunks, encoding='utf-8-sig'):
     """
-    下载并解析CSV数据
+    把字节块增量解码为文本行
+    
+    行尾保留换行符，以便 csv 模块正确处理带引号字段内的换行
+    
+    Args:
+        chunks: 字节块迭代器
+        encoding: 文本编码（默认处理BOM）
+    
+    Yields:
+        str: 一行文本
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    
+    for chunk in chunks:
+        parts = (pending + decoder.decode(chunk)).split('\n')
+        # 最后一段可能是不完整的行，留到下一块
+        pending = parts.pop()
+        for part in parts:
+            yield part + '\n'
+    
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def _row_to_stock(row):
+    """把一行CSV数据转换为股票字典"""
+    return {
+        'number': row[0].strip(),
+        'code': row[1].strip(),
+        'name': row[2].strip(),
+        'currency': row[3].strip(),
+        'type': row[4].strip() if len(row) > 4 else '',
+        'exempt': row[5].strip() if len(row) > 5 else '',
+        'remarks': row[6].strip() if len(row) > 6 else ''
+    }
+
+
+def open_csv_response(csv_url, session=None):
+    """
+    以流式方式打开CSV下载响应
     
     Args:
         csv_url: CSV文件的URL
-        
+        session: requests session（可选），默认新建带重试机制的 session
+    
     Returns:
-        list: 股票列表，每个元素是一个字典
+        requests.Response: 尚未读取响应体的响应
     """
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
     }
     
-    try:
-        # 使用带重试机制的 session
+    # 使用带重试机制的 session
+    if session is None:
         session = create_session_with_retry()
+    
+    response = session.get(csv_url, headers=headers, timeout=60, stream=True)  # 增加超时时间到60秒
+    count_retries(response)
+    
+    try:
+        response.raise_for_status()
+    except Exception:
+        response.close()
+        raise
+    
+    return response
+
+
+def iter_response_stocks(response, digest=None, header_marker=CSV_HEADER_MARKER):
+    """
+    从流式响应中逐行解析股票
+    
+    边下载边解码、边查找表头并产出股票，内存占用不随文件大小增长
+    
+    Args:
+        response: open_csv_response() 返回的响应
+        digest: ContentDigest 实例（可选），读取的同时计算内容摘要
+        header_marker: 表头行中必定出现的文字
+    
+    Yields:
+        dict: 股票字典
+    """
+    try:
+        chunks = _count_bytes(response.iter_content(STREAM_CHUNK_SIZE))
+        if digest is not None:
+            chunks = digest.tee(chunks)
+        yield from _iter_chunk_stocks(chunks, header_marker)
+    finally:
+        response.close()
+
+
+def _iter_chunk_stocks(chunks, header_marker=CSV_HEADER_MARKER):
+    """从CSV字节块中逐行解析股票"""
+    # 使用csv模块正确解析（避免字段中的逗号导致错误）
+    csv_reader = csv.reader(_iter_decoded_lines(chunks))
+    
+    # 找到表头行（如包含"數目,股份代號,股份簡稱"）
+    for row in csv_reader:
+        if any(header_marker in cell for cell in row):
+            break
+    else:
+        raise Exception("CSV格式不正确：未找到表头")
+    
+    # 解析数据
+    for row in csv_reader:
+        # 跳过空行
+        if not row or not row[0].strip():
+            continue
         
-        print("正在下载CSV文件...")
-        response = session.get(csv_url, headers=headers, timeout=60)  # 增加超时时间到60秒
-        response.encoding = 'utf-8-sig'  # 处理BOM
-        
-        # 使用csv模块正确解析（避免字段中的逗号导致错误）
-        csv_reader = csv.reader(StringIO(response.text))
-        lines = list(csv_reader)
-        
-        # 找到表头行（包含"數目,股份代號,股份簡稱"）
-        header_index = -1
-        for i, row in enumerate(lines):
-            if any('股份代號' in cell for cell in row):
-                header_index = i
-                break
-        
-        if header_index == -1:
-            raise Exception("CSV格式不正确：未找到表头")
-        
-        # 解析数据
-        stocks = []
-        for row in lines[header_index + 1:]:
-            # 跳过空行
-            if not row or not row[0].strip():
-                continue
-            
-            if len(row) >= 4:
-                stock = {
-                    'number': row[0].strip(),
-                    'code': row[1].strip(),
-                    'name': row[2].strip(),
-                    'currency': row[3].strip(),
-                    'type': row[4].strip() if len(row) > 4 else '',
-                    'exempt': row[5].strip() if len(row) > 5 else '',
-                    'remarks': row[6].strip() if len(row) > 6 else ''
-                }
-                stocks.append(stock)
+        if len(row) >= 4:
+            yield _row_to_stock(row)
+
+
+def iter_csv_stocks(csv_url, session=None, digest=None, header_marker=CSV_HEADER_MARKER):
+    """
+    流式下载并逐行解析CSV数据
+    
+    Args:
+        csv_url: CSV文件的URL
+        session: requests session（可选），默认新建带重试机制的 session
+        digest: ContentDigest 实例（可选），读取的同时计算内容摘要
+        header_marker: 表头行中必定出现的文字
+    
+    Yields:
+        dict: 股票字典
+    """
+    yield from iter_response_stocks(open_csv_response(csv_url, session), digest, header_marker)
+
+
+def _collect_stocks(stocks):
+    """读取股票迭代器中的全部股票"""
+    try:
+        stocks = list(stocks)
+        count('rows', len(stocks))
         
         print(f"✓ 成功解析 {len(stocks)} 只股票")
         return stocks
-        
+    
     except Exception as e:
         print(f"✗ 解析CSV失败: {str(e)}")
         raise
 
 
-def fetch_latest_list():
+def parse_csv_data(csv_url, session=None, digest=None, header_marker=CSV_HEADER_MARKER):
     """
-    获取最新的卖空名单
+    下载并解析CSV数据
+    
+    Args:
+        csv_url: CSV文件的URL
+        session: requests session（可选），默认新建带重试机制的 session
+        digest: ContentDigest 实例（可选），读取的同时计算内容摘要
+        header_marker: 表头行中必定出现的文字
     
     Returns:
-        dict: 包含日期和股票列表的字典
+        list: 股票列表，每个元素是一个字典
     """
-    csv_url, effective_date = fetch_latest_csv_url()
-    stocks = parse_csv_data(csv_url)
+    try:
+        print("正在下载CSV文件...")
+        response = open_csv_response(csv_url, session)
+    except Exception as e:
+        print(f"✗ 解析CSV失败: {str(e)}")
+        raise
     
+    return _collect_stocks(iter_response_stocks(response, digest, header_marker))
+
+
+def _unchanged_result(effective_date, known):
+    """内容摘要未变化时的精简结果（不含 stocks）"""
     return {
+        'date': effective_date,
+        'total': known.get('total'),
+        'digest': known['digest'],
+        'unchanged': True,
+        'fetched_at': datetime.now().isoformat()
+    }
+
+
+def fetch_latest_list(cache=None, known=None, base_url=BASE_URL, pattern=CSV_LINK_PATTERN,
+                      header_marker=CSV_HEADER_MARKER, session=None):
+    """
+    获取最新的卖空名单
+    
+    CSV内容摘要与上次相同时走快速路径：不解析CSV，返回带 unchanged 标记的精简结果。
+    304命中缓存时直接使用缓存元数据中的摘要，不读取响应体；
+    其他情况（200响应、港交所未提供 ETag/Last-Modified）先读取响应体计算摘要，摘要不同时才解析
+    
+    Args:
+        cache: HTTPCache 实例（可选），默认使用 HTTP_CACHE_DIR 下的磁盘缓存
+        known: 上次检查记录（可选），包含 date 和 digest
+        base_url: 名单页面URL
+        pattern: CSV链接匹配的正则表达式，第一个分组为日期
+        header_marker: CSV表头行中必定出现的文字
+        session: requests session（可选），多个名单共用连接池时传入；需已挂载 cache 对应的缓存适配器
+    
+    Returns:
+        dict: 包含日期、股票列表和内容摘要的字典；
+              快速路径下不含 stocks，unchanged 为 True
+    """
+    if cache is None:
+        cache = HTTPCache()
+    if session is None:
+        session = create_session_with_retry(cache=cache)
+    
+    csv_url, effective_date = fetch_latest_csv_url(session, base_url, pattern)
+    
+    try:
+        print("正在下载CSV文件...")
+        response = open_csv_response(csv_url, session)
+    except Exception as e:
+        print(f"✗ 解析CSV失败: {str(e)}")
+        raise
+    
+    known_digest = known.get('digest') if known and known.get('date') == effective_date else None
+    
+    # 304命中缓存时，缓存元数据里已有内容摘要，无需读取响应体
+    cached_digest = response.cache_meta.get('digest') if getattr(response, 'from_cache', False) else None
+    if known_digest and cached_digest == known_digest:
+        response.close()
+        cache.report()
+        print(f"✓ CSV内容摘要未变化 ({known_digest[:12]})，跳过解析（缓存命中）")
+        return _unchanged_result(effective_date, known)
+    
+    digest = ContentDigest()
+    if known_digest:
+        # 先读完响应体并计算摘要，摘要相同时不解析CSV、不构造股票字典
+        try:
+            chunks = list(digest.tee(_count_bytes(response.iter_content(STREAM_CHUNK_SIZE))))
+        finally:
+            response.close()
+        if digest.hexdigest() == known_digest:
+            cache.report()
+            print(f"✓ CSV内容摘要未变化 ({known_digest[:12]})，跳过解析")
+            return _unchanged_result(effective_date, known)
+        stocks = _collect_stocks(_iter_chunk_stocks(chunks, header_marker))
+    else:
+        stocks = _collect_stocks(iter_response_stocks(response, digest, header_marker))
+    cache.report()
+    
+    data = {
         'date': effective_date,
         'total': len(stocks),
         'stocks': stocks,
+        'digest': digest.hexdigest(),
         'fetched_at': datetime.now().isoformat()
     }
+    
+    return data
 
 
 if __name__ == '__main__':
@@ -0,0 +1,408 @@
+"""
+Git 历史导入模块
+工作流每次数据变化都会提交数据文件，仓库的 git 历史因此保存了每一版名单和变化历史。
+本模块从 git 历史中读取这些文件的全部版本，恢复完整的名单序列和变化记录，写入监控的数据存储
+
+读取的文件（按存储命名空间）:
+    名单        docs/data/current.json、docs/data/current.min.json、data/current.json
+    变化历史    docs/data/history.json、docs/data/history.min.json、data/changes.jsonl
+
+步骤:
+    1. 一次 git log 列出修改过这些文件的全部提交及文件版本的对象ID
+    2. 按对象ID去重后，通过一个 git cat-file --batch 进程依次读取全部文件版本
+    3. 在进程池中解析（同时在途的文件数有上限，不会把全部版本留在内存中）
+    4. 每个日期保留最后一次提交的名单（从新到旧读取，较早提交中同一日期的名单只读出日期、不解析），
+       按日期重放对比得到变化记录；
+       与文件中保存的变化记录（包括导出时已截断的记录）及已有的变化历史合并
+    5. 保存变化历史，重建统计数据、快照存储、区间索引和网站数据（与 backfill.py 相同）
+
+用法:
+    python history_import.py [--rev HEAD] [--workers 4] [--list ds_c] [--dry-run]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from pathlib import Path
+
+import serializer
+from backfill import save_backfill
+from comparator import compare_lists
+from exporter import STOCK_FIELDS, unpack
+from registry import LISTS
+from storage import load_current_list, load_history, use_namespace
+
+
+# 仓库根目录
+REPO_DIR = Path(__file__).parent.parent
+
+# 各存储命名空间中名单和变化历史的历史文件（{ns} 为命名空间目录，默认名单为空）
+CURRENT_PATHS = ('docs/data/{ns}current.json', 'docs/data/{ns}current.min.json', 'data/{ns}current.json')
+HISTORY_PATHS = ('docs/data/{ns}history.json', 'docs/data/{ns}history.min.json', 'data/{ns}changes.jsonl')
+
+KIND_CURRENT = 'current'
+KIND_HISTORY = 'history'
+
+# git 中表示文件已删除的对象ID
+_NULL_OID = '0' * 40
+
+# 每个解析进程同时在途的文件数
+IN_FLIGHT_PER_WORKER = 4
+
+# 重放得到的变化记录的时间戳（与 backfill.py 一致，使用生效日期）
+REPLAY_TIME = 'T00:00:00'
+
+# 名单文件开头的日期字段（打包格式中位于字段头之后），用于跳过同一日期较早的版本
+_DATE_FIELD = re.compile(rb'"date":\s*"(\d{4}-\d{2}-\d{2})"')
+_DATE_PEEK_BYTES = 512
+
+_stock_row = itemgetter(*STOCK_FIELDS)
+
+
+def tracked_paths(namespace=''):
+    """
+    Returns:
+        dict: {仓库中的相对路径: KIND_CURRENT 或 KIND_HISTORY}
+    """
+    ns = f"{namespace}/" if namespace else ''
+    paths = {path.format(ns=ns): KIND_CURRENT for path in CURRENT_PATHS}
+    paths.update({path.format(ns=ns): KIND_HISTORY for path in HISTORY_PATHS})
+    return paths
+
+
+def _git(repo, *args, **kwargs):
+    return subprocess.run(['git', '-C', str(repo), *args], capture_output=True, check=True, **kwargs)
+
+
+def list_file_versions(repo, rev, paths):
+    """
+    用一次 git log 列出修改过 paths 的提交
+    
+    Returns:
+        list: [(提交ID, 提交时间, 路径, 对象ID), ...]，从旧到新；删除文件的提交不列出
+    """
+    result = _git(repo, 'log', '--reverse', '--format=commit %H %ct', '--raw', '--no-abbrev', '--no-renames',
+                  rev, '--', *paths)
+    
+    versions = []
+    commit = None
+    for line in result.stdout.decode('utf-8').splitlines():
+        if line.startswith('commit '):
+            _, sha, timestamp = line.split()
+            commit = (sha, int(timestamp))
+        elif line.startswith(':'):
+            # :100644 100644 <旧对象ID> <新对象ID> M\t<路径>
+            meta, path = line.split('\t', 1)
+            oid = meta.split()[3]
+            if oid != _NULL_OID and path in paths:
+                versions.append((commit[0], commit[1], path, oid))
+    return versions
+
+
+def read_blobs(repo, oids):
+    """
+    通过一个 git cat-file --batch 进程依次读取对象内容
+    
+    Args:
+        repo: 仓库目录
+        oids: 对象ID列表
+    
+    Yields:
+        tuple: (对象ID, 内容字节)；对象不存在时不产出
+    """
+    process = subprocess.Popen(['git', '-C', str(repo), 'cat-file', '--batch', '--buffer'],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    
+    # 在单独的线程中写入请求，避免双方的管道缓冲区都写满时互相等待
+    def write_requests():
+        try:
+            for oid in oids:
+                process.stdin.write(f"{oid}\n".encode('ascii'))
+        finally:
+            process.stdin.close()
+    
+    writer = threading.Thread(target=write_requests, daemon=True)
+    writer.start()
+    try:
+        for _ in oids:
+            header = process.stdout.readline().split()
+            if len(header) != 3:
+                # <对象ID> missing
+                continue
+            size = int(header[2])
+            data = process.stdout.read(size)
+            process.stdout.read(1)  # 内容后的换行符
+            yield header[0].decode('ascii'), data
+    finally:
+        writer.join()
+        process.stdout.close()
+        process.wait()
+
+
+def parse_blob(item):
+    """
+    解析一个文件版本（在解析进程中运行）
+    
+    Args:
+        item: (对象ID, 类型, 路径, 内容字节)
+    
+    Returns:
+        tuple: (对象ID, 结果)。名单的结果为 (日期, 股票行列表)，股票行按 STOCK_FIELDS 排列；
+               变化历史的结果为变化记录列表；无法解析时结果为None
+    """
+    oid, kind, path, data = item
+    try:
+        if path.endswith('.jsonl'):
+            value = []
+            for line in data.splitlines():
+                try:
+                    value.append(serializer.loads(line))
+                except ValueError:
+                    # 中断写入留下的不完整行
+                    pass
+        else:
+            value = unpack(serializer.loads(data))
+    except Exception:
+        # 早期版本中格式不同或不完整的文件
+        return oid, None
+    
+    if kind == KIND_CURRENT:
+        if not isinstance(value, dict) or 'date' not in value or not isinstance(value.get('stocks'), list):
+            return oid, None
+        try:
+            rows = list(map(_stock_row, value['stocks']))
+        except KeyError:
+            # 早期版本缺少部分字段
+            rows = [tuple(stock.get(field) for field in STOCK_FIELDS) for stock in value['stocks']]
+        return oid, (value['date'], rows)
+    
+    if not isinstance(value, list):
+        return oid, None
+    return oid, [record for record in value
+                 if isinstance(record, dict) and {'date', 'added', 'removed'} <= record.keys()]
+
+
+def parse_blobs(items, workers):
+    """
+    解析文件版本，按输入顺序产出结果
+    
+    workers 大于1时在进程池中解析，同时在途的文件数不超过 workers * IN_FLIGHT_PER_WORKER
+    
+    Args:
+        items: parse_blob() 参数的可迭代对象
+        workers: 解析进程数
+    """
+    if workers <= 1:
+        yield from map(parse_blob, items)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(parse_blob, item))
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _stock_dict(row):
+    return {field: value for field, value in zip(STOCK_FIELDS, row) if value is not None}
+
+
+def _record_key(record):
+    return record['date'], record.get('timestamp') or ''
+
+
+def read_git_history(repo=REPO_DIR, rev='HEAD', namespace='', workers=None):
+    """
+    从 git 历史中读取名单序列和变化记录
+    
+    Args:
+        repo: 仓库目录
+        rev: 读取到哪个提交（可以是分支名）
+        namespace: 存储命名空间
+        workers: 解析进程数，默认为CPU核数
+    
+    Returns:
+        dict: {'lists': {日期: 股票行列表}（按日期从旧到新）, 'records': 文件中保存的变化记录,
+               'commits', 'versions', 'blobs'（去重后的文件版本数）, 'skipped'（未解析的同日期版本数）, 'seconds'}
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    paths = tracked_paths(namespace)
+    
+    versions = list_file_versions(repo, rev, paths)
+    # 按对象ID去重，从最新的提交开始读取
+    kinds = {}
+    for _, _, path, oid in reversed(versions):
+        kinds.setdefault(oid, (paths[path], path))
+    oids = list(kinds)
+    
+    skipped = 0
+    
+    def items():
+        nonlocal skipped
+        claimed = set()
+        for oid, data in read_blobs(repo, oids):
+            kind, path = kinds[oid]
+            if kind == KIND_CURRENT:
+                match = _DATE_FIELD.search(data, 0, _DATE_PEEK_BYTES)
+                if match:
+                    if match.group(1) in claimed:
+                        # 同一日期已有更新的版本
+                        skipped += 1
+                        continue
+                    claimed.add(match.group(1))
+            yield oid, kind, path, data
+    
+    lists = {}
+    records = {}
+    # 相邻版本的名单大多数行相同，同样的行只保留一个对象
+    rows = {}
+    for oid, result in parse_blobs(items(), workers):
+        if result is None:
+            continue
+        if kinds[oid][0] == KIND_CURRENT:
+            # 结果按从新到旧的顺序到达，同一日期保留最先到达（最后一次提交）的名单
+            date, stock_rows = result
+            if date not in lists:
+                lists[date] = [rows.setdefault(row, row) for row in stock_rows]
+        else:
+            for record in result:
+                records.setdefault(_record_key(record), record)
+    
+    return {
+        'lists': dict(sorted(lists.items())),
+        'records': list(records.values()),
+        'commits': len({sha for sha, _, _, _ in versions}),
+        'versions': len(versions),
+        'blobs': len(oids),
+        'skipped': skipped,
+        'seconds': time.perf_counter() - started
+    }
+
+
+def replay_lists(lists):
+    """
+    按日期顺序重放 compare_lists()，生成变化记录
+    
+    Args:
+        lists: {日期: 股票行列表}，按日期从旧到新
+    
+    Returns:
+        list: 变化记录列表（最旧的在前面）
+    """
+    records = []
+    previous = None
+    # 每对名单都会打印对比结果，重放数千个名单时不输出
+    with contextlib.redirect_stdout(io.StringIO()):
+        for date, stock_rows in lists.items():
+            stocks = [_stock_dict(row) for row in stock_rows]
+            current = {'date': date, 'total': len(stocks), 'stocks': stocks}
+            change_record = compare_lists(previous, current)
+            if change_record:
+                change_record['timestamp'] = f"{date}{REPLAY_TIME}"
+                records.append(change_record)
+            previous = current
+    return records
+
+
+def merge_history(existing, recovered, replayed):
+    """
+    合并变化记录
+    
+    已有的变化历史和文件中保存的记录按 (日期, 时间戳) 去重；
+    重放得到的记录只用于补充这两者都没有记录的日期
+    
+    Returns:
+        tuple: (变化历史（最新的在前面）, 采用的重放记录数)
+    """
+    merged = {}
+    for record in list(existing) + list(recovered):
+        merged.setdefault(_record_key(record), record)
+    
+    covered = {date for date, _ in merged}
+    added = 0
+    for record in replayed:
+        if record['date'] not in covered:
+            merged[_record_key(record)] = record
+            added += 1
+    
+    return [merged[key] for key in sorted(merged, reverse=True)], added
+
+
+def import_git_history(repo=REPO_DIR, rev='HEAD', namespace='', workers=None, dry_run=False):
+    """
+    从 git 历史导入名单序列和变化记录到当前的存储命名空间
+    
+    Args:
+        repo: 仓库目录
+        rev: 读取到哪个提交
+        namespace: git 历史中数据文件所在的存储命名空间
+        workers: 解析进程数，默认为CPU核数
+        dry_run: 只读取和合并，不写入数据存储
+    
+    Returns:
+        dict: 导入结果 {'lists', 'history', 'recovered', 'replayed', 'commits', 'versions', 'blobs', 'skipped', 'seconds'}
+    """
+    result = read_git_history(repo, rev, namespace, workers)
+    lists = result['lists']
+    print(f"✓ 已读取 {result['commits']} 个提交中的 {result['versions']} 个文件版本"
+          f"（去重后 {result['blobs']} 个，跳过同一日期较早的 {result['skipped']} 个），得到 {len(lists)} 个日期的名单和 "
+          f"{len(result['records'])} 条变化记录，耗时 {result['seconds']:.2f} 秒")
+    
+    replayed = replay_lists(lists)
+    history, added = merge_history(load_history(), result['records'], replayed)
+    summary = {
+        'lists': len(lists),
+        'history': len(history),
+        'recovered': len(result['records']),
+        'replayed': added,
+        **{key: result[key] for key in ('commits', 'versions', 'blobs', 'skipped', 'seconds')}
+    }
+    print(f"  合并后共 {len(history)} 条变化记录（其中 {summary['replayed']} 条由重放名单得到）")
+    
+    if dry_run or not lists:
+        if not lists:
+            print("⚠ git 历史中没有名单文件，未写入数据存储")
+        return summary
+    
+    last_date = next(reversed(lists))
+    snapshots = ((date, [_stock_dict(row) for row in stock_rows]) for date, stock_rows in lists.items())
+    current = load_current_list()
+    if current is None:
+        stocks = [_stock_dict(row) for row in lists[last_date]]
+        current = {'date': last_date, 'total': len(stocks), 'stocks': stocks}
+    save_backfill(history, snapshots, last_date, current)
+    
+    print(f"✓ 导入完成: {len(lists)} 个日期的名单，{len(history)} 条变化记录")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从 git 历史导入名单和变化记录')
+    parser.add_argument('--repo', type=Path, default=REPO_DIR, help='仓库目录')
+    parser.add_argument('--rev', default='HEAD', help='读取到哪个提交')
+    parser.add_argument('--workers', type=int, help='解析进程数，默认为CPU核数')
+    parser.add_argument('--list', default='ds_c', choices=sorted(LISTS), help='要导入的名单（见 registry.py）')
+    parser.add_argument('--dry-run', action='store_true', help='只读取和合并，不写入数据存储')
+    args = parser.parse_args()
+    
+    monitored = LISTS[args.list]
+    with use_namespace(monitored['namespace']):
+        import_git_history(args.repo, args.rev, monitored['namespace'], args.workers, args.dry_run)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,303 @@
+"""
+运行指标模块
+记录每次运行中各名单各阶段的耗时、HTTP重试次数、读取字节数和解析行数，以及整次运行的进程内存峰值，
+追加到本地运行状态目录的 metrics.json（保留最近 METRICS_HISTORY 次运行）
+
+内存峰值是进程启动以来的最高值（ru_maxrss），只会增长，不能说明是哪个阶段占用的内存，因此不按阶段记录
+
+阶段与 main.py 打印的 [n/5] 步骤对应（fetch、load、compare、save、notify），由 stage() 切换，
+保存之后导出网站数据文件的耗时记为 export，各名单检查结束后发送通知的耗时记为 deliver；
+count() 把计数累加到当前阶段。没有正在记录的名单时两者什么都不做，fetcher、emailer 可以直接调用
+
+使用 --profile 运行时，每个名单的检查线程各用一个 cProfile 采样，结束后合并为一个 pstats 文件
+
+用法:
+    python instrument.py              # 汇总最近的运行指标
+    python instrument.py --runs 50    # 汇总最近 50 次运行
+"""
+
+import argparse
+import contextvars
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块，不记录内存峰值
+    resource = None
+
+import storage
+
+
+METRICS_FILE = 'metrics.json'
+
+# metrics.json 中保留的运行次数
+METRICS_HISTORY = 200
+
+# 各阶段默认记录的计数
+STAGE_COUNTERS = ('retries', 'bytes', 'rows')
+
+# 当前线程（名单）正在记录的 StageRecorder
+_current = contextvars.ContextVar('stage_recorder', default=None)
+
+
+def peak_rss_kb():
+    """进程启动以来的内存峰值（KB），不支持的平台返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 的单位是字节，Linux 是 KB
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class StageRecorder:
+    """
+    一个名单一次检查（或运行结束后的通知发送）的分阶段指标
+    
+    用法:
+        with recorder.activate():
+            stage('fetch')
+            ...
+            stage('compare')
+            ...
+    """
+    
+    def __init__(self, profile=False):
+        self.stages = {}
+        self.seconds = None
+        self.profiler = None
+        if profile:
+            import cProfile
+            self.profiler = cProfile.Profile()
+        self._stage = None
+        self._stage_started = None
+    
+    def start_stage(self, name):
+        """结束当前阶段并开始新阶段"""
+        now = time.perf_counter()
+        self._end_stage(now)
+        self._stage = self.stages.setdefault(name, {'seconds': 0.0, **dict.fromkeys(STAGE_COUNTERS, 0)})
+        self._stage_started = now
+    
+    def _end_stage(self, now):
+        if self._stage is not None:
+            self._stage['seconds'] += now - self._stage_started
+            self._stage = None
+    
+    def count(self, key, n=1):
+        """累加当前阶段的计数"""
+        if self._stage is not None:
+            self._stage[key] = self._stage.get(key, 0) + n
+    
+    @contextmanager
+    def activate(self):
+        """在当前线程中记录（并在 --profile 时采样）with 块内的执行"""
+        token = _current.set(self)
+        started = time.perf_counter()
+        if self.profiler:
+            self.profiler.enable()
+        try:
+            yield self
+        finally:
+            if self.profiler:
+                self.profiler.disable()
+            now = time.perf_counter()
+            self._end_stage(now)
+            self.seconds = now - started
+            _current.reset(token)
+    
+    def to_dict(self):
+        return {
+            'seconds': round(self.seconds or 0, 6),
+            'stages': {
+                name: dict(values, seconds=round(values['seconds'], 6))
+                for name, values in self.stages.items()
+            }
+        }
+
+
+def stage(name):
+    """切换当前名单的阶段（没有正在记录的名单时忽略）"""
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.start_stage(name)
+
+
+def count(key, n=1):
+    """累加当前阶段的计数（没有正在记录的名单时忽略）"""
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.count(key, n)
+
+
+def count_retries(response):
+    """累加一个 requests 响应在 urllib3 中经历的重试次数"""
+    retries = getattr(response.raw, 'retries', None)
+    if retries is not None and retries.history:
+        count('retries', len(retries.history))
+
+
+class RunRecorder:
+    """
+    一次运行（main.py 执行一次或常驻运行检查一次）的指标
+    
+    用法:
+        recorder = RunRecorder()
+        with recorder.for_list('ds_c').activate():
+            ...
+        recorder.save(code)
+    """
+    
+    def __init__(self, profile=False):
+        self.profile = profile
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self.lists = {}
+        self.codes = {}
+        # 不属于任何名单的阶段（如运行结束后的通知发送）
+        self.run = StageRecorder(profile)
+    
+    def for_list(self, name):
+        """新建一个名单的阶段记录"""
+        recorder = self.lists[name] = StageRecorder(self.profile)
+        return recorder
+    
+    def finish(self, code):
+        """
+        生成本次运行的指标记录
+        
+        Args:
+            code: 本次运行的退出码
+        
+        Returns:
+            dict: 指标记录
+        """
+        return {
+            'started_at': self.started_at.isoformat(),
+            'seconds': round(time.perf_counter() - self._started, 6),
+            'code': code,
+            'peak_rss_kb': peak_rss_kb(),
+            'lists': {
+                name: dict(recorder.to_dict(), code=self.codes.get(name))
+                for name, recorder in self.lists.items()
+            },
+            'stages': self.run.to_dict()['stages']
+        }
+    
+    def save(self, code, **fields):
+        """
+        把本次运行追加到 metrics.json，超过 METRICS_HISTORY 次时删除最旧的
+        
+        Args:
+            code: 本次运行的退出码
+            **fields: 记录的其他字段（如 import_seconds）
+        
+        Returns:
+            dict: 指标记录
+        """
+        record = dict(self.finish(code), **fields)
+        runs = load_runs()
+        runs.append(record)
+        
+        metrics_file = storage.cache_dir() / METRICS_FILE
+        tmp_file = metrics_file.with_name(f"{METRICS_FILE}.tmp")
+        try:
+            metrics_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'runs': runs[-METRICS_HISTORY:]}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, metrics_file)
+        except Exception as e:
+            print(f"✗ 保存{METRICS_FILE}失败: {str(e)}")
+        return record
+    
+    def dump_profile(self, path):
+        """合并各线程的 cProfile 采样并写入 pstats 文件"""
+        import pstats
+        
+        profilers = [recorder.profiler for recorder in [self.run, *self.lists.values()]
+                     if recorder.profiler and recorder.profiler.getstats()]
+        if not profilers:
+            return None
+        stats = pstats.Stats(profilers[0])
+        for profiler in profilers[1:]:
+            stats.add(profiler)
+        stats.dump_stats(path)
+        return stats
+
+
+def load_runs():
+    """
+    读取 metrics.json 中的运行记录
+    
+    Returns:
+        list: 运行记录（最旧的在前面）
+    """
+    metrics_file = storage.cache_dir() / METRICS_FILE
+    if not metrics_file.exists():
+        return []
+    
+    try:
+        with open(metrics_file, 'r', encoding='utf-8') as f:
+            return json.load(f)['runs']
+    except Exception as e:
+        print(f"✗ 读取{METRICS_FILE}失败: {str(e)}")
+        return []
+
+
+def summarize(runs):
+    """
+    按名单和阶段汇总多次运行的耗时
+    
+    Returns:
+        dict: {(名单, 阶段): {'count', 'median', 'max', 'retries', 'bytes', 'rows'}}
+    """
+    samples = {}
+    for run in runs:
+        stages = [('-', name, values) for name, values in run.get('stages', {}).items()]
+        for list_name, entry in run['lists'].items():
+            stages += [(list_name, name, values) for name, values in entry['stages'].items()]
+        for list_name, name, values in stages:
+            samples.setdefault((list_name, name), []).append(values)
+    
+    summary = {}
+    for key, values in samples.items():
+        seconds = sorted(value['seconds'] for value in values)
+        summary[key] = {
+            'count': len(values),
+            'median': seconds[len(seconds) // 2],
+            'max': seconds[-1],
+            **{counter: sum(value.get(counter, 0) for value in values) for counter in STAGE_COUNTERS}
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='汇总最近的运行指标')
+    parser.add_argument('--runs', type=int, default=20, help='汇总的运行次数')
+    args = parser.parse_args()
+    
+    runs = load_runs()[-args.runs:]
+    if not runs:
+        print(f"没有运行指标（{storage.cache_dir() / METRICS_FILE}）")
+        return 0
+    
+    print(f"最近 {len(runs)} 次运行（{runs[0]['started_at'][:16]} 至 {runs[-1]['started_at'][:16]}），"
+          f"失败 {sum(1 for run in runs if run['code'] != 0)} 次")
+    print(f"{'名单':<8}{'阶段':<10}{'次数':>6}{'中位数(ms)':>12}{'最大(ms)':>10}{'重试':>6}{'字节':>12}{'行数':>10}")
+    for (list_name, name), values in summarize(runs).items():
+        print(f"{list_name:<8}{name:<10}{values['count']:>6}{values['median'] * 1000:>12.1f}"
+              f"{values['max'] * 1000:>10.1f}{values['retries']:>6}{values['bytes']:>12}{values['rows']:>10}")
+    
+    peaks = [run['peak_rss_kb'] for run in runs if run.get('peak_rss_kb')]
+    if peaks:
+        print(f"\n进程内存峰值: 最近一次 {peaks[-1] / 1024:.1f} MB，最大 {max(peaks) / 1024:.1f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
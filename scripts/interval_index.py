@@ -0,0 +1,338 @@
+"""
+区间索引模块
+把变化记录整理为每只股票在名单上的时间区间，快速回答“某日某股票是否可卖空”
+
+用法:
+    python interval_index.py build
+    python interval_index.py query 700 2026-03-02
+    python interval_index.py batch queries.csv    # 每行: 代号,日期
+"""
+
+import argparse
+import csv
+import json
+import sys
+from bisect import bisect_right
+
+import storage
+from storage import ensure_store_dir, count_changes, load_current_list, load_history
+
+
+INDEX_FILE = 'intervals.json'
+INDEX_VERSION = 1
+
+# 在已记录历史开始之前就已在名单上的股票，区间起点记为0
+BEFORE_HISTORY = 0
+
+
+def _date_key(date):
+    """把 YYYY-MM-DD 转换为可比较的整数 YYYYMMDD"""
+    return int(date.replace('-', ''))
+
+
+def _format_date_key(key):
+    if key == BEFORE_HISTORY:
+        return '记录开始前'
+    text = str(key)
+    return f"{text[0:4]}-{text[4:6]}-{text[6:8]}"
+
+
+class IntervalIndex:
+    """
+    股票在名单上的区间索引
+    
+    每只股票对应按起点排序、互不重叠的半开区间 [起点, 终点)，
+    终点为 None 表示至今仍在名单上
+    """
+    
+    def __init__(self, intervals=None, built_from=0):
+        self.intervals = intervals or {}
+        self.built_from = built_from
+        self._starts = None
+    
+    def _open(self, code, date):
+        spans = self.intervals.setdefault(code, [])
+        if spans and spans[-1][1] is None:
+            return
+        spans.append([date, None])
+    
+    def _close(self, code, date):
+        spans = self.intervals.setdefault(code, [])
+        if spans and spans[-1][1] is None:
+            spans[-1][1] = date
+        elif not spans:
+            # 未记录加入时间，说明在历史开始前已在名单上
+            spans.append([BEFORE_HISTORY, date])
+    
+    def apply_change(self, change_record):
+        """
+        应用一条变化记录
+        
+        Args:
+            change_record: 变化记录字典
+        """
+        date = _date_key(change_record['date'])
+        for stock in change_record['removed']:
+            self._close(stock['code'], date)
+        
+        # 第一条记录旧名单为空时是首次获取的名单，不是真实的新增：
+        # 其中的股票在历史开始前已在名单上，区间起点记为 BEFORE_HISTORY
+        added_on = BEFORE_HISTORY if change_record.get('old_total') == 0 and not self.intervals else date
+        for stock in change_record['added']:
+            self._open(stock['code'], added_on)
+        self.built_from += 1
+        self._starts = None
+    
+    @classmethod
+    def build(cls, history, current_codes=()):
+        """
+        从变化记录构建索引
+        
+        Args:
+            history: 变化记录列表（最新的在前面），最早一条为旧名单为空的首次记录时作为历史开始
+            current_codes: 当前名单的股份代号，没有加入记录的视为历史开始前已在名单上
+        
+        Returns:
+            IntervalIndex: 区间索引
+        """
+        index = cls()
+        for record in reversed(history):
+            index.apply_change(record)
+        
+        for code in current_codes:
+            spans = index.intervals.get(code)
+            if not spans:
+                index.intervals[code] = [[BEFORE_HISTORY, None]]
+        
+        return index
+    
+    def _ensure_starts(self):
+        if self._starts is None:
+            self._starts = {code: [span[0] for span in spans] for code, spans in self.intervals.items()}
+        return self._starts
+    
+    def contains(self, code, date):
+        """
+        查询某股票在某日是否在名单上，开销 O(log k)，k 为该股票的区间数
+        
+        Args:
+            code: 股份代号
+            date: 日期 (YYYY-MM-DD)
+        
+        Returns:
+            bool: 是否在名单上
+        """
+        starts = self._ensure_starts().get(code)
+        if not starts:
+            return False
+        
+        day = _date_key(date)
+        pos = bisect_right(starts, day) - 1
+        if pos < 0:
+            return False
+        
+        end = self.intervals[code][pos][1]
+        return end is None or day < end
+    
+    def contains_many(self, codes, dates):
+        """
+        批量查询
+        
+        安装了 NumPy 时把所有区间展平成按 (代号, 起点) 排序的数组，用一次 searchsorted 完成全部查询；
+        否则按代号分组、对日期排序后与区间做一次归并扫描
+        
+        Args:
+            codes: 股份代号序列
+            dates: 日期序列 (YYYY-MM-DD)，与 codes 一一对应
+        
+        Returns:
+            list: 每个查询的结果 (bool)
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            return self._contains_many_sweep(codes, dates)
+        
+        return self._contains_many_numpy(np, codes, dates).tolist()
+    
+    def _contains_many_numpy(self, np, codes, dates):
+        code_ids = {code: i for i, code in enumerate(self.intervals)}
+        span_codes = []
+        span_starts = []
+        span_ends = []
+        for code, spans in self.intervals.items():
+            for start, end in spans:
+                span_codes.append(code_ids[code])
+                span_starts.append(start)
+                span_ends.append(99999999 if end is None else end)
+        
+        # 代号编号在高位、日期在低位，组合键整体有序
+        scale = np.int64(100000000)
+        keys = np.asarray(span_codes, dtype=np.int64) * scale + np.asarray(span_starts, dtype=np.int64)
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        ends = np.asarray(span_ends, dtype=np.int64)[order]
+        owners = np.asarray(span_codes, dtype=np.int64)[order]
+        
+        query_ids = np.fromiter((code_ids.get(code, -1) for code in codes), dtype=np.int64, count=len(codes))
+        query_days = np.fromiter((_date_key(date) for date in dates), dtype=np.int64, count=len(dates))
+        query_keys = query_ids * scale + query_days
+        
+        pos = np.searchsorted(keys, query_keys, side='right') - 1
+        valid = (pos >= 0) & (query_ids >= 0)
+        pos = np.where(valid, pos, 0)
+        return valid & (owners[pos] == query_ids) & (query_days < ends[pos])
+    
+    def _contains_many_sweep(self, codes, dates):
+        results = [False] * len(codes)
+        
+        by_code = {}
+        for i, code in enumerate(codes):
+            by_code.setdefault(code, []).append(i)
+        
+        for code, positions in by_code.items():
+            spans = self.intervals.get(code)
+            if not spans:
+                continue
+            
+            positions.sort(key=lambda i: dates[i])
+            span = 0
+            for i in positions:
+                day = _date_key(dates[i])
+                # 日期递增，区间指针只需前进
+                while span < len(spans) and spans[span][1] is not None and spans[span][1] <= day:
+                    span += 1
+                if span == len(spans):
+                    break
+                results[i] = spans[span][0] <= day
+        
+        return results
+    
+    def to_dict(self):
+        return {
+            'version': INDEX_VERSION,
+            'built_from': self.built_from,
+            'intervals': self.intervals
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['intervals'], data.get('built_from', 0))
+
+
+def load_interval_index():
+    """
+    加载持久化的区间索引
+    
+    Returns:
+        IntervalIndex or None: 索引，不存在或版本不符时返回None
+    """
+    index_file = storage.store_dir() / INDEX_FILE
+    
+    if not index_file.exists():
+        return None
+    
+    try:
+        with open(index_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"✗ 读取{INDEX_FILE}失败: {str(e)}")
+        return None
+    
+    if data.get('version') != INDEX_VERSION:
+        return None
+    
+    return IntervalIndex.from_dict(data)
+
+
+def save_interval_index(index):
+    """保存区间索引"""
+    ensure_store_dir()
+    index_file = storage.store_dir() / INDEX_FILE
+    
+    try:
+        with open(index_file, 'w', encoding='utf-8') as f:
+            json.dump(index.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+    except Exception as e:
+        print(f"✗ 保存{INDEX_FILE}失败: {str(e)}")
+        raise
+
+
+def rebuild_interval_index():
+    """
+    从变化日志和当前名单重建区间索引
+    
+    Returns:
+        IntervalIndex: 区间索引
+    """
+    current = load_current_list()
+    current_codes = [stock['code'] for stock in current['stocks']] if current else []
+    index = IntervalIndex.build(load_history(), current_codes)
+    save_interval_index(index)
+    print(f"✓ 已重建区间索引: {len(index.intervals)} 只股票，{index.built_from} 条变化记录")
+    return index
+
+
+def update_interval_index(change_record):
+    """
+    把一条新的变化记录应用到已保存的索引
+    
+    索引缺失或与变化日志条数不一致时改为完整重建（调用前变化记录应已写入日志）
+    
+    Args:
+        change_record: 变化记录字典
+    """
+    index = load_interval_index()
+    if index is None or index.built_from != count_changes() - 1:
+        rebuild_interval_index()
+        return
+    
+    index.apply_change(change_record)
+    save_interval_index(index)
+    print("✓ 已更新区间索引")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='股票在名单上的区间索引')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    subparsers.add_parser('build', help='从变化日志重建索引')
+    
+    query_parser = subparsers.add_parser('query', help='查询某股票在某日是否在名单上')
+    query_parser.add_argument('code', help='股份代号')
+    query_parser.add_argument('date', help='日期 (YYYY-MM-DD)')
+    
+    batch_parser = subparsers.add_parser('batch', help='批量查询，CSV每行为 代号,日期')
+    batch_parser.add_argument('file', help='查询文件路径，- 表示标准输入')
+    
+    args = parser.parse_args()
+    
+    if args.command == 'build':
+        rebuild_interval_index()
+        return 0
+    
+    index = load_interval_index() or rebuild_interval_index()
+    
+    if args.command == 'query':
+        code = args.code.lstrip('0') or '0'
+        result = index.contains(code, args.date)
+        spans = index.intervals.get(code, [])
+        print(f"{code} 在 {args.date}: {'可卖空' if result else '不可卖空'}")
+        for start, end in spans:
+            print(f"  {_format_date_key(start)} → {_format_date_key(end) if end else '至今'}")
+        return 0
+    
+    source = sys.stdin if args.file == '-' else open(args.file, 'r', encoding='utf-8')
+    with source:
+        rows = [row for row in csv.reader(source) if len(row) >= 2]
+    codes = [row[0].strip().lstrip('0') or '0' for row in rows]
+    dates = [row[1].strip() for row in rows]
+    
+    writer = csv.writer(sys.stdout)
+    for code, date, result in zip(codes, dates, index.contains_many(codes, dates)):
+        writer.writerow([code, date, int(result)])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,34 +1,141 @@
 """
 主程序入口
 协调各个模块完成监控任务
+
+同时监控注册表（registry.py）中的多个名单：各名单并发运行、共用一个连接池，
+数据分别保存在各自的存储命名空间中，一个名单失败不影响其他名单
+
+启动时只导入每次检查都要用到的模块；邮件（smtplib、email.mime）、网站数据导出、区间索引、
+线程池和常驻运行模块在实际用到的分支中才导入，名单无变化时不会加载
+（并发检查多个名单时会导入线程池，以及导出模块中执行 brotli 压缩的进程池）
+
+用法:
+    python main.py                 # 检查一次后退出
+    python main.py --daemon        # 常驻运行，按固定间隔检查（见 daemon.py）
 """
 
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import argparse
+import io
 import os
 import sys
+import threading
+import traceback
 from datetime import datetime
 
 # 导入自定义模块
-from fetcher import fetch_latest_list
+from fetcher import HTTPCache, create_session_with_retry, fetch_latest_list
 from comparator import compare_lists, format_change_summary
-from storage import load_current_list, save_current_list, save_change_record, update_stats, load_history
-from emailer import send_email
+from storage import (
+    load_current_list, save_current_list, save_change_record, update_stats,
+    load_last_check, save_last_check, record_snapshot, use_namespace, cache_dir, transaction
+)
+from registry import selected_lists
+from instrument import RunRecorder, StageRecorder, stage
 
+# 启动时导入模块的耗时（秒），作为单独的阶段输出到运行日志
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
 
-def main():
-    """主函数"""
-    print("=" * 60)
-    print("港股卖空名单监控系统")
-    print(f"运行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+class _ThreadOutput:
+    """
+    按线程缓存输出的 stdout 替身
+    
+    并发监控时每个名单的日志先写入各自线程的缓冲区，名单完成后整段输出，避免日志交错
+    """
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+        self._lock = threading.Lock()
+    
+    def capture(self):
+        self._local.buffer = io.StringIO()
+    
+    def release(self):
+        buffer = getattr(self._local, 'buffer', None)
+        self._local.buffer = None
+        return buffer.getvalue() if buffer else ''
+    
+    def emit(self, text):
+        with self._lock:
+            self.stream.write(text)
+            self.stream.flush()
+    
+    def write(self, text):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is not None:
+            return buffer.write(text)
+        with self._lock:
+            return self.stream.write(text)
+    
+    def flush(self):
+        self.stream.flush()
+
+
+def run_monitor(monitored, session=None, cache=None, state=None, recorder=None):
+    """
+    运行一个名单的一次监控：获取、对比、保存和通知
+    
+    数据读写都在名单自己的存储命名空间中进行
+    
+    Args:
+        monitored: 名单配置（见 registry.register_list）
+        session: requests session（可选），多个名单共用连接池时传入
+        cache: HTTPCache 实例（可选），与 session 配套
+        state: 内存中的名单状态（可选），常驻运行时在两次检查之间保留
+               上次检查记录（last_check）和当前名单（current），避免每次从磁盘重新读取
+        recorder: RunRecorder 实例（可选），记录各阶段的运行指标
+    
+    Returns:
+        int: 0 表示成功，1 表示失败
+    """
+    stages = recorder.for_list(monitored['name']) if recorder else StageRecorder()
+    with use_namespace(monitored['namespace']), stages.activate():
+        return _run_cycle(monitored, session, cache, state)
+
+
+def _run_cycle(monitored, session, cache, state):
+    if state is None:
+        state = {}
+    
+    print("\n" + "=" * 60)
+    print(f"名单: {monitored['title']} ({monitored['name']})")
     print("=" * 60)
     
+    started = time.perf_counter()
+    
     try:
         # 1. 获取最新数据
+        stage('fetch')
         print("\n[1/5] 正在获取最新数据...")
-        new_data = fetch_latest_list()
+        new_data = fetch_latest_list(
+            cache=cache,
+            known=state['last_check'] if 'last_check' in state else load_last_check(),
+            base_url=monitored['base_url'],
+            pattern=monitored['link_pattern'],
+            header_marker=monitored['header_marker'],
+            session=session
+        )
+        
+        if new_data.get('unchanged'):
+            # 内容摘要与上次一致：跳过解析、对比和保存，只更新检查记录
+            state['last_check'] = save_last_check(new_data, path='fast')
+            
+            print("\n执行路径: 快速路径（内容摘要未变化，跳过对比和保存）")
+            print(f"\n✓ 任务完成！名单无变化，耗时 {time.perf_counter() - started:.2f} 秒")
+            
+            return 0
+        
+        print("\n执行路径: 完整路径（内容有变化或无可用摘要）")
         
         # 2. 加载旧数据
+        stage('load')
         print("\n[2/5] 正在加载历史数据...")
-        old_data = load_current_list()
+        old_data = state['current'] if 'current' in state else load_current_list()
         
         if old_data:
             print(f"  上次数据日期: {old_data['date']}")
@@ -37,21 +144,40 @@ def main():
             print("  首次运行，无历史数据")
         
         # 3. 对比数据
+        stage('compare')
         print("\n[3/5] 正在对比数据...")
         change_record = compare_lists(old_data, new_data)
         
-        # 4. 保存数据
+        # 4. 保存数据（SQLite 存储时在一个事务中写入，中途失败不留下一半数据）
+        stage('save')
         print("\n[4/5] 正在保存数据...")
-        save_current_list(new_data)
-        
-        if change_record:
-            # 有变化，保存变化记录
-            save_change_record(change_record)
+        with transaction():
+            save_current_list(new_data)
             
-            # 更新统计数据
-            history = load_history()
-            update_stats(new_data, history)
+            if change_record:
+                # 有变化，追加变化记录
+                save_change_record(change_record)
+                record_snapshot(new_data, change_record)
+                
+                from interval_index import update_interval_index
+                update_interval_index(change_record)
+            else:
+                # 快照存储为空时用当前名单初始化
+                record_snapshot(new_data)
             
+            # 更新统计数据（无变化时也更新最后检查时间）
+            update_stats(new_data, change_record)
+        
+        # 数据保存成功后再记录本次检查，保存失败时下次检查不会走快速路径
+        state['current'] = new_data
+        state['last_check'] = save_last_check(new_data, path='full')
+        
+        # 导出网站数据文件（读取已提交的数据）
+        stage('export')
+        from exporter import export_site_data
+        export_site_data(new_data)
+        
+        if change_record:
             # 打印变化摘要
             print("\n" + "=" * 60)
             print("检测到变化!")
@@ -59,45 +185,202 @@ def main():
             print(format_change_summary(change_record))
             print("=" * 60)
             
-            # 5. 发送邮件通知
-            print("\n[5/5] 正在发送邮件通知...")
-            
-            # 从环境变量获取邮箱配置
-            gmail_address = os.getenv('GMAIL_ADDRESS')
-            gmail_password = os.getenv('GMAIL_APP_PASSWORD')
-            website_url = os.getenv('WEBSITE_URL', '')
+            # 5. 加入通知发件箱，由 deliver_notifications() 在检查结束后发送
+            stage('notify')
+            print("\n[5/5] 正在加入通知发件箱...")
             
-            if not gmail_address or not gmail_password:
+            if not os.getenv('GMAIL_ADDRESS') or not os.getenv('GMAIL_APP_PASSWORD'):
                 print("⚠ 警告: 未配置Gmail凭据，跳过邮件发送")
                 print("  请设置环境变量: GMAIL_ADDRESS 和 GMAIL_APP_PASSWORD")
             else:
-                success = send_email(change_record, gmail_address, gmail_password, website_url)
-                if success:
-                    print("✓ 任务完成！已发送邮件通知")
-                else:
-                    print("⚠ 数据已保存，但邮件发送失败")
+                from outbox import enqueue
+                enqueue(change_record, os.getenv('WEBSITE_URL', ''), list_title=monitored['title'])
+                print("✓ 任务完成！数据已保存，通知已加入发件箱")
         else:
             # 无变化
             print("  名单无变化，无需发送通知")
-            
-            # 仍然更新统计数据（更新最后检查时间）
-            history = load_history()
-            update_stats(new_data, history)
-            
-            print("\n✓ 任务完成！名单无变化")
-        
-        print("\n" + "=" * 60)
-        print("程序执行完毕")
-        print("=" * 60)
+            print(f"\n✓ 任务完成！名单无变化，耗时 {time.perf_counter() - started:.2f} 秒")
         
         return 0
-        
+    
     except Exception as e:
-        print(f"\n✗ 程序执行失败: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        # 失败后丢弃内存状态，下次检查从磁盘重新加载
+        state.clear()
+        print(f"\n✗ {monitored['title']}监控失败: {str(e)}")
+        traceback.print_exc(file=sys.stdout)
         return 1
 
 
+def _run_captured(output, monitored, session, cache, state, recorder):
+    """在线程中运行一个名单，返回 (返回码, 日志, 耗时秒数)"""
+    output.capture()
+    started = time.perf_counter()
+    try:
+        code = run_monitor(monitored, session, cache, state, recorder)
+    except BaseException:
+        traceback.print_exc(file=sys.stdout)
+        code = 1
+    finally:
+        log = output.release()
+    return code, log, time.perf_counter() - started
+
+
+def run_all(lists, cache=None, session=None, states=None, recorder=None):
+    """
+    并发监控多个名单
+    
+    所有名单共用一个带缓存的 session（连接池按名单数调大），
+    总耗时取决于最慢的名单而不是各名单耗时之和；
+    解析、对比和导出等CPU密集的阶段受GIL限制，只有导出阶段的 brotli 压缩在多个CPU上并行执行
+    
+    Args:
+        lists: 名单配置列表
+        cache: HTTPCache 实例（可选），默认使用本地缓存目录
+        session: requests session（可选），需已挂载 cache 对应的缓存适配器；常驻运行时复用
+        states: {名单名称: 内存状态}（可选），常驻运行时在两次检查之间保留
+        recorder: RunRecorder 实例（可选），记录各名单各阶段的运行指标
+    
+    Returns:
+        dict: {名单名称: (返回码, 耗时秒数)}
+    """
+    cache = cache or HTTPCache()
+    session = session or create_session_with_retry(cache=cache, pool_size=max(10, 2 * len(lists)))
+    states = states if states is not None else {}
+    results = {}
+    
+    if len(lists) == 1:
+        started = time.perf_counter()
+        code = run_monitor(lists[0], session, cache, states.setdefault(lists[0]['name'], {}), recorder)
+        results[lists[0]['name']] = (code, time.perf_counter() - started)
+        if recorder:
+            recorder.codes[lists[0]['name']] = code
+        return results
+    
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from exporter import parallel_compression
+    
+    output = _ThreadOutput(sys.stdout)
+    sys.stdout = output
+    try:
+        # 导出阶段的 brotli 压缩占用GIL，在线程中无法并行，交给进程池在多个CPU上执行
+        with parallel_compression(min(len(lists), os.cpu_count() or 1)), \
+                ThreadPoolExecutor(max_workers=len(lists)) as executor:
+            futures = {
+                executor.submit(_run_captured, output, monitored, session, cache,
+                                states.setdefault(monitored['name'], {}), recorder): monitored
+                for monitored in lists
+            }
+            for future in as_completed(futures):
+                code, log, seconds = future.result()
+                output.emit(log)
+                results[futures[future]['name']] = (code, seconds)
+    finally:
+        sys.stdout = output.stream
+    
+    if recorder:
+        recorder.codes.update((name, code) for name, (code, _) in results.items())
+    return results
+
+
+def deliver_notifications(lists):
+    """
+    发送各名单发件箱中到期的通知（包括之前运行中未发送成功的）
+    
+    Args:
+        lists: 名单配置列表
+    
+    Returns:
+        dict: {名单名称: outbox.drain() 的结果}；未配置Gmail凭据时返回空字典
+    """
+    gmail_address = os.getenv('GMAIL_ADDRESS')
+    gmail_password = os.getenv('GMAIL_APP_PASSWORD')
+    if not gmail_address or not gmail_password:
+        return {}
+    
+    from emailer import load_recipients, send_notification
+    from outbox import drain
+    from subscriptions import load_subscriptions
+    
+    def send(change_record, website_url, list_title, recipients):
+        return send_notification(change_record, gmail_address, gmail_password, website_url, list_title,
+                                 recipients=recipients)
+    
+    subscriptions = load_subscriptions()
+    # 只配置了订阅时，不再默认发送完整通知给发件人自己
+    recipients = load_recipients(None if subscriptions else gmail_address)
+    summaries = {}
+    for monitored in lists:
+        with use_namespace(monitored['namespace']):
+            try:
+                summaries[monitored['name']] = drain(send, recipients, subscriptions=subscriptions)
+            except Exception as e:
+                print(f"✗ {monitored['title']}通知发送失败: {str(e)}")
+    return summaries
+
+
+def main(argv=None):
+    """主函数"""
+    parser = argparse.ArgumentParser(description='港股卖空名单监控')
+    parser.add_argument('--daemon', action='store_true', help='常驻运行，按固定间隔反复检查')
+    parser.add_argument('--interval', type=int, help='常驻运行时的检查间隔（秒），默认 900 或 MONITOR_INTERVAL')
+    parser.add_argument('--host', help='健康检查接口监听地址，默认 127.0.0.1 或 MONITOR_HOST')
+    parser.add_argument('--port', type=int, help='健康检查接口端口，0 表示不启动，默认 8765 或 MONITOR_PORT')
+    parser.add_argument('--profile', nargs='?', const='', metavar='PATH',
+                        help='用 cProfile 采样本次运行并写入 pstats 文件，默认 .cache/profile-<时间>.pstats')
+    args = parser.parse_args(argv)
+    
+    print("=" * 60)
+    print("港股卖空名单监控系统")
+    print(f"运行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 60)
+    print(f"\n[0/5] 模块加载: {IMPORT_SECONDS * 1000:.0f} ms")
+    
+    try:
+        lists = selected_lists()
+    except ValueError as e:
+        print(f"✗ {str(e)}")
+        return 1
+    
+    if args.daemon:
+        from daemon import MonitorDaemon
+        
+        options = {'host': args.host, 'port': args.port}
+        if args.interval is not None:
+            options['interval'] = max(1, args.interval)
+        options['deliver'] = deliver_notifications
+        return MonitorDaemon(lists, run_all, **{key: value for key, value in options.items() if value is not None}).run()
+    
+    recorder = RunRecorder(profile=args.profile is not None)
+    started = time.perf_counter()
+    results = run_all(lists, recorder=recorder)
+    elapsed = time.perf_counter() - started
+    
+    # 检查结束后再发送通知：邮件发送失败不影响数据保存，未送达的通知留在发件箱中下次重试
+    with recorder.run.activate():
+        stage('deliver')
+        deliver_notifications(lists)
+    
+    exit_code = 0 if all(code == 0 for code, _ in results.values()) else 1
+    recorder.save(exit_code, import_seconds=round(IMPORT_SECONDS, 6))
+    if args.profile is not None:
+        profile_path = args.profile or str(cache_dir() / f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.pstats")
+        stats = recorder.dump_profile(profile_path)
+        if stats:
+            print(f"\n✓ 性能采样已保存: {profile_path}（python -m pstats {profile_path} 查看）")
+            stats.sort_stats('cumulative').print_stats(15)
+    
+    print("\n" + "=" * 60)
+    if len(lists) > 1:
+        print("各名单结果:")
+        for monitored in lists:
+            code, seconds = results[monitored['name']]
+            print(f"  {'✓' if code == 0 else '✗'} {monitored['title']}: {seconds:.2f} 秒")
+        print(f"总耗时 {elapsed:.2f} 秒（各名单耗时之和 {sum(seconds for _, seconds in results.values()):.2f} 秒）")
+    print("程序执行完毕")
+    print("=" * 60)
+    
+    return exit_code
+
+
 if __name__ == '__main__':
     sys.exit(main())
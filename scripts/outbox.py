@@ -0,0 +1,288 @@
+"""
+通知发件箱模块
+把待发送的变化通知持久化到本地运行状态目录（.cache/outbox/），由发送程序按指数退避重试投递
+
+每条通知以变化记录的日期和检测时间为键保存为一个文件（outbox/2026-01-07_20260107062600135477.json），
+同一日期可能有多条变化记录，各自发送；同一条变化记录只发送一次。
+文件中记录投递状态、尝试次数、下次重试时间和已送达收件人的散列（不保存邮箱地址）。
+散列只以通知的键加盐，可以用已知地址验证，因此发件箱不放在提交到仓库的 data/ 目录中
+
+状态:
+    pending      等待发送或等待重试
+    delivered    全部收件人已送达
+    failed       超过最大尝试次数，不再自动重试
+
+用法:
+    python outbox.py            # 列出发件箱中的通知
+    python outbox.py --retry    # 把 failed 的通知重新设为 pending
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from datetime import datetime, timedelta
+
+import storage
+
+
+OUTBOX_DIR = 'outbox'
+
+# 第 n 次失败后等待 BACKOFF_BASE_SECONDS * 2^(n-1) 秒再重试，最长 BACKOFF_MAX_SECONDS
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 6 * 3600
+MAX_ATTEMPTS = 12
+
+# 已送达的通知保留天数（用于去除重复加入的同一条变化记录）
+DELIVERED_RETENTION_DAYS = 90
+
+STATUS_PENDING = 'pending'
+STATUS_DELIVERED = 'delivered'
+STATUS_FAILED = 'failed'
+
+# 同一进程内（常驻运行的发送线程与主循环）不同时投递
+_drain_lock = threading.Lock()
+
+
+def outbox_dir():
+    """当前命名空间的发件箱目录（不提交到仓库）"""
+    return storage.cache_dir() / OUTBOX_DIR
+
+
+def entry_key(change_record):
+    """
+    通知的键：变化记录的日期加检测时间
+    
+    同一日期可能检测到多条变化记录（例如一天内名单更新两次），只有同一条记录重复加入时键才相同；
+    没有检测时间的记录只用日期
+    """
+    timestamp = change_record.get('timestamp')
+    if not timestamp:
+        return change_record['date']
+    return f"{change_record['date']}_{re.sub(r'[^0-9]', '', timestamp)}"
+
+
+def _key(entry):
+    # 旧版本的通知只以日期为键
+    return entry.get('key', entry['date'])
+
+
+def _entry_file(key):
+    return outbox_dir() / f"{key}.json"
+
+
+def _load_entry(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"✗ 读取通知 {path.name} 失败: {str(e)}")
+        return None
+
+
+def _save_entry(entry):
+    """先写临时文件再替换，中途退出不会留下不完整的通知"""
+    outbox_dir().mkdir(parents=True, exist_ok=True)
+    entry_file = _entry_file(_key(entry))
+    tmp_file = entry_file.with_name(f"{entry_file.name}.tmp")
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(entry, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, entry_file)
+
+
+def recipient_hash(key, address):
+    """收件人散列（以通知的键加盐），用于记录已送达的收件人而不保存地址"""
+    return hashlib.sha256(f"{key}:{address.strip().lower()}".encode('utf-8')).hexdigest()[:16]
+
+
+def enqueue(change_record, website_url=None, list_title='港股卖空名单'):
+    """
+    把变化通知加入发件箱
+    
+    同一条变化记录（日期和检测时间相同）的通知已送达时不再加入；尚未送达时更新通知内容，保留投递状态。
+    同一日期的其他变化记录作为新的通知加入
+    
+    Args:
+        change_record: 变化记录字典
+        website_url: 网站URL（可选）
+        list_title: 名单显示名称
+    
+    Returns:
+        dict: 发件箱中的通知
+    """
+    key = entry_key(change_record)
+    entry_file = _entry_file(key)
+    entry = _load_entry(entry_file) if entry_file.exists() else None
+    
+    if entry and entry['status'] == STATUS_DELIVERED:
+        print(f"⚠ {key} 的通知已于 {entry['delivered_at']} 发送，不再重复发送")
+        return entry
+    
+    now = datetime.now().isoformat()
+    if entry is None:
+        entry = {
+            'key': key,
+            'date': change_record['date'],
+            'status': STATUS_PENDING,
+            'created_at': now,
+            'attempts': 0,
+            'next_attempt_at': now,
+            'last_error': None,
+            'delivered_to': [],
+            'delivered_at': None
+        }
+    else:
+        entry['status'] = STATUS_PENDING
+        entry['next_attempt_at'] = now
+    
+    entry.update({
+        'updated_at': now,
+        'list_title': list_title,
+        'website_url': website_url,
+        'change_record': change_record
+    })
+    _save_entry(entry)
+    print(f"✓ 已加入通知发件箱: {entry_file}")
+    return entry
+
+
+def load_entries(status=None):
+    """
+    读取发件箱中的通知（按日期和检测时间从旧到新）
+    
+    Args:
+        status: 只返回指定状态的通知（可选）
+    
+    Returns:
+        list: 通知列表
+    """
+    directory = outbox_dir()
+    if not directory.exists():
+        return []
+    
+    entries = []
+    for path in sorted(directory.glob('*.json')):
+        entry = _load_entry(path)
+        if entry and (status is None or entry['status'] == status):
+            entries.append(entry)
+    return entries
+
+
+def backoff_seconds(attempts):
+    """第 attempts 次失败后的等待时间"""
+    return min(BACKOFF_BASE_SECONDS * 2 ** max(0, attempts - 1), BACKOFF_MAX_SECONDS)
+
+
+def _prune_delivered(now):
+    cutoff = now - timedelta(days=DELIVERED_RETENTION_DAYS)
+    for entry in load_entries(STATUS_DELIVERED):
+        if entry['delivered_at'] and datetime.fromisoformat(entry['delivered_at']) < cutoff:
+            _entry_file(_key(entry)).unlink()
+
+
+def drain(send, recipients, now=None, subscriptions=None):
+    """
+    投递发件箱中到期的通知
+    
+    每条通知只发送给尚未送达的收件人；仍有失败时按指数退避安排下次重试。
+    有订阅时按订阅拆分通知，受影响的订阅者只收到相关的股票，不受影响的订阅者不发送
+    
+    Args:
+        send: 发送函数 send(change_record, website_url, list_title, recipients) -> 每位收件人的结果列表
+              （见 emailer.send_notification）
+        recipients: 全部收件人地址列表
+        now: 当前时间（可选，测试用）
+        subscriptions: 订阅索引（可选，见 subscriptions.SubscriptionIndex）
+    
+    Returns:
+        dict: {delivered, retrying, failed, waiting} 各状态的通知数
+    """
+    now = now or datetime.now()
+    summary = {'delivered': 0, 'retrying': 0, 'failed': 0, 'waiting': 0}
+    
+    with _drain_lock:
+        for entry in load_entries(STATUS_PENDING):
+            if datetime.fromisoformat(entry['next_attempt_at']) > now:
+                summary['waiting'] += 1
+                continue
+            
+            key = _key(entry)
+            delivered = set(entry['delivered_to'])
+            if subscriptions:
+                deliveries = subscriptions.route(entry['change_record'], recipients)
+            else:
+                deliveries = [(entry['change_record'], recipients)]
+            deliveries = [
+                (change_record, [address for address in addresses if recipient_hash(key, address) not in delivered])
+                for change_record, addresses in deliveries
+            ]
+            remaining = sum(len(addresses) for _, addresses in deliveries)
+            print(f"\n正在发送 {key} 的通知（第 {entry['attempts'] + 1} 次尝试，{remaining} 位收件人，"
+                  f"{sum(1 for _, addresses in deliveries if addresses)} 种内容）...")
+            
+            results = []
+            for change_record, addresses in deliveries:
+                if not addresses:
+                    continue
+                try:
+                    results.extend(send(change_record, entry['website_url'], entry['list_title'], addresses))
+                except Exception as e:
+                    results.extend({'recipient': address, 'ok': False, 'error': str(e)} for address in addresses)
+            
+            entry['attempts'] += 1
+            entry['last_attempt_at'] = now.isoformat()
+            entry['delivered_to'] = sorted(delivered | {
+                recipient_hash(key, result['recipient']) for result in results if result['ok']
+            })
+            failed = [result for result in results if not result['ok']]
+            
+            if not failed:
+                entry['status'] = STATUS_DELIVERED
+                entry['delivered_at'] = now.isoformat()
+                entry['last_error'] = None
+                summary['delivered'] += 1
+            else:
+                entry['last_error'] = f"{len(failed)} 位收件人发送失败: {failed[0]['error']}"
+                if entry['attempts'] >= MAX_ATTEMPTS:
+                    entry['status'] = STATUS_FAILED
+                    summary['failed'] += 1
+                    print(f"✗ {key} 的通知已尝试 {entry['attempts']} 次，不再自动重试")
+                else:
+                    delay = backoff_seconds(entry['attempts'])
+                    entry['next_attempt_at'] = (now + timedelta(seconds=delay)).isoformat()
+                    summary['retrying'] += 1
+                    print(f"⚠ {key} 的通知有 {len(failed)} 位收件人发送失败，{delay} 秒后重试")
+            _save_entry(entry)
+        
+        _prune_delivered(now)
+    
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查看或重置通知发件箱')
+    parser.add_argument('--retry', action='store_true', help='把 failed 的通知重新设为 pending')
+    args = parser.parse_args()
+    
+    entries = load_entries()
+    if not entries:
+        print("发件箱为空")
+        return 0
+    
+    for entry in entries:
+        if args.retry and entry['status'] == STATUS_FAILED:
+            entry['status'] = STATUS_PENDING
+            entry['attempts'] = 0
+            entry['next_attempt_at'] = datetime.now().isoformat()
+            _save_entry(entry)
+        error = f"  {entry['last_error']}" if entry['last_error'] else ''
+        print(f"{_key(entry)}  {entry['status']:<10}尝试 {entry['attempts']} 次  "
+              f"已送达 {len(entry['delivered_to'])} 位{error}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+名单注册表
+登记需要监控的港交所CSV名单：名单页面URL、CSV链接格式、表头标识和存储命名空间
+
+每个名单的数据保存在各自的命名空间下（docs/data/<命名空间>/、data/<命名空间>/），
+命名空间为空字符串的名单使用原有的目录，与只监控一个名单时的布局相同
+
+环境变量 MONITOR_LISTS 可指定本次运行监控的名单（逗号分隔的名称），默认只监控登记为默认的名单；
+未在港交所网站上核实过的名单不作为默认名单，需要通过 MONITOR_LISTS 显式启用
+
+用法:
+    python registry.py    # 列出已登记的名单
+"""
+
+import os
+import re
+import sys
+
+from fetcher import BASE_URL, CSV_LINK_PATTERN, CSV_HEADER_MARKER
+
+
+# 已登记的名单 {名称: 名单配置}，按登记顺序
+LISTS = {}
+
+
+def register_list(name, title, base_url, link_pattern, header_marker, namespace, default=True):
+    """
+    登记一个需要监控的名单
+    
+    Args:
+        name: 名单名称（MONITOR_LISTS 中使用）
+        title: 显示名称（用于日志和邮件标题）
+        base_url: 名单页面URL
+        link_pattern: CSV链接的正则表达式（字符串或已编译），第一个分组为日期 YYYYMMDD
+        header_marker: CSV表头行中必定出现的文字
+        namespace: 存储命名空间，空字符串表示使用原有目录
+        default: 未设置 MONITOR_LISTS 时是否监控
+    
+    Returns:
+        dict: 名单配置
+    """
+    for other in LISTS.values():
+        if other['name'] != name and other['namespace'] == namespace:
+            raise ValueError(f"命名空间 '{namespace}' 已被名单 {other['name']} 使用")
+    
+    LISTS[name] = {
+        'name': name,
+        'title': title,
+        'base_url': base_url,
+        'link_pattern': re.compile(link_pattern) if isinstance(link_pattern, str) else link_pattern,
+        'header_marker': header_marker,
+        'namespace': namespace,
+        'default': default
+    }
+    return LISTS[name]
+
+
+def selected_lists(names=None):
+    """
+    返回本次要监控的名单
+    
+    Args:
+        names: 名单名称列表（可选），默认读取环境变量 MONITOR_LISTS，未设置时返回默认名单
+    
+    Returns:
+        list: 名单配置列表
+    """
+    if names is None:
+        names = [name.strip() for name in os.getenv('MONITOR_LISTS', '').split(',') if name.strip()]
+    if not names:
+        return [monitored for monitored in LISTS.values() if monitored['default']]
+    
+    unknown = [name for name in names if name not in LISTS]
+    if unknown:
+        raise ValueError(f"未登记的名单: {', '.join(unknown)}（已登记: {', '.join(LISTS)}）")
+    return [LISTS[name] for name in names]
+
+
+# 可进行卖空的指定证券名单（中文版，原有的默认名单）
+register_list(
+    'ds_c', '港股卖空名单', BASE_URL, CSV_LINK_PATTERN, CSV_HEADER_MARKER, ''
+)
+
+# 同一名单的英文版（ds_list20260109.csv，表头为英文）
+# 页面地址、链接格式和表头尚未在港交所网站上核实，默认不监控，设置 MONITOR_LISTS=ds_c,ds_e 启用
+register_list(
+    'ds_e', '港股卖空名单（英文版）', BASE_URL.replace('sc_lang=zh-HK', 'sc_lang=en'),
+    r'ds_list(\d{8})\.csv', 'Stock Code', 'en', default=False
+)
+
+
+if __name__ == '__main__':
+    for monitored in LISTS.values():
+        print(f"{monitored['name']:<8}{monitored['title']}{'' if monitored['default'] else '（需通过 MONITOR_LISTS 启用）'}")
+        print(f"  页面: {monitored['base_url']}")
+        print(f"  链接: {monitored['link_pattern'].pattern}  表头: {monitored['header_marker']}")
+        print(f"  命名空间: {monitored['namespace'] or '(默认)'}")
+    sys.exit(0)
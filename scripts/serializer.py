@@ -0,0 +1,132 @@
+"""
+JSON序列化模块
+安装了 orjson 时用它编码和解码，否则使用标准库 json；两种后端写出的字节完全相同
+
+输出格式与原来的标准库调用一致：
+    dumps(obj)                 json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+    dumps(obj, pretty=True)    json.dumps(obj, ensure_ascii=False, indent=2)
+编码结果为 UTF-8 字节
+
+orjson 与标准库只在少数输入上不同，这些情况改用标准库编码：
+    - 绝对值小于 1e-4 或不小于 1e16 的浮点数（标准库写成 1e-05、1e+16，orjson 写成 0.00001、1e16）
+    - NaN、Infinity、-Infinity（标准库原样写出，orjson 写成 null）
+    - 超过 64 位的整数、含代理字符的字符串（orjson 不支持）
+    - datetime、dataclass 等标准库不能序列化的类型（由标准库抛出相同的 TypeError）
+解码时只有一处不同：超过 64 位的整数会被 orjson 读成浮点数（数据文件中只有序号、数量等小整数）
+
+设置环境变量 JSON_BACKEND=json 可强制使用标准库
+"""
+
+import json
+import math
+import os
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# orjson 输出中可能与标准库写法不同的浮点数：指数形式（1e16、1e-7），或 0.0000 开头的小数；
+# 也可能误判字符串中的内容，此时只是多做一次标准库编码，结果仍然正确。
+# 以字面量 e 开头的正则可以快速跳过不含 e 的部分，比匹配"数字+e"快约10倍
+_EXPONENT = re.compile(rb'e[-+0-9]')
+_SMALL_DECIMAL = b'0.0000'
+# NaN、Infinity 被 orjson 写成 null，与 None 无法从输出区分，输出中有 null 时才检查输入
+_NULL = b'null'
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    _ORJSON_PRETTY_OPTIONS = _ORJSON_OPTIONS | orjson.OPT_INDENT_2
+
+BACKEND = 'orjson' if orjson is not None and os.getenv('JSON_BACKEND', 'orjson') != 'json' else 'json'
+
+
+def set_backend(name):
+    """
+    切换后端（基准测试用）
+    
+    Args:
+        name: 'orjson' 或 'json'
+    
+    Returns:
+        str: 切换前的后端
+    """
+    global BACKEND
+    if name == 'orjson' and orjson is None:
+        raise ValueError("未安装 orjson")
+    previous, BACKEND = BACKEND, name
+    return previous
+
+
+def _stdlib_dumps(obj, pretty):
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _has_non_finite(obj):
+    """数据中是否含有 NaN 或 ±Infinity"""
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+def dumps(obj, pretty=False):
+    """
+    编码为JSON字节
+    
+    Args:
+        obj: 要编码的数据
+        pretty: True 时缩进2个空格，否则为紧凑格式
+    
+    Returns:
+        bytes: UTF-8 编码的JSON
+    """
+    if BACKEND == 'orjson':
+        try:
+            data = orjson.dumps(obj, option=_ORJSON_PRETTY_OPTIONS if pretty else _ORJSON_OPTIONS)
+        except TypeError:
+            data = None
+        if (data is not None and _SMALL_DECIMAL not in data and not _EXPONENT.search(data)
+                and (_NULL not in data or not _has_non_finite(obj))):
+            return data
+    return _stdlib_dumps(obj, pretty)
+
+
+def loads(data):
+    """
+    解码JSON（bytes 或 str）
+    
+    Returns:
+        解码后的数据
+    """
+    if BACKEND == 'orjson':
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN、Infinity 等 orjson 不接受的内容交给标准库（格式错误时由标准库抛出异常）
+            pass
+    return json.loads(data)
+
+
+def load(path):
+    """读取并解码一个JSON文件"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def dump(obj, path, pretty=False):
+    """编码并写入一个JSON文件"""
+    data = dumps(obj, pretty)
+    with open(path, 'wb') as f:
+        f.write(data)
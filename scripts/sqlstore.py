@@ -0,0 +1,530 @@
+"""
+SQLite 数据存储模块
+以 SQLite 数据库（data/monitor.db）保存名单和变化记录，提供与 storage.py 相同的读写接口；
+设置环境变量 STORAGE_BACKEND=sqlite 后由 storage.py 转交到这里
+
+表结构:
+    snapshots       每次保存的名单（日期、数量和名单的其他字段），按 date 建索引
+    memberships     股票在名单上的区间：从哪次名单开始、到哪次名单结束（NULL 为仍在名单上），
+                    属性变化时结束旧区间并开始新区间；按 code 和 start_date 建索引
+    changes         变化记录（完整记录以JSON保存，原样读回），按 date 建索引
+    change_stocks   变化记录涉及的股票代号和类型（added、removed、modified），按 code 建索引
+
+数据库使用 WAL 模式；在 transaction() 中的写入共用一个连接和一个事务，
+一次检查的全部写入要么都生效、要么都不生效，事务进行中其他连接仍可读取上次提交的数据
+
+首次打开数据库时从 JSON 文件存储（current.json 和 changes.jsonl）导入已有数据
+
+用法:
+    python sqlstore.py import                             # 从 JSON 文件存储重新导入
+    python sqlstore.py code 700                           # 某股票的变化记录和在名单上的区间
+    python sqlstore.py range 2026-01-01 2026-03-31        # 日期范围内的变化记录
+"""
+
+import argparse
+import sqlite3
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import serializer
+import storage
+
+
+DB_FILE = 'monitor.db'
+
+# 表结构变化时提高版本号（记录在 PRAGMA user_version 中）
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    numbers BLOB,
+    meta BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_date ON snapshots (date);
+
+CREATE TABLE IF NOT EXISTS memberships (
+    id INTEGER PRIMARY KEY,
+    code TEXT NOT NULL,
+    start_snapshot INTEGER NOT NULL,
+    end_snapshot INTEGER,
+    start_date TEXT NOT NULL,
+    end_date TEXT,
+    name TEXT,
+    currency TEXT,
+    type TEXT,
+    exempt TEXT,
+    remarks TEXT,
+    extra BLOB
+);
+CREATE INDEX IF NOT EXISTS memberships_code ON memberships (code, start_snapshot);
+CREATE INDEX IF NOT EXISTS memberships_start_date ON memberships (start_date);
+CREATE INDEX IF NOT EXISTS memberships_open ON memberships (code) WHERE end_snapshot IS NULL;
+
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    record BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_date ON changes (date);
+
+CREATE TABLE IF NOT EXISTS change_stocks (
+    seq INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    kind TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS change_stocks_code ON change_stocks (code, seq);
+"""
+
+# memberships 中单独成列的股票字段（其余字段以JSON保存在 extra 列）
+STOCK_COLUMNS = ('name', 'currency', 'type', 'exempt', 'remarks')
+
+# 股票字典的字段顺序（与 fetcher 解析CSV的列顺序一致）
+STOCK_KEYS = ('number', 'code') + STOCK_COLUMNS
+_STOCK_KEY_SET = frozenset(STOCK_KEYS)
+
+# 变化记录中列出股票的键（作为 change_stocks.kind）
+CHANGE_KINDS = ('added', 'removed', 'modified')
+
+# 当前线程（名单）正在进行的事务: (数据库文件, 连接)
+_transaction = ContextVar('sqlstore_transaction', default=None)
+
+
+def db_path():
+    """当前命名空间的数据库文件"""
+    return storage.store_dir() / DB_FILE
+
+
+def _open():
+    """打开（必要时创建并导入）当前命名空间的数据库"""
+    path = db_path()
+    created = not path.exists()
+    storage.ensure_store_dir()
+    
+    # 事务由 BEGIN/COMMIT 显式控制
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # 每次检查只提交一次，提交时同步到磁盘（与变化日志追加后 fsync 一致）
+    conn.execute('PRAGMA synchronous=FULL')
+    
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version != SCHEMA_VERSION:
+        conn.executescript(SCHEMA)
+        conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+    
+    if created:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            _import_json_store(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    return conn
+
+
+@contextmanager
+def transaction():
+    """
+    在当前线程（上下文）中开启一个写事务
+    
+    with 块内的读写共用同一个连接，块正常结束时提交，抛出异常时回滚；
+    嵌套使用时只有最外层提交
+    
+    用法:
+        with transaction():
+            save_current_list(data)
+            save_change_record(change_record)
+    """
+    active = _transaction.get()
+    if active is not None and active[0] == db_path():
+        yield active[1]
+        return
+    
+    conn = _open()
+    token = _transaction.set((db_path(), conn))
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        _transaction.reset(token)
+        conn.close()
+
+
+@contextmanager
+def _connection(write=False):
+    """
+    正在进行的事务的连接；不在事务中时打开一个连接
+    
+    write 为 True 时在单独的事务中执行，with 块结束时提交
+    """
+    active = _transaction.get()
+    if active is not None and active[0] == db_path():
+        yield active[1]
+        return
+    
+    if write:
+        with transaction() as conn:
+            yield conn
+        return
+    
+    conn = _open()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _stock_row(stock):
+    """股票在 memberships 中的字段值（STOCK_COLUMNS 和 extra）"""
+    row = tuple(map(stock.get, STOCK_COLUMNS))
+    if stock.keys() <= _STOCK_KEY_SET:
+        return row + (None,)
+    extra = {key: value for key, value in stock.items() if key not in _STOCK_KEY_SET}
+    return row + (serializer.dumps(extra),)
+
+
+def _row_stock(number, code, row):
+    """
+    由序号、代号和 memberships 的字段值（STOCK_COLUMNS 和 extra）还原股票字典
+    
+    序号为 None 或字段值为 NULL 时不包含该字段
+    """
+    if number is not None and row[-1] is None and None not in row:
+        return dict(zip(STOCK_KEYS, (number, code) + row[:-1]))
+    
+    stock = {'number': number} if number is not None else {}
+    stock['code'] = code
+    for column, value in zip(STOCK_COLUMNS, row):
+        if value is not None:
+            stock[column] = value
+    if row[-1] is not None:
+        stock.update(serializer.loads(row[-1]))
+    return stock
+
+
+def _encode_numbers(stocks):
+    """
+    名单的顺序和序号
+    
+    名单按代号排序且序号为 1..n 时（港交所名单总是如此）返回 None，
+    否则按名单顺序保存 [代号, 序号]
+    """
+    codes = [stock['code'] for stock in stocks]
+    if (codes == sorted(codes, key=storage.code_sort_key)
+            and all(stock.get('number') == str(i) for i, stock in enumerate(stocks, start=1))):
+        return None
+    return serializer.dumps([[stock['code'], stock.get('number')] for stock in stocks])
+
+
+def _insert_snapshot(conn, data):
+    meta = dict(data)
+    meta['stocks'] = None
+    cursor = conn.execute(
+        'INSERT INTO snapshots (date, total, numbers, meta) VALUES (?, ?, ?, ?)',
+        (data['date'], data['total'], _encode_numbers(data['stocks']), serializer.dumps(meta))
+    )
+    return cursor.lastrowid
+
+
+def _write_current_list(conn, data):
+    """保存一次名单：只结束和开始有变化的区间"""
+    snapshot = _insert_snapshot(conn, data)
+    
+    open_rows = {
+        row[0]: (row[1], row[2:])
+        for row in conn.execute(
+            f"SELECT code, id, {', '.join(STOCK_COLUMNS)}, extra FROM memberships WHERE end_snapshot IS NULL"
+        )
+    }
+    
+    closed = []
+    opened = []
+    for stock in data['stocks']:
+        fields = _stock_row(stock)
+        current = open_rows.pop(stock['code'], None)
+        if current is not None:
+            if current[1] == fields:
+                continue
+            closed.append(current[0])
+        opened.append((stock['code'], snapshot, data['date']) + fields)
+    closed.extend(row_id for row_id, _ in open_rows.values())
+    
+    conn.executemany('UPDATE memberships SET end_snapshot = ?, end_date = ? WHERE id = ?',
+                     [(snapshot, data['date'], row_id) for row_id in closed])
+    conn.executemany(
+        f"INSERT INTO memberships (code, start_snapshot, start_date, {', '.join(STOCK_COLUMNS)}, extra) "
+        f"VALUES (?, ?, ?, {', '.join('?' * len(STOCK_COLUMNS))}, ?)",
+        opened
+    )
+    return len(opened), len(closed)
+
+
+def _write_change_record(conn, change_record, seq=None):
+    if seq is None:
+        seq = conn.execute('SELECT COALESCE(MAX(seq) + 1, 0) FROM changes').fetchone()[0]
+    conn.execute('INSERT INTO changes (seq, date, record) VALUES (?, ?, ?)',
+                 (seq, change_record['date'], serializer.dumps(change_record)))
+    conn.executemany('INSERT INTO change_stocks (seq, code, kind) VALUES (?, ?, ?)',
+                     [(seq, stock['code'], kind) for kind in CHANGE_KINDS for stock in change_record.get(kind, [])])
+
+
+def _import_json_store(conn):
+    """
+    从 JSON 文件存储导入当前名单和变化日志
+    
+    JSON 存储只有当前名单，导入前的名单区间从当前名单开始
+    """
+    current = None
+    # 旧版本把名单直接保存在网站数据目录
+    for current_file in (storage.store_dir() / 'current.json', storage.data_dir() / 'current.json'):
+        if current_file.exists():
+            current = serializer.load(current_file)
+            break
+    if current is not None:
+        _write_current_list(conn, current)
+    
+    log_file = storage.store_dir() / storage.CHANGELOG_FILE
+    count = 0
+    if log_file.exists():
+        with open(log_file, 'rb') as f:
+            for line in f:
+                # 中断写入留下的不完整行不导入
+                if not line.endswith(b'\n'):
+                    break
+                _write_change_record(conn, serializer.loads(line), count)
+                count += 1
+    
+    if current is not None or count:
+        print(f"✓ 已从JSON文件存储导入{'当前名单和' if current is not None else ''} {count} 条变化记录到 {DB_FILE}")
+
+
+def load_current_list():
+    """
+    加载当前保存的名单（最近一次保存的名单及仍在名单上的股票）
+    
+    Returns:
+        dict or None: 当前名单数据，如果不存在返回None
+    """
+    with _connection() as conn:
+        snapshot = conn.execute('SELECT numbers, meta FROM snapshots ORDER BY id DESC LIMIT 1').fetchone()
+        if snapshot is None:
+            return None
+        rows = conn.execute(
+            f"SELECT code, {', '.join(STOCK_COLUMNS)}, extra FROM memberships WHERE end_snapshot IS NULL"
+        ).fetchall()
+    
+    data = serializer.loads(snapshot[1])
+    if snapshot[0] is None:
+        rows.sort(key=lambda row: storage.code_sort_key(row[0]))
+        data['stocks'] = [_row_stock(str(number), row[0], row[1:]) for number, row in enumerate(rows, start=1)]
+    else:
+        fields = {row[0]: row[1:] for row in rows}
+        data['stocks'] = [_row_stock(number, code, fields[code]) for code, number in serializer.loads(snapshot[0])]
+    return data
+
+
+def save_current_list(data):
+    """
+    保存当前名单
+    
+    Args:
+        data: 名单数据字典
+    """
+    with _connection(write=True) as conn:
+        opened, closed = _write_current_list(conn, data)
+    print(f"✓ 已保存当前名单到 {DB_FILE}（开始 {opened} 个区间，结束 {closed} 个区间）")
+
+
+def save_change_record(change_record):
+    """
+    追加一条变化记录
+    
+    Args:
+        change_record: 变化记录字典
+    """
+    with _connection(write=True) as conn:
+        _write_change_record(conn, change_record)
+    print(f"✓ 已追加变化记录到{DB_FILE}")
+
+
+def save_history(history):
+    """
+    整体替换变化记录（用于回填重建）
+    
+    Args:
+        history: 历史变化记录列表（最新的在前面）
+    """
+    with _connection(write=True) as conn:
+        conn.execute('DELETE FROM change_stocks')
+        conn.execute('DELETE FROM changes')
+        for seq, record in enumerate(reversed(history)):
+            _write_change_record(conn, record, seq)
+    print(f"✓ 已重建变化历史，共 {len(history)} 条记录")
+
+
+def count_changes():
+    """
+    Returns:
+        int: 变化记录总数
+    """
+    with _connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM changes').fetchone()[0]
+
+
+def _records(rows):
+    return [serializer.loads(record) for (record,) in rows]
+
+
+def load_recent_changes(count):
+    """
+    Args:
+        count: 记录数
+    
+    Returns:
+        list: 最近的变化记录（最新的在前面）
+    """
+    with _connection() as conn:
+        return _records(conn.execute('SELECT record FROM changes ORDER BY seq DESC LIMIT ?', (count,)))
+
+
+def load_changes(start, stop=None):
+    """
+    按序号读取一段连续的变化记录
+    
+    Args:
+        start: 起始序号（最旧的记录为0）
+        stop: 结束序号（不含），默认读到最后
+    
+    Returns:
+        list: 变化记录列表（最旧的在前面）
+    """
+    with _connection() as conn:
+        if stop is None:
+            rows = conn.execute('SELECT record FROM changes WHERE seq >= ? ORDER BY seq', (start,))
+        else:
+            rows = conn.execute('SELECT record FROM changes WHERE seq >= ? AND seq < ? ORDER BY seq', (start, stop))
+        return _records(rows)
+
+
+def load_history(limit=None):
+    """
+    Args:
+        limit: 最多返回的记录数（可选），默认返回全部
+    
+    Returns:
+        list: 历史变化记录列表（最新的在前面）
+    """
+    if limit is not None:
+        return load_recent_changes(limit)
+    with _connection() as conn:
+        return _records(conn.execute('SELECT record FROM changes ORDER BY seq DESC'))
+
+
+def load_code_changes(code):
+    """
+    Args:
+        code: 股份代号
+    
+    Returns:
+        list: 新增、移除或修改了该股票的变化记录（最新的在前面）
+    """
+    with _connection() as conn:
+        return _records(conn.execute(
+            'SELECT record FROM changes WHERE seq IN (SELECT seq FROM change_stocks WHERE code = ?) ORDER BY seq DESC',
+            (code,)
+        ))
+
+
+def load_changes_between(start_date, end_date):
+    """
+    Args:
+        start_date: 起始日期 (YYYY-MM-DD，含)
+        end_date: 结束日期 (YYYY-MM-DD，含)
+    
+    Returns:
+        list: 日期在范围内的变化记录（最新的在前面）
+    """
+    with _connection() as conn:
+        return _records(conn.execute(
+            'SELECT record FROM changes WHERE date >= ? AND date <= ? ORDER BY seq DESC',
+            (start_date, end_date)
+        ))
+
+
+def load_code_periods(code):
+    """
+    某股票在名单上的区间（只包括开始使用 SQLite 存储之后保存的名单）
+    
+    Args:
+        code: 股份代号
+    
+    Returns:
+        list: [{'start_date', 'end_date', 股票字段...}, ...]，end_date 为 None 表示仍在名单上
+    """
+    with _connection() as conn:
+        rows = conn.execute(
+            f"SELECT start_date, end_date, {', '.join(STOCK_COLUMNS)}, extra FROM memberships "
+            f"WHERE code = ? ORDER BY start_snapshot",
+            (code,)
+        ).fetchall()
+    return [{'start_date': row[0], 'end_date': row[1], **_row_stock(None, code, row[2:])} for row in rows]
+
+
+def reimport():
+    """删除数据库并从 JSON 文件存储重新导入"""
+    for suffix in ('', '-wal', '-shm'):
+        path = db_path().with_name(DB_FILE + suffix)
+        if path.exists():
+            path.unlink()
+    _open().close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite 数据存储')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    subparsers.add_parser('import', help='删除数据库并从 JSON 文件存储重新导入')
+    
+    code_parser = subparsers.add_parser('code', help='某股票的变化记录和在名单上的区间')
+    code_parser.add_argument('code', help='股份代号')
+    
+    range_parser = subparsers.add_parser('range', help='日期范围内的变化记录')
+    range_parser.add_argument('start', help='起始日期 (YYYY-MM-DD)')
+    range_parser.add_argument('end', help='结束日期 (YYYY-MM-DD)')
+    
+    args = parser.parse_args()
+    
+    if args.command == 'import':
+        reimport()
+        return 0
+    
+    if args.command == 'code':
+        code = args.code.lstrip('0') or '0'
+        records = load_code_changes(code)
+        print(f"{code}: {len(records)} 条变化记录")
+        for record in records:
+            kinds = [kind for kind in CHANGE_KINDS if any(stock['code'] == code for stock in record.get(kind, []))]
+            print(f"  {record['date']}  {', '.join(kinds)}")
+        for period in load_code_periods(code):
+            print(f"  区间 {period['start_date']} → {period['end_date'] or '至今'}  {period.get('name', '')}")
+        return 0
+    
+    records = load_changes_between(args.start, args.end)
+    print(f"{args.start} 至 {args.end}: {len(records)} 条变化记录")
+    for record in records:
+        print(f"  {record['date']}  新增 {len(record['added'])}  移除 {len(record['removed'])}  "
+              f"修改 {len(record.get('modified', []))}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
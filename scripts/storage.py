@@ -1,21 +1,147 @@
 """
 数据持久化模块
 负责保存和读取数据文件
+
+名单和变化记录默认保存为 JSON 文件；设置环境变量 STORAGE_BACKEND=sqlite 时
+load_current_list、save_current_list、save_change_record、load_history 等接口改由
+SQLite 数据库保存（见 sqlstore.py），快照、统计状态等派生数据仍为文件
 """
 
-import json
+import argparse
 import os
-from datetime import datetime
+import struct
+from bisect import bisect_right
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
 from pathlib import Path
 
+import serializer
+
 
 # 数据目录路径
 DATA_DIR = Path(__file__).parent.parent / 'docs' / 'data'
 
+# 监控自身的数据存储目录（源数据，提交到仓库但不发布到网站）
+STORE_DIR = Path(__file__).parent.parent / 'data'
+
+# 本地运行状态目录（不发布到网站，也不提交到仓库）
+CACHE_DIR = Path(__file__).parent.parent / '.cache'
+
+# 名单和变化记录的存储后端: 'json'（JSON 文件）或 'sqlite'（SQLite 数据库）
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json')
+
+# 只追加的变化日志（JSON Lines，最旧的在前面）及其偏移量索引
+CHANGELOG_FILE = 'changes.jsonl'
+CHANGELOG_INDEX_FILE = 'changes.idx'
+
+# 索引中每条记录的偏移量：8字节无符号大端整数
+_OFFSET = struct.Struct('>Q')
+
+# 导出到网站的变化历史保留的记录数
+HISTORY_EXPORT_LIMIT = 100
+
+# 快照存储：定期保存完整关键帧，其余变化只保存增量
+SNAPSHOT_DIR = 'snapshots'
+SNAPSHOT_ENTRIES_FILE = 'entries.jsonl'
+SNAPSHOT_INDEX_FILE = 'entries.idx'
+
+# 每隔多少个增量保存一个关键帧（决定按日期重建名单的最大开销）
+KEYFRAME_INTERVAL = 20
+
+# 快照索引项：日期(YYYYMMDD)、条目在 entries.jsonl 中的偏移量、类型
+_SNAPSHOT_ENTRY = struct.Struct('>IQB')
+_KEYFRAME = 0
+_DELTA = 1
+
+# 增量统计状态文件，结构变化时提高版本号以触发完整重建
+STATS_STATE_FILE = 'stats_state.json'
+STATS_STATE_VERSION = 1
+
+# 滚动变化量统计的窗口天数
+CHURN_WINDOW_DAYS = 30
+
+# 比较股票属性时忽略的字段（序号随名单增减整体变化）
+_VOLATILE_FIELDS = {'number'}
+
+# 当前名单的存储命名空间（同时监控多个名单时每个名单各用一个子目录，空字符串为默认名单）
+_namespace = ContextVar('storage_namespace', default='')
+
+
+@contextmanager
+def use_namespace(namespace):
+    """
+    在当前线程（上下文）中切换存储命名空间
+    
+    用法:
+        with use_namespace('en'):
+            save_current_list(data)    # 写入 data/en/current.json
+    
+    Args:
+        namespace: 命名空间，空字符串表示默认名单
+    """
+    token = _namespace.set(namespace or '')
+    try:
+        yield
+    finally:
+        _namespace.reset(token)
+
+
+def current_namespace():
+    """返回当前的存储命名空间"""
+    return _namespace.get()
+
+
+def data_dir():
+    """当前命名空间的网站数据目录"""
+    namespace = _namespace.get()
+    return DATA_DIR / namespace if namespace else DATA_DIR
+
+
+def store_dir():
+    """当前命名空间的数据存储目录"""
+    namespace = _namespace.get()
+    return STORE_DIR / namespace if namespace else STORE_DIR
+
+
+def cache_dir():
+    """当前命名空间的本地运行状态目录"""
+    namespace = _namespace.get()
+    return CACHE_DIR / namespace if namespace else CACHE_DIR
+
+
+def _sqlite():
+    """SQLite 后端启用时返回 sqlstore 模块，否则返回None"""
+    if STORAGE_BACKEND != 'sqlite':
+        return None
+    import sqlstore
+    return sqlstore
+
+
+@contextmanager
+def transaction():
+    """
+    把 with 块内的写入放在一个事务中
+    
+    SQLite 后端在块正常结束时一次提交、抛出异常时全部回滚；JSON 文件后端逐个文件写入，没有事务
+    """
+    backend = _sqlite()
+    if backend is None:
+        yield
+        return
+    
+    with backend.transaction():
+        yield
+
 
 def ensure_data_dir():
     """确保数据目录存在"""
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    data_dir().mkdir(parents=True, exist_ok=True)
+
+
+def ensure_store_dir():
+    """确保数据存储目录存在"""
+    store_dir().mkdir(parents=True, exist_ok=True)
 
 
 def load_current_list():
@@ -25,14 +151,20 @@ def load_current_list():
     Returns:
         dict or None: 当前名单数据，如果不存在返回None
     """
-    current_file = DATA_DIR / 'current.json'
+    backend = _sqlite()
+    if backend:
+        return backend.load_current_list()
+    
+    current_file = store_dir() / 'current.json'
     
     if not current_file.exists():
-        return None
+        # 旧版本把名单直接保存在网站数据目录
+        current_file = data_dir() / 'current.json'
+        if not current_file.exists():
+            return None
     
     try:
-        with open(current_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return serializer.load(current_file)
     except Exception as e:
         print(f"✗ 读取current.json失败: {str(e)}")
         return None
@@ -40,126 +172,969 @@ def load_current_list():
 
 def save_current_list(data):
     """
-    保存当前名单
+    保存当前名单到数据存储（网站使用的文件由 exporter 导出）
     
     Args:
         data: 名单数据字典
     """
-    ensure_data_dir()
-    current_file = DATA_DIR / 'current.json'
+    backend = _sqlite()
+    if backend:
+        return backend.save_current_list(data)
+    
+    ensure_store_dir()
+    current_file = store_dir() / 'current.json'
     
     try:
-        with open(current_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        serializer.dump(data, current_file, pretty=True)
         print(f"✓ 已保存当前名单到 {current_file}")
     except Exception as e:
         print(f"✗ 保存current.json失败: {str(e)}")
         raise
 
 
-def load_history():
+def _read_offsets(index_file, count=None):
+    """
+    读取索引中的偏移量
+    
+    Args:
+        index_file: 索引文件路径
+        count: 只读取最后 count 个（可选）
+    
+    Returns:
+        list: 偏移量列表（最旧的在前面）
+    """
+    if not index_file.exists():
+        return []
+    
+    with open(index_file, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        total = size // _OFFSET.size
+        skip = 0 if count is None else max(0, total - count)
+        f.seek(skip * _OFFSET.size)
+        data = f.read((total - skip) * _OFFSET.size)
+    
+    return [offset for (offset,) in _OFFSET.iter_unpack(data)]
+
+
+def _rebuild_changelog_index():
+    """扫描变化日志重建偏移量索引，并截掉中断写入留下的不完整行"""
+    log_file = store_dir() / CHANGELOG_FILE
+    index_file = store_dir() / CHANGELOG_INDEX_FILE
+    
+    offsets = []
+    end = 0
+    with open(log_file, 'rb') as f:
+        for line in iter(f.readline, b''):
+            if not line.endswith(b'\n'):
+                break
+            offsets.append(end)
+            end += len(line)
+    
+    if end != log_file.stat().st_size:
+        with open(log_file, 'r+b') as f:
+            f.truncate(end)
+    
+    with open(index_file, 'wb') as f:
+        f.write(b''.join(_OFFSET.pack(offset) for offset in offsets))
+    
+    print(f"✓ 已重建变化日志索引，共 {len(offsets)} 条记录")
+
+
+def _ensure_changelog():
+    """
+    确保变化日志及其索引可用
+    
+    首次使用时从旧的 history.json 导入记录；
+    索引与日志不一致（如写入中断）时重建索引
+    """
+    log_file = store_dir() / CHANGELOG_FILE
+    index_file = store_dir() / CHANGELOG_INDEX_FILE
+    
+    if not log_file.exists():
+        ensure_store_dir()
+        legacy = []
+        legacy_file = data_dir() / 'history.json'
+        if legacy_file.exists():
+            try:
+                legacy = serializer.load(legacy_file)
+            except Exception as e:
+                print(f"✗ 读取history.json失败: {str(e)}")
+        
+        # history.json 最新的在前面，日志按时间顺序追加
+        _write_changelog(reversed(legacy))
+        if legacy:
+            print(f"✓ 已从history.json导入 {len(legacy)} 条变化记录")
+        return
+    
+    # 最后一条索引指向的行应恰好结束在日志末尾
+    log_size = log_file.stat().st_size
+    offsets = _read_offsets(index_file, 1)
+    if not offsets:
+        consistent = log_size == 0 and index_file.exists()
+    else:
+        with open(log_file, 'rb') as f:
+            f.seek(offsets[0])
+            line = f.readline()
+        consistent = line.endswith(b'\n') and offsets[0] + len(line) == log_size
+    
+    if not consistent:
+        _rebuild_changelog_index()
+
+
+def _write_changelog(records):
+    """用给定记录（最旧的在前面）整体重写变化日志和索引"""
+    ensure_store_dir()
+    log_file = store_dir() / CHANGELOG_FILE
+    index_file = store_dir() / CHANGELOG_INDEX_FILE
+    
+    offsets = []
+    tmp_log = log_file.with_name(f"{log_file.name}.tmp")
+    with open(tmp_log, 'wb') as f:
+        for record in records:
+            offsets.append(f.tell())
+            f.write(_encode_change_record(record))
+    
+    tmp_index = index_file.with_name(f"{index_file.name}.tmp")
+    with open(tmp_index, 'wb') as f:
+        f.write(b''.join(_OFFSET.pack(offset) for offset in offsets))
+    
+    os.replace(tmp_log, log_file)
+    os.replace(tmp_index, index_file)
+
+
+def _encode_change_record(change_record):
+    """把变化记录编码为一行JSON"""
+    return serializer.dumps(change_record) + b'\n'
+
+
+def count_changes():
+    """
+    返回变化日志中的记录总数
+    
+    Returns:
+        int: 记录数
+    """
+    backend = _sqlite()
+    if backend:
+        return backend.count_changes()
+    
+    _ensure_changelog()
+    return (store_dir() / CHANGELOG_INDEX_FILE).stat().st_size // _OFFSET.size
+
+
+def load_recent_changes(count):
+    """
+    从日志末尾读取最近的若干条变化记录
+    
+    通过偏移量索引直接定位，不需要读取整个日志
+    
+    Args:
+        count: 记录数
+    
+    Returns:
+        list: 变化记录列表（最新的在前面）
+    """
+    backend = _sqlite()
+    if backend:
+        return backend.load_recent_changes(count)
+    
+    _ensure_changelog()
+    offsets = _read_offsets(store_dir() / CHANGELOG_INDEX_FILE, count)
+    
+    records = []
+    with open(store_dir() / CHANGELOG_FILE, 'rb') as f:
+        for offset in reversed(offsets):
+            f.seek(offset)
+            records.append(serializer.loads(f.readline()))
+    
+    return records
+
+
+def load_changes(start, stop=None):
+    """
+    按序号读取一段连续的变化记录
+    
+    Args:
+        start: 起始序号（最旧的记录为0）
+        stop: 结束序号（不含），默认读到日志末尾
+    
+    Returns:
+        list: 变化记录列表（最旧的在前面）
+    """
+    backend = _sqlite()
+    if backend:
+        return backend.load_changes(start, stop)
+    
+    _ensure_changelog()
+    
+    with open(store_dir() / CHANGELOG_INDEX_FILE, 'rb') as f:
+        total = f.seek(0, os.SEEK_END) // _OFFSET.size
+        stop = total if stop is None else min(stop, total)
+        if start >= stop:
+            return []
+        f.seek(start * _OFFSET.size)
+        (offset,) = _OFFSET.unpack(f.read(_OFFSET.size))
+    
+    # 记录在日志中连续存放，定位到第一条后顺序读取
+    records = []
+    with open(store_dir() / CHANGELOG_FILE, 'rb') as f:
+        f.seek(offset)
+        for _ in range(stop - start):
+            records.append(serializer.loads(f.readline()))
+    
+    return records
+
+
+def load_history(limit=None):
     """
     加载变化历史
     
+    Args:
+        limit: 最多返回的记录数（可选），默认返回全部
+    
     Returns:
-        list: 历史变化记录列表
+        list: 历史变化记录列表（最新的在前面）
     """
-    history_file = DATA_DIR / 'history.json'
+    if limit is not None:
+        return load_recent_changes(limit)
     
-    if not history_file.exists():
-        return []
+    backend = _sqlite()
+    if backend:
+        return backend.load_history()
     
     try:
-        with open(history_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        _ensure_changelog()
+        with open(store_dir() / CHANGELOG_FILE, 'rb') as f:
+            history = [serializer.loads(line) for line in f]
     except Exception as e:
-        print(f"✗ 读取history.json失败: {str(e)}")
+        print(f"✗ 读取{CHANGELOG_FILE}失败: {str(e)}")
         return []
+    
+    history.reverse()
+    return history
+
+
+def load_code_changes(code):
+    """
+    加载新增、移除或修改了某只股票的变化记录
+    
+    JSON 文件后端需要读取整个变化日志；SQLite 后端按代号索引查询
+    
+    Args:
+        code: 股份代号
+    
+    Returns:
+        list: 变化记录列表（最新的在前面）
+    """
+    backend = _sqlite()
+    if backend:
+        return backend.load_code_changes(code)
+    
+    return [record for record in load_history()
+            if any(stock['code'] == code for kind in ('added', 'removed', 'modified') for stock in record.get(kind, []))]
+
+
+def load_changes_between(start_date, end_date):
+    """
+    加载日期范围内的变化记录
+    
+    JSON 文件后端需要读取整个变化日志；SQLite 后端按日期索引查询
+    
+    Args:
+        start_date: 起始日期 (YYYY-MM-DD，含)
+        end_date: 结束日期 (YYYY-MM-DD，含)
+    
+    Returns:
+        list: 变化记录列表（最新的在前面）
+    """
+    backend = _sqlite()
+    if backend:
+        return backend.load_changes_between(start_date, end_date)
+    
+    return [record for record in load_history() if start_date <= record['date'] <= end_date]
 
 
 def save_change_record(change_record):
     """
-    保存一条变化记录到历史
+    追加一条变化记录到变化日志
+    
+    只追加一行和一个索引项，不重写已有记录
     
     Args:
         change_record: 变化记录字典
     """
-    ensure_data_dir()
+    backend = _sqlite()
+    if backend:
+        return backend.save_change_record(change_record)
+    
+    _ensure_changelog()
+    
+    log_file = store_dir() / CHANGELOG_FILE
+    index_file = store_dir() / CHANGELOG_INDEX_FILE
+    
+    try:
+        with open(log_file, 'ab') as f:
+            offset = f.tell()
+            f.write(_encode_change_record(change_record))
+            f.flush()
+            os.fsync(f.fileno())
+        
+        with open(index_file, 'ab') as f:
+            f.write(_OFFSET.pack(offset))
+        
+        print(f"✓ 已追加变化记录到{CHANGELOG_FILE}")
+    except Exception as e:
+        print(f"✗ 保存{CHANGELOG_FILE}失败: {str(e)}")
+        raise
+
+
+def _date_key(date):
+    """把 YYYY-MM-DD 转换为可排序的整数 YYYYMMDD"""
+    return int(date.replace('-', ''))
+
+
+def code_sort_key(code):
+    """股份代号按数值排序的排序键（数字代号在前，其余按文字排序）"""
+    return (0, int(code), '') if code.isdigit() else (1, 0, code)
+
+
+def _stock_map(stocks):
+    """以股份代号为键索引股票列表"""
+    return {stock['code']: stock for stock in stocks}
+
+
+def _stock_list(stock_map):
+    """按代号排序输出股票列表，并重新编号"""
+    stocks = []
+    for number, code in enumerate(sorted(stock_map, key=code_sort_key), start=1):
+        stock = dict(stock_map[code])
+        stock['number'] = str(number)
+        stocks.append(stock)
+    return stocks
+
+
+def _same_stock(a, b):
+    """比较两只股票除序号外的属性是否相同"""
+    keys = (a.keys() | b.keys()) - _VOLATILE_FIELDS
+    return all(a.get(key) == b.get(key) for key in keys)
+
+
+def _diff_states(old_map, new_map):
+    """
+    计算两个名单状态之间的增量
+    
+    Returns:
+        dict: upsert 为新增或属性变化的股票，remove 为移除的代号
+    """
+    upsert = [stock for code, stock in new_map.items()
+              if code not in old_map or not _same_stock(old_map[code], stock)]
+    remove = [code for code in old_map if code not in new_map]
+    return {'upsert': upsert, 'remove': remove}
+
+
+def _apply_delta(stock_map, delta):
+    """把增量应用到名单状态（原地修改）"""
+    for code in delta.get('remove', []):
+        stock_map.pop(code, None)
+    for stock in delta.get('upsert', []):
+        stock_map[stock['code']] = stock
+
+
+def _snapshot_paths():
+    snapshot_dir = store_dir() / SNAPSHOT_DIR
+    return snapshot_dir, snapshot_dir / SNAPSHOT_ENTRIES_FILE, snapshot_dir / SNAPSHOT_INDEX_FILE
+
+
+def _read_snapshot_index():
+    """
+    读取快照索引
+    
+    Returns:
+        list: [(日期整数, 偏移量, 类型), ...]，按写入顺序
+    """
+    _, _, index_file = _snapshot_paths()
+    if not index_file.exists():
+        return []
+    
+    with open(index_file, 'rb') as f:
+        return list(_SNAPSHOT_ENTRY.iter_unpack(f.read()))
+
+
+def _append_snapshot_entry(entry, kind):
+    """追加一个快照条目及其索引项"""
+    snapshot_dir, entries_file, index_file = _snapshot_paths()
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    
+    with open(entries_file, 'ab') as f:
+        offset = f.tell()
+        f.write(_encode_change_record(entry))
+    
+    with open(index_file, 'ab') as f:
+        f.write(_SNAPSHOT_ENTRY.pack(_date_key(entry['date']), offset, kind))
+
+
+def _write_keyframe(date, stock_map):
+    """保存一个完整关键帧并追加索引条目"""
+    snapshot_dir, _, _ = _snapshot_paths()
+    keyframe_dir = snapshot_dir / 'keyframes'
+    keyframe_dir.mkdir(parents=True, exist_ok=True)
+    
+    # 同一日期可能有多次变化，文件名带上序号避免覆盖
+    name = f"{date}-{len(_read_snapshot_index()):06d}.json"
+    serializer.dump(_stock_list(stock_map), keyframe_dir / name)
+    
+    _append_snapshot_entry({'date': date, 'kind': 'keyframe', 'file': f"keyframes/{name}"}, _KEYFRAME)
+
+
+def _write_snapshot_store(initial_date, initial_stocks, deltas, interval=KEYFRAME_INTERVAL):
+    """
+    从初始名单和按时间排序的增量重写整个快照存储
+    
+    Args:
+        initial_date: 初始关键帧日期
+        initial_stocks: 初始股票列表
+        deltas: [{'date', 'upsert', 'remove'}, ...]，从旧到新
+        interval: 关键帧间隔
+    """
+    snapshot_dir, _, _ = _snapshot_paths()
+    if snapshot_dir.exists():
+        for old_file in list(snapshot_dir.glob('keyframes/*.json')) + list(snapshot_dir.glob('entries.*')):
+            old_file.unlink()
+    
+    state = _stock_map(initial_stocks)
+    _write_keyframe(initial_date, state)
+    
+    since_keyframe = 0
+    for delta in deltas:
+        _append_snapshot_entry({'date': delta['date'], 'kind': 'delta',
+                                'upsert': delta['upsert'], 'remove': delta['remove']}, _DELTA)
+        _apply_delta(state, delta)
+        since_keyframe += 1
+        if since_keyframe >= interval:
+            _write_keyframe(delta['date'], state)
+            since_keyframe = 0
+
+
+def _seed_snapshots(current_data):
+    """
+    首次使用时初始化快照存储
+    
+    从当前名单出发，沿变化日志倒推出每次变化之前的名单，
+    从而保留已有历史覆盖范围内的全部名单状态
+    """
     history = load_history()
+    state = _stock_map(current_data['stocks'])
+    deltas = []
+    
+    for record in history:
+        removed_codes = [stock['code'] for stock in record['removed']]
+        deltas.append({'date': record['date'], 'upsert': record['added'], 'remove': removed_codes})
+        # 倒推：撤销本次新增，恢复本次移除
+        for stock in record['added']:
+            state.pop(stock['code'], None)
+        for stock in record['removed']:
+            state[stock['code']] = stock
+    
+    deltas.reverse()
+    initial_stocks = list(state.values())
+    
+    # 变化记录不包含已有股票的属性变化，最后补一个增量使末状态与当前名单一致
+    for delta in deltas:
+        _apply_delta(state, delta)
+    correction = _diff_states(state, _stock_map(current_data['stocks']))
+    if correction['upsert'] or correction['remove']:
+        correction['date'] = current_data['date']
+        deltas.append(correction)
+    
+    initial_date = deltas[0]['date'] if deltas else current_data['date']
+    _write_snapshot_store(initial_date, initial_stocks, deltas)
+    print(f"✓ 已初始化快照存储: 1 个初始关键帧，{len(deltas)} 个增量")
+
+
+def record_snapshot(current_data, change_record=None):
+    """
+    把本次名单记录到快照存储
+    
+    有变化时只追加由变化记录得到的增量，每隔 KEYFRAME_INTERVAL 个增量补一个关键帧；
+    无变化时不写入任何数据，存储增长只与变化量有关
+    
+    Args:
+        current_data: 当前名单数据
+        change_record: 本次变化记录（可选）
+    """
+    index = _read_snapshot_index()
+    if not index:
+        _seed_snapshots(current_data)
+        return
+    
+    if not change_record:
+        return
+    
+    # 属性变化的股票以当前名单中的完整记录覆盖
+    modified_codes = {stock['code'] for stock in change_record.get('modified', [])}
+    delta = {
+        'date': change_record['date'],
+        'kind': 'delta',
+        'upsert': change_record['added'] + [stock for stock in current_data['stocks'] if stock['code'] in modified_codes],
+        'remove': [stock['code'] for stock in change_record['removed']]
+    }
+    _append_snapshot_entry(delta, _DELTA)
+    
+    since_keyframe = 0
+    for _, _, kind in reversed(index):
+        if kind == _KEYFRAME:
+            break
+        since_keyframe += 1
+    
+    if since_keyframe + 1 >= KEYFRAME_INTERVAL:
+        _write_keyframe(change_record['date'], _stock_map(current_data['stocks']))
+    
+    print(f"✓ 已记录名单快照增量")
+
+
+def _replay_snapshots(index, stop):
+    """
+    从 stop 之前最近的关键帧开始重放到 stop（含）
+    
+    Returns:
+        dict: 名单状态
+    """
+    start = stop
+    while index[start][2] != _KEYFRAME:
+        start -= 1
+    
+    snapshot_dir, entries_file, _ = _snapshot_paths()
+    with open(entries_file, 'rb') as f:
+        f.seek(index[start][1])
+        keyframe = serializer.loads(f.readline())
+        state = _stock_map(serializer.load(snapshot_dir / keyframe['file']))
+        
+        for _, offset, kind in index[start + 1:stop + 1]:
+            f.seek(offset)
+            _apply_delta(state, serializer.loads(f.readline()))
+    
+    return state
+
+
+def load_list_as_of(date):
+    """
+    重建指定日期生效的完整名单
+    
+    开销为一个关键帧加上不超过 KEYFRAME_INTERVAL 个增量
+    
+    Args:
+        date: 日期 (YYYY-MM-DD)
+    
+    Returns:
+        dict or None: 名单数据，日期早于快照存储的起点时返回None
+    """
+    index = _read_snapshot_index()
+    stop = bisect_right([entry[0] for entry in index], _date_key(date)) - 1
+    if stop < 0:
+        return None
+    
+    state = _replay_snapshots(index, stop)
+    stocks = _stock_list(state)
+    effective = str(index[stop][0])
+    
+    return {
+        'date': f"{effective[0:4]}-{effective[4:6]}-{effective[6:8]}",
+        'as_of': date,
+        'total': len(stocks),
+        'stocks': stocks
+    }
+
+
+def _fold_by_date(snapshots):
+    """同一日期的多个名单只保留最后一个"""
+    pending = None
+    for date, stocks in snapshots:
+        if pending is not None and pending[0] != date:
+            yield pending
+        pending = (date, stocks)
+    if pending is not None:
+        yield pending
+
+
+def _snapshots_to_deltas(snapshots):
+    """
+    把完整名单序列转换为初始关键帧和增量
+    
+    同一时间只在内存中保留相邻两个名单
+    
+    Returns:
+        tuple: (初始日期, 初始股票列表, 增量列表)，序列为空时返回None
+    """
+    initial = None
+    previous = None
+    deltas = []
+    
+    for date, stocks in _fold_by_date(snapshots):
+        state = _stock_map(stocks)
+        if previous is None:
+            initial = (date, stocks)
+        else:
+            delta = _diff_states(previous, state)
+            if delta['upsert'] or delta['remove']:
+                delta['date'] = date
+                deltas.append(delta)
+        previous = state
+    
+    if initial is None:
+        return None
+    return initial[0], initial[1], deltas
+
+
+def rebuild_snapshots(snapshots, interval=KEYFRAME_INTERVAL):
+    """
+    用按日期排序的完整名单序列重建快照存储（用于回填和压缩）
+    
+    Args:
+        snapshots: [(日期, 股票列表), ...] 的可迭代对象，从旧到新
+        interval: 关键帧间隔
+    """
+    result = _snapshots_to_deltas(snapshots)
+    if result is None:
+        return
+    
+    # 全部增量计算完成后再重写，允许 snapshots 来自正在被重写的存储
+    _write_snapshot_store(*result, interval=interval)
+
+
+def _iter_snapshot_states():
+    """按写入顺序产出每个条目之后的 (日期, 股票列表)"""
+    index = _read_snapshot_index()
+    if not index:
+        return
+    
+    snapshot_dir, entries_file, _ = _snapshot_paths()
+    state = None
+    with open(entries_file, 'rb') as f:
+        for date_key, offset, kind in index:
+            f.seek(offset)
+            entry = serializer.loads(f.readline())
+            if kind == _KEYFRAME:
+                state = _stock_map(serializer.load(snapshot_dir / entry['file']))
+            else:
+                _apply_delta(state, entry)
+            yield entry['date'], list(state.values())
+
+
+def compact_snapshots(interval=KEYFRAME_INTERVAL):
+    """
+    压缩快照存储
+    
+    合并同一日期的多个增量、去掉多余的关键帧，并按给定间隔重新放置关键帧
+    
+    Args:
+        interval: 关键帧间隔
+    """
+    snapshot_dir, _, _ = _snapshot_paths()
+    
+    def store_size():
+        return sum(f.stat().st_size for f in snapshot_dir.rglob('*') if f.is_file())
     
-    # 添加新记录到列表开头（最新的在前面）
-    history.insert(0, change_record)
+    before_entries = len(_read_snapshot_index())
+    if not before_entries:
+        print("快照存储为空，无需压缩")
+        return
+    before_size = store_size()
     
-    # 只保留最近100条记录（防止文件过大）
-    history = history[:100]
+    rebuild_snapshots(_iter_snapshot_states(), interval)
     
-    history_file = DATA_DIR / 'history.json'
+    print(f"✓ 快照存储已压缩: {before_entries} → {len(_read_snapshot_index())} 个条目，"
+          f"{before_size / 1024:.1f} KB → {store_size() / 1024:.1f} KB")
+
+
+def load_last_check():
+    """
+    加载上次检查记录（用于判断名单是否变化的快速路径）
+    
+    Returns:
+        dict or None: 上次检查记录，如果不存在返回None
+    """
+    last_check_file = cache_dir() / 'last_check.json'
+    
+    if not last_check_file.exists():
+        return None
     
     try:
-        with open(history_file, 'w', encoding='utf-8') as f:
-            json.dump(history, f, ensure_ascii=False, indent=2)
-        print(f"✓ 已保存变化记录到历史")
+        return serializer.load(last_check_file)
     except Exception as e:
-        print(f"✗ 保存history.json失败: {str(e)}")
+        print(f"✗ 读取last_check.json失败: {str(e)}")
+        return None
+
+
+def save_last_check(data, path):
+    """
+    保存本次检查记录
+    
+    Args:
+        data: 名单数据字典（需包含 date、total、digest）
+        path: 本次执行路径，'fast' 或 'full'
+    
+    Returns:
+        dict: 检查记录
+    """
+    cache_dir().mkdir(parents=True, exist_ok=True)
+    last_check_file = cache_dir() / 'last_check.json'
+    
+    record = {
+        'date': data['date'],
+        'total': data['total'],
+        'digest': data.get('digest'),
+        'path': path,
+        'checked_at': datetime.now().isoformat()
+    }
+    
+    try:
+        serializer.dump(record, last_check_file, pretty=True)
+    except Exception as e:
+        print(f"✗ 保存last_check.json失败: {str(e)}")
+    
+    return record
+
+
+def save_history(history):
+    """
+    整体替换变化历史（用于回填重建）
+    
+    Args:
+        history: 历史变化记录列表（最新的在前面）
+    """
+    backend = _sqlite()
+    if backend:
+        return backend.save_history(history)
+    
+    try:
+        _write_changelog(reversed(history))
+        print(f"✓ 已重建变化历史，共 {len(history)} 条记录")
+    except Exception as e:
+        print(f"✗ 保存{CHANGELOG_FILE}失败: {str(e)}")
         raise
 
 
-def update_stats(current_data, history):
+def _empty_stats_state():
+    return {
+        'version': STATS_STATE_VERSION,
+        'built_from': 0,
+        'currency_distribution': {},
+        'type_distribution': {},
+        'update_frequency': {},
+        'recent_changes': [],
+        'daily_churn': {}
+    }
+
+
+def _count_stock(counts, value, step):
+    """调整计数，计数归零时删除该键"""
+    counts[value] = counts.get(value, 0) + step
+    if counts[value] <= 0:
+        del counts[value]
+
+
+def _prune_daily_churn(state, latest_date):
+    """只保留滚动窗口内的每日变化量"""
+    window_start = (datetime.strptime(latest_date, '%Y-%m-%d') - timedelta(days=CHURN_WINDOW_DAYS - 1)).strftime('%Y-%m-%d')
+    state['daily_churn'] = {date: counts for date, counts in state['daily_churn'].items() if date >= window_start}
+    return window_start
+
+
+def apply_change_to_stats(state, change_record):
+    """
+    把一条变化记录作为增量应用到统计状态（原地修改）
+    
+    Args:
+        state: 统计状态
+        change_record: 变化记录字典
+    """
+    for stock in change_record['added']:
+        _count_stock(state['currency_distribution'], stock.get('currency', 'Unknown'), 1)
+        _count_stock(state['type_distribution'], stock.get('type', 'Unknown'), 1)
+    for stock in change_record['removed']:
+        _count_stock(state['currency_distribution'], stock.get('currency', 'Unknown'), -1)
+        _count_stock(state['type_distribution'], stock.get('type', 'Unknown'), -1)
+    for stock in change_record.get('modified', []):
+        for field, distribution in (('currency', 'currency_distribution'), ('type', 'type_distribution')):
+            change = stock['changes'].get(field)
+            if change:
+                _count_stock(state[distribution], change['old'], -1)
+                _count_stock(state[distribution], change['new'], 1)
+    
+    month = change_record['date'][:7]  # YYYY-MM
+    state['update_frequency'][month] = state['update_frequency'].get(month, 0) + 1
+    
+    state['recent_changes'].insert(0, {
+        'date': change_record['date'],
+        'added_count': len(change_record['added']),
+        'removed_count': len(change_record['removed']),
+        'net_change': change_record['net_change']
+    })
+    del state['recent_changes'][10:]
+    
+    added, removed = state['daily_churn'].get(change_record['date'], (0, 0))
+    state['daily_churn'][change_record['date']] = [added + len(change_record['added']),
+                                                   removed + len(change_record['removed'])]
+    _prune_daily_churn(state, max(state['daily_churn']))
+    
+    state['built_from'] += 1
+
+
+def rebuild_stats_state(current_data):
     """
-    更新统计数据
+    用当前名单和完整变化日志重建统计状态
     
     Args:
         current_data: 当前名单数据
-        history: 历史变化记录
+    
+    Returns:
+        dict: 统计状态
     """
-    ensure_data_dir()
+    state = _empty_stats_state()
+    
+    for record in reversed(load_history()):
+        apply_change_to_stats(state, record)
+    
+    # 分布以当前名单为准（变化日志不含历史开始前的名单）
+    state['currency_distribution'] = {}
+    state['type_distribution'] = {}
+    for stock in current_data['stocks']:
+        _count_stock(state['currency_distribution'], stock.get('currency', 'Unknown'), 1)
+        _count_stock(state['type_distribution'], stock.get('type', 'Unknown'), 1)
     
-    # 计算统计数据
-    stats = {
+    print(f"✓ 已重建统计状态，共 {state['built_from']} 条变化记录")
+    return state
+
+
+def load_stats_state():
+    """
+    加载统计状态
+    
+    Returns:
+        dict or None: 统计状态，不存在或版本不符时返回None
+    """
+    state_file = store_dir() / STATS_STATE_FILE
+    
+    if not state_file.exists():
+        return None
+    
+    try:
+        state = serializer.load(state_file)
+    except Exception as e:
+        print(f"✗ 读取{STATS_STATE_FILE}失败: {str(e)}")
+        return None
+    
+    if state.get('version') != STATS_STATE_VERSION:
+        print(f"  统计状态版本不符 ({state.get('version')} != {STATS_STATE_VERSION})，需要重建")
+        return None
+    
+    return state
+
+
+def build_stats(current_data, state=None):
+    """
+    由统计状态生成网站使用的统计数据
+    
+    Args:
+        current_data: 当前名单数据
+        state: 统计状态（可选），默认读取已保存的状态，缺失或过期时先更新
+    
+    Returns:
+        dict: 统计数据
+    """
+    if state is None:
+        state = load_stats_state()
+        if state is None or state['built_from'] != count_changes():
+            return update_stats(current_data)
+    
+    latest = max([current_data['date']] + list(state['daily_churn']))
+    window_start = (datetime.strptime(latest, '%Y-%m-%d') - timedelta(days=CHURN_WINDOW_DAYS - 1)).strftime('%Y-%m-%d')
+    window = [counts for date, counts in state['daily_churn'].items() if window_start <= date <= latest]
+    
+    return {
         'last_update': current_data['date'],
         'current_total': current_data['total'],
-        'total_changes': len(history),
-        'update_frequency': {},  # 按月统计更新频率
-        'currency_distribution': {},  # 交易货币分布
-        'recent_changes': []  # 最近变化摘要
+        'total_changes': state['built_from'],
+        'update_frequency': dict(sorted(state['update_frequency'].items(), reverse=True)),  # 按月统计更新频率
+        'currency_distribution': state['currency_distribution'],  # 交易货币分布
+        'recent_changes': state['recent_changes'],  # 最近变化摘要
+        'type_distribution': state['type_distribution'],  # 证券种类分布
+        'churn_30d': {  # 滚动30天变化量
+            'start': window_start,
+            'end': latest,
+            'changes': len(window),
+            'added': sum(counts[0] for counts in window),
+            'removed': sum(counts[1] for counts in window)
+        }
     }
+
+
+def update_stats(current_data, change_record=None):
+    """
+    增量更新统计数据
     
-    # 统计交易货币分布
-    for stock in current_data['stocks']:
-        currency = stock.get('currency', 'Unknown')
-        stats['currency_distribution'][currency] = stats['currency_distribution'].get(currency, 0) + 1
+    统计状态持久化在 stats_state.json 中，每条新变化记录作为增量应用；
+    状态缺失、版本不符或与变化日志条数不一致时完整重建。
+    两者都不需要时（名单无变化）状态不变，不重写 stats_state.json
     
-    # 统计每月变化次数
-    for record in history:
-        date = record['date']
-        month = date[:7]  # YYYY-MM
-        stats['update_frequency'][month] = stats['update_frequency'].get(month, 0) + 1
-    
-    # 最近10次变化摘要
-    for record in history[:10]:
-        stats['recent_changes'].append({
-            'date': record['date'],
-            'added_count': len(record['added']),
-            'removed_count': len(record['removed']),
-            'net_change': record['net_change']
-        })
-    
-    # 保存统计数据
-    stats_file = DATA_DIR / 'stats.json'
+    Args:
+        current_data: 当前名单数据
+        change_record: 本次变化记录（可选，应已写入变化日志）
+    
+    Returns:
+        dict: 统计数据
+    """
+    ensure_store_dir()
+    
+    state = load_stats_state()
+    expected = count_changes()
+    
+    if state is not None and change_record and state['built_from'] == expected - 1:
+        apply_change_to_stats(state, change_record)
+    elif state is None or state['built_from'] != expected:
+        state = rebuild_stats_state(current_data)
+    else:
+        return build_stats(current_data, state)
+    
+    state_file = store_dir() / STATS_STATE_FILE
     
     try:
-        with open(stats_file, 'w', encoding='utf-8') as f:
-            json.dump(stats, f, ensure_ascii=False, indent=2)
+        serializer.dump(state, state_file, pretty=True)
         print(f"✓ 已更新统计数据")
     except Exception as e:
-        print(f"✗ 保存stats.json失败: {str(e)}")
+        print(f"✗ 保存{STATS_STATE_FILE}失败: {str(e)}")
+    
+    return build_stats(current_data, state)
 
 
-if __name__ == '__main__':
+def main():
+    parser = argparse.ArgumentParser(description='数据存储工具')
+    subparsers = parser.add_subparsers(dest='command')
+    
+    compact_parser = subparsers.add_parser('compact-snapshots', help='压缩快照存储')
+    compact_parser.add_argument('--interval', type=int, default=KEYFRAME_INTERVAL, help='关键帧间隔')
+    
+    as_of_parser = subparsers.add_parser('as-of', help='查看指定日期生效的名单')
+    as_of_parser.add_argument('date', help='日期 (YYYY-MM-DD)')
+    
+    args = parser.parse_args()
+    
+    if args.command == 'compact-snapshots':
+        compact_snapshots(max(1, args.interval))
+        return
+    
+    if args.command == 'as-of':
+        data = load_list_as_of(args.date)
+        if data is None:
+            print(f"✗ {args.date} 早于快照存储的起点")
+            return
+        print(f"{args.date} 生效名单（{data['date']} 更新）: 共 {data['total']} 只股票")
+        return
+    
     # 测试代码
     print("测试数据存储模块...")
     ensure_data_dir()
-    print(f"数据目录: {DATA_DIR}")
+    print(f"数据目录: {data_dir()}")
     
     # 测试加载
     current = load_current_list()
@@ -167,3 +1142,7 @@ if __name__ == '__main__':
     
     history = load_history()
     print(f"历史记录数: {len(history)}")
+
+
+if __name__ == '__main__':
+    main()
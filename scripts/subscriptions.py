@@ -0,0 +1,294 @@
+"""
+订阅模块
+收件人可以只订阅关心的股票：指定股份代号，或按属性筛选（例如 currency=USD、type=基金）
+
+订阅来自环境变量 SUBSCRIPTIONS（分号或换行分隔）和 SUBSCRIPTION_FILE（每行一个订阅，# 开头为注释），
+每个订阅的格式为“地址: 条件...”，条件之间用空格或逗号分隔，满足任一条件的股票即与该订阅相关：
+    alice@example.com: 700 9988 currency=USD
+    bob@example.com: type=基金
+    carol@example.com: currency=USD&type=基金      # & 连接的条件需要同时满足
+
+变化记录通过从代号和 (属性, 值) 到订阅者的倒排索引匹配，只查找与变化中的股票相关的订阅者；
+每位受影响的订阅者收到只包含相关股票的邮件，匹配结果相同的订阅者共用一封邮件；
+筛选后的变化记录带有 filtered 标记，净变化按相关股票重新计算，old_total、new_total 仍为整个名单的总数。
+没有订阅的收件人（RECIPIENT_EMAIL、RECIPIENT_FILE）仍收到完整的变化通知
+
+用法:
+    python subscriptions.py    # 用最近一条变化记录检查订阅会通知哪些收件人
+"""
+
+import os
+import re
+import sys
+
+
+# 可以作为筛选条件的股票属性
+FILTER_FIELDS = ('code', 'name', 'currency', 'type', 'exempt', 'remarks')
+
+# 变化记录中按订阅筛选的股票列表
+CHANGE_KEYS = ('added', 'removed', 'modified')
+
+
+def _normalize_code(code):
+    """股份代号去掉前导零（名单中的代号不补零）"""
+    code = code.strip()
+    return str(int(code)) if code.isdigit() else code
+
+
+def parse_subscription(line):
+    """
+    解析一行订阅
+    
+    Args:
+        line: “地址: 条件...”
+    
+    Returns:
+        tuple or None: (地址, 代号集合, 条件列表)，条件为 {属性: 值}；格式错误时返回None
+    """
+    address, separator, terms = line.partition(':')
+    address = address.strip()
+    if not separator or not address:
+        print(f"⚠ 订阅格式错误，已忽略: {line.strip()}")
+        return None
+    
+    codes = set()
+    predicates = []
+    for term in re.split(r'[\s,，]+', terms.strip()):
+        if not term:
+            continue
+        if '=' not in term:
+            codes.add(_normalize_code(term))
+            continue
+        
+        predicate = {}
+        for condition in term.split('&'):
+            field, _, value = condition.partition('=')
+            field = field.strip()
+            if field not in FILTER_FIELDS:
+                print(f"⚠ 订阅 {address} 的条件 {term} 使用了未知属性 {field}，已忽略")
+                predicate = None
+                break
+            predicate[field] = _normalize_code(value) if field == 'code' else value.strip()
+        if predicate is None:
+            continue
+        if list(predicate) == ['code']:
+            codes.add(predicate['code'])
+        else:
+            predicates.append(predicate)
+    
+    if not codes and not predicates:
+        print(f"⚠ 订阅 {address} 没有条件，已忽略")
+        return None
+    return address, codes, predicates
+
+
+class SubscriptionIndex:
+    """
+    订阅的倒排索引
+    
+    每个不同的条件（一个股份代号或一组属性条件）只登记一次，条件再对应到订阅了它的订阅者。
+    代号索引把股份代号映射到条件；属性索引以条件中的第一个 (属性, 值) 为键，其余属性在命中后再检查。
+    匹配一条变化记录时先找出每只股票命中的条件，再展开到订阅者，
+    开销只与变化中的股票数、命中的条件数和受影响的订阅者数有关
+    """
+    
+    def __init__(self):
+        self.addresses = []
+        self._ids = {}
+        self._terms = {}
+        self._subscribers = []
+        self._by_code = {}
+        self._by_attribute = {}
+    
+    def __len__(self):
+        return len(self.addresses)
+    
+    def __contains__(self, address):
+        return address.strip().lower() in self._ids
+    
+    def _term(self, key):
+        """返回条件编号，新条件返回 (编号, True)"""
+        term = self._terms.get(key)
+        if term is not None:
+            return term, False
+        term = self._terms[key] = len(self._subscribers)
+        self._subscribers.append(set())
+        return term, True
+    
+    def add(self, address, codes=(), predicates=()):
+        """
+        添加一个订阅（同一地址多次添加时合并条件）
+        
+        Args:
+            address: 收件人地址
+            codes: 股份代号集合
+            predicates: 条件列表，每个条件为 {属性: 值}，全部属性相同时匹配
+        """
+        key = address.strip().lower()
+        subscriber = self._ids.get(key)
+        if subscriber is None:
+            subscriber = self._ids[key] = len(self.addresses)
+            self.addresses.append(address.strip())
+        
+        for code in codes:
+            term, new = self._term(code)
+            if new:
+                self._by_code[code] = term
+            self._subscribers[term].add(subscriber)
+        for predicate in predicates:
+            conditions = tuple(sorted(predicate.items()))
+            term, new = self._term(conditions)
+            if new:
+                first, *rest = conditions
+                self._by_attribute.setdefault(first, []).append((term, tuple(rest)))
+            self._subscribers[term].add(subscriber)
+    
+    def _stock_terms(self, stock):
+        """一只股票命中的条件编号"""
+        term = self._by_code.get(stock.get('code'))
+        terms = [] if term is None else [term]
+        for field in FILTER_FIELDS:
+            candidates = self._by_attribute.get((field, stock.get(field)))
+            if candidates:
+                terms.extend(term for term, rest in candidates
+                             if all(stock.get(other) == value for other, value in rest))
+        return terms
+    
+    def _modified_terms(self, stock):
+        """属性变化按代号、变化前或变化后的属性值匹配"""
+        old = {'code': stock['code'], 'name': stock.get('name')}
+        new = dict(old)
+        for field, change in stock['changes'].items():
+            old[field] = change['old']
+            new[field] = change['new']
+        return set(self._stock_terms(old)) | set(self._stock_terms(new))
+    
+    def match(self, change_record):
+        """
+        匹配一条变化记录
+        
+        命中条件相同的订阅者共用同一个结果字典（调用方不应修改）
+        
+        Args:
+            change_record: 变化记录字典
+        
+        Returns:
+            dict: {订阅者编号: {'added': [...], 'removed': [...], 'modified': [...]}}，
+                  列表中为相关股票在原记录中的位置（从小到大），只包含受影响的订阅者
+        """
+        term_positions = {}
+        for key in CHANGE_KEYS:
+            match = self._modified_terms if key == 'modified' else self._stock_terms
+            for position, stock in enumerate(change_record.get(key, [])):
+                for term in match(stock):
+                    term_positions.setdefault(term, {name: [] for name in CHANGE_KEYS})[key].append(position)
+        
+        subscriber_terms = {}
+        for term in term_positions:
+            for subscriber in self._subscribers[term]:
+                subscriber_terms.setdefault(subscriber, []).append(term)
+        
+        merged = {}
+        hits = {}
+        for subscriber, terms in subscriber_terms.items():
+            key = tuple(terms)
+            positions = merged.get(key)
+            if positions is None:
+                if len(terms) == 1:
+                    positions = term_positions[terms[0]]
+                else:
+                    positions = {name: sorted(set().union(*(term_positions[term][name] for term in terms)))
+                                 for name in CHANGE_KEYS}
+                merged[key] = positions
+            hits[subscriber] = positions
+        return hits
+    
+    def route(self, change_record, recipients=()):
+        """
+        按订阅拆分变化通知
+        
+        匹配结果相同的订阅者共用一条筛选后的变化记录；没有订阅的收件人收到完整的变化记录。
+        筛选后的记录标记 filtered，净变化只计算相关股票（总数仍为整个名单的总数）
+        
+        Args:
+            change_record: 变化记录字典
+            recipients: 全部收件人地址列表（其中有订阅的地址按订阅发送）
+        
+        Returns:
+            list: [(变化记录, 收件人地址列表), ...]
+        """
+        groups = {}
+        keys = {}
+        for subscriber, positions in sorted(self.match(change_record).items()):
+            # 共用结果字典的订阅者只计算一次分组键
+            key = keys.get(id(positions))
+            if key is None:
+                key = keys[id(positions)] = tuple(tuple(positions[name]) for name in CHANGE_KEYS)
+            groups.setdefault(key, []).append(self.addresses[subscriber])
+        
+        deliveries = []
+        unsubscribed = [address for address in recipients if address not in self]
+        if unsubscribed:
+            deliveries.append((change_record, unsubscribed))
+        for key, addresses in groups.items():
+            record = dict(change_record)
+            for name, selected in zip(CHANGE_KEYS, key):
+                record[name] = [change_record[name][i] for i in selected]
+            record['net_change'] = len(record['added']) - len(record['removed'])
+            record['filtered'] = True
+            deliveries.append((record, addresses))
+        return deliveries
+
+
+def load_subscriptions():
+    """
+    读取订阅
+    
+    合并环境变量 SUBSCRIPTIONS 和 SUBSCRIPTION_FILE 指定文件中的订阅
+    
+    Returns:
+        SubscriptionIndex: 订阅索引（没有订阅时为空）
+    """
+    entries = re.split(r'[;\n]', os.environ.get('SUBSCRIPTIONS', ''))
+    
+    subscription_file = os.environ.get('SUBSCRIPTION_FILE')
+    if subscription_file:
+        try:
+            with open(subscription_file, 'r', encoding='utf-8') as f:
+                entries.extend(line.split('#', 1)[0] for line in f)
+        except Exception as e:
+            print(f"✗ 读取订阅文件失败: {str(e)}")
+    
+    index = SubscriptionIndex()
+    for entry in entries:
+        if entry.strip():
+            subscription = parse_subscription(entry)
+            if subscription:
+                index.add(*subscription)
+    return index
+
+
+def main():
+    from emailer import load_recipients
+    from storage import load_recent_changes
+    
+    index = load_subscriptions()
+    recipients = load_recipients()
+    print(f"订阅: {len(index)} 位，未订阅的收件人: {len([a for a in recipients if a not in index])} 位")
+    
+    recent = load_recent_changes(1)
+    if not recent:
+        print("没有变化记录")
+        return 0
+    
+    change_record = recent[0]
+    print(f"{change_record['date']} 的变化记录会发送:")
+    for record, addresses in index.route(change_record, recipients):
+        modified = len(record.get('modified', []))
+        print(f"  新增 {len(record['added'])}，移除 {len(record['removed'])}，属性变化 {modified}: "
+              f"{len(addresses)} 位收件人")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())